@@ -0,0 +1,409 @@
+"""
+This contains the tools for playing and evaluating GG matches in bulk.
+"""
+
+import copy
+import itertools
+import os
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from constants import Controller, POV, Ranking
+from core import Player
+from simulation import MatchSimulator, GameRecord, Rendering, Agent
+
+
+@dataclass
+class ArenaTask:
+    """
+    This is for storing a batch of games for a worker process to play: the
+    controllers of both sides, the number of games and the seed of the
+    random number generators.
+    """
+    controllers: list[int]
+    games: int
+    seed: int
+
+
+@dataclass
+class ArenaReport:
+    """
+    This is for storing the outcomes of an arena's games, with the wins,
+    draws and losses counted from the first controller's side, and the
+    seconds they took to play.
+    """
+    records: list[GameRecord] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def games(self) -> int:
+        """
+        This returns the number of games played.
+        """
+        return len(self.records)
+
+    def outcomes(self) -> tuple[int, int, int]:
+        """
+        This counts the wins, draws and losses of the first controller.
+        """
+        wins = sum(record.winner == record.player_one_color
+                   for record in self.records)
+        draws = sum(record.winner == Player.ARBITER for record in self.records)
+
+        return wins, draws, self.games - wins - draws
+
+    def games_per_second(self) -> float:
+        """
+        This returns the rate at which the games were played.
+        """
+        return self.games/self.elapsed if self.elapsed > 0 else 0.0
+
+    def length_histogram(self, bins: int = 10):
+        """
+        This returns the counts and bin edges of the number of plies per game.
+        """
+        return np.histogram([record.plies for record in self.records],
+                            bins=bins)
+
+    def branching_histogram(self, bins: int = 10):
+        """
+        This returns the counts and bin edges of the average number of actions
+        available per ply in each game.
+        """
+        return np.histogram([record.branching_factor
+                             for record in self.records], bins=bins)
+
+    def __str__(self):
+        wins, draws, losses = self.outcomes()
+        games = max(self.games, 1)
+        lines = [f"Games: {self.games} ({self.games_per_second():.1f} games/s)",
+                 f"Win/Draw/Loss: {wins/games:.1%} / {draws/games:.1%} / "
+                 f"{losses/games:.1%}"]
+        for title, (counts, edges) in [
+                ("Game length (plies)", self.length_histogram()),
+                ("Branching factor", self.branching_histogram())]:
+            lines.append(f"{title}:")
+            for count, low, high in zip(counts, edges, edges[1:]):
+                lines.append(f"  {low:7.1f} - {high:7.1f}: {count}")
+
+        return "\n".join(lines)
+
+
+class Arena:
+    """
+    This plays games between two controllers (see constant definitions in the
+    Controller class, or Agent instances) across a pool of worker processes,
+    without rendering.
+    Every game has freshly sampled formations, and the first controller's
+    color is chosen at random.
+    """
+
+    def __init__(self, controllers: list[int], workers: int = 1,
+                 seed: int = None, batch_size: int = 50):
+        """
+        The games are handed to the workers in batches of the given size,
+        each seeded with the given seed plus the batch number (a random seed
+        is drawn if it is None).
+        """
+        if Controller.HUMAN in controllers:
+            raise ValueError("Arena games cannot have human controllers")
+
+        self.controllers = controllers
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+        self.batch_size = batch_size
+
+    def tasks(self, games: int) -> list[ArenaTask]:
+        """
+        This splits the games into the batches of the workers.
+        """
+        return [ArenaTask(controllers=self.controllers,
+                          games=min(self.batch_size, games - start),
+                          seed=self.seed + batch)
+                for batch, start in enumerate(range(0, games, self.batch_size))]
+
+    @staticmethod
+    def _play_batch(task: ArenaTask) -> list[GameRecord]:
+        """
+        This runs in a worker process, playing a batch of games.
+        """
+        random.seed(task.seed)
+        np.random.seed(task.seed)
+        records = []
+        for _ in range(task.games):
+            formations = [list(Player.get_sensible_random_formation(
+                piece_list=Ranking.SORTED_FORMATION)) for _ in range(2)]
+            simulator = MatchSimulator(formations=formations,
+                                       controllers=task.controllers,
+                                       save_data=False, pov=POV.WORLD)
+            simulator.rendering = Rendering.headless(report_interval=None)
+            simulator.start()
+            records.extend(simulator.game_records)
+
+        return records
+
+    def play(self, games: int) -> ArenaReport:
+        """
+        This plays the given number of games and reports their outcomes.
+        """
+        report = ArenaReport()
+        start_time = time.perf_counter()
+        tasks = self.tasks(games)
+        if self.workers <= 1:
+            for task in tasks:
+                report.records.extend(Arena._play_batch(task))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for records in executor.map(Arena._play_batch, tasks):
+                    report.records.extend(records)
+        report.elapsed = time.perf_counter() - start_time
+
+        return report
+
+
+@dataclass
+class DealTask:
+    """
+    This is for storing a deal of a tournament: two agents play a pair of
+    games on the same two formations sampled from the seed, each agent taking
+    the blue side once.
+    """
+    agents: list[Agent]
+    seed: int
+
+
+@dataclass
+class MatchResult:
+    """
+    This is for storing the outcome of a tournament game between the named
+    agents, where the winner is a color (Player.ARBITER for a draw).
+    """
+    blue: str
+    red: str
+    winner: int
+    plies: int
+
+    @property
+    def blue_score(self) -> float:
+        """
+        This returns the points of the blue agent: 1 for a win, 0.5 for a
+        draw and 0 for a loss.
+        """
+        if self.winner == Player.ARBITER:
+            return 0.5
+
+        return float(self.winner == Player.BLUE)
+
+
+@dataclass
+class Rating:
+    """
+    This is for storing an agent's Elo rating with the bounds of its
+    confidence interval.
+    """
+    elo: float
+    low: float
+    high: float
+
+
+def bradley_terry(results: list[MatchResult], names: list[str],
+                  prior: float = 1.0, iterations: int = 1000,
+                  tolerance: float = 1e-9) -> np.ndarray:
+    """
+    This fits the Bradley-Terry strength of each named agent to the results
+    with the minorization-maximization algorithm, counting draws as half a
+    win for both sides. The given number of drawn games are added to every
+    pairing that was played, which keeps the strengths of unbeaten or winless
+    agents finite. The strengths are scaled to a geometric mean of 1.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    wins = np.zeros(len(names))
+    games = np.zeros((len(names), len(names)))
+    for result in results:
+        blue, red = index[result.blue], index[result.red]
+        wins[blue] += result.blue_score
+        wins[red] += 1 - result.blue_score
+        games[blue, red] += 1
+        games[red, blue] += 1
+    played = games > 0
+    games += prior*played
+    wins += prior*played.sum(axis=1)/2
+
+    strengths = np.ones(len(names))
+    for _ in range(iterations):
+        denominators = (games/(strengths[:, None] + strengths[None, :])).sum(
+            axis=1)
+        updated = np.ones(len(names))
+        np.divide(wins, denominators, out=updated, where=denominators > 0)
+        updated = np.maximum(updated, 1e-12)
+        updated /= np.exp(np.log(updated).mean())
+        converged = np.abs(updated - strengths).max() < tolerance
+        strengths = updated
+        if converged:
+            break
+
+    return strengths
+
+
+def elo_ratings(results: list[MatchResult], names: list[str],
+                bootstrap: int = 200, confidence: float = 0.95,
+                seed: int = 0) -> dict[str, Rating]:
+    """
+    This converts the Bradley-Terry strengths to Elo ratings averaging 1500,
+    with confidence intervals from refitting the ratings to the given number
+    of resamplings of the results.
+    """
+    def to_elo(strengths: np.ndarray):
+        return 1500 + 400*np.log10(strengths)
+
+    elos = to_elo(bradley_terry(results, names))
+    generator = np.random.default_rng(seed)
+    samples = np.array([
+        to_elo(bradley_terry(
+            [results[i] for i in generator.integers(len(results),
+                                                    size=len(results))],
+            names))
+        for _ in range(bootstrap if results else 0)])
+    tail = 100*(1 - confidence)/2
+    ratings = {}
+    for i, name in enumerate(names):
+        if len(samples) == 0:
+            ratings[name] = Rating(elo=float(elos[i]), low=float(elos[i]),
+                                   high=float(elos[i]))
+            continue
+        low, high = np.percentile(samples[:, i], [tail, 100 - tail])
+        ratings[name] = Rating(elo=float(elos[i]), low=float(low),
+                               high=float(high))
+
+    return ratings
+
+
+@dataclass
+class TournamentReport:
+    """
+    This is for storing the games of a tournament, the ratings fitted to
+    them, and the seconds they took to play.
+    """
+    results: list[MatchResult] = field(default_factory=list)
+    ratings: dict[str, Rating] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def record(self, name: str) -> tuple[int, int, int]:
+        """
+        This counts the wins, draws and losses of the named agent.
+        """
+        wins = draws = losses = 0
+        for result in self.results:
+            if name not in (result.blue, result.red):
+                continue
+            score = (result.blue_score if name == result.blue
+                     else 1 - result.blue_score)
+            wins += score == 1
+            draws += score == 0.5
+            losses += score == 0
+
+        return wins, draws, losses
+
+    def __str__(self):
+        lines = [f"Games: {len(self.results)} in {self.elapsed:.1f}s",
+                 f"{'Agent':16} {'Elo':>7} {'Interval':>17} {'W/D/L':>12}"]
+        for name, rating in sorted(self.ratings.items(),
+                                   key=lambda item: -item[1].elo):
+            wins, draws, losses = self.record(name)
+            interval = f"[{rating.low:.0f}, {rating.high:.0f}]"
+            lines.append(f"{name:16} {rating.elo:7.0f} {interval:>17} "
+                         f"{f'{wins}/{draws}/{losses}':>12}")
+
+        return "\n".join(lines)
+
+
+class Tournament:
+    """
+    This plays a round robin between agents across a pool of worker
+    processes. Every pairing plays a number of deals (see DealTask class), so
+    each agent meets the other on the same formations from both sides. The
+    agents are then rated from the results.
+    """
+
+    def __init__(self, agents: list[Agent], deals: int = 1, workers: int = 1,
+                 seed: int = None):
+        """
+        The agents must have distinct names. Deal n is seeded with the given
+        seed plus n (a random seed is drawn if it is None).
+        """
+        names = [agent.name for agent in agents]
+        if len(set(names)) != len(names):
+            raise ValueError(f"The agents' names are not distinct: {names}")
+
+        self.agents = agents
+        self.deals = deals
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+
+    def tasks(self) -> list[DealTask]:
+        """
+        This lists the deals of every pairing.
+        """
+        pairings = itertools.product(
+            itertools.combinations(self.agents, 2), range(self.deals))
+        return [DealTask(agents=list(pairing), seed=self.seed + deal)
+                for deal, (pairing, _) in enumerate(pairings)]
+
+    @staticmethod
+    def _play_deal(task: DealTask) -> list[MatchResult]:
+        """
+        This runs in a worker process, playing both games of a deal with
+        fresh copies of the agents.
+        """
+        random.seed(task.seed)
+        np.random.seed(task.seed)
+        formations = [list(Player.get_sensible_random_formation(
+            piece_list=Ranking.SORTED_FORMATION)) for _ in range(2)]
+        results = []
+        for blue, red in [task.agents, task.agents[::-1]]:
+            simulator = MatchSimulator(
+                formations=[formations[0][:], formations[1][:]],
+                controllers=copy.deepcopy([blue, red]), save_data=False,
+                pov=POV.WORLD)
+            simulator.player_one_color = Player.BLUE
+            simulator.player_two_color = Player.RED
+            simulator.rendering = Rendering.headless(report_interval=None)
+            simulator.start()
+            game = simulator.game_records[-1]
+            results.append(MatchResult(blue=blue.name, red=red.name,
+                                       winner=game.winner, plies=game.plies))
+
+        return results
+
+    def play(self, bootstrap: int = 200) -> TournamentReport:
+        """
+        This plays every deal and rates the agents, with confidence intervals
+        from the given number of resamplings.
+        """
+        report = TournamentReport()
+        start_time = time.perf_counter()
+        tasks = self.tasks()
+        if self.workers <= 1:
+            for task in tasks:
+                report.results.extend(Tournament._play_deal(task))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for results in executor.map(Tournament._play_deal, tasks):
+                    report.results.extend(results)
+        report.elapsed = time.perf_counter() - start_time
+        report.ratings = elo_ratings(
+            report.results, names=[agent.name for agent in self.agents],
+            bootstrap=bootstrap, seed=self.seed)
+
+        return report
+
+
+if __name__ == "__main__":
+    arena = Arena(controllers=[Controller.RANDOM, Controller.RANDOM],
+                  workers=os.cpu_count() or 1)
+    print(arena.play(games=1000))
@@ -88,3 +88,18 @@ class Controller:
 
     def __init__(self):
         pass
+
+
+class UpdateRule:
+    """
+    This class contains constants that set how a CFR trainer accumulates its
+    regrets and strategies.
+    """
+
+    VANILLA = 0
+    CFR_PLUS = 1
+    LINEAR = 2
+    DISCOUNTED = 3
+
+    def __init__(self):
+        pass
@@ -2,7 +2,8 @@
 Here we define the core components of the OLA engine.
 """
 import logging
-import copy
+import random
+import sys
 
 from dataclasses import dataclass
 
@@ -56,30 +57,172 @@ class Player:
         return formation
 
 
+@dataclass
+class MoveRecord:
+    """
+    This stores everything that Board.apply overwrites, so that Board.undo can
+    restore the position exactly. The result of the action (see constant
+    definitions in the Result class) is recorded along with it.
+    """
+
+    start: int
+    destination: int
+    moving_piece: int
+    target_piece: int
+    player_to_move: int
+    blue_anticipating: bool
+    red_anticipating: bool
+    result: int = None
+    actions: list[int] = None
+    zobrist: int = 0
+
+
 class Board:
     """
     This class represents the current game state as seen by the arbiter.
     """
     ROWS = 8
     COLUMNS = 9
+    SQUARES = ROWS * COLUMNS
+
+    # The player that each piece value belongs to (see get_piece_affiliation),
+    # and the result of a challenge for every pair of challenger and target
+    # ranks (see get_challenge_result), indexed from rank 1. These are filled
+    # in after the class definition.
+    AFFILIATIONS: tuple[int] = ()
+    CHALLENGE_RESULTS: tuple[tuple[int]] = ()
+    # The rank of each piece value (0 for blank squares), and the amount each
+    # piece value adds to its player's material (flags do not count)
+    RANKS: tuple[int] = ()
+    MATERIAL_VALUES: tuple[int] = ()
+
+    __slots__ = ('squares', 'player_to_move', 'blue_anticipating',
+                 'red_anticipating', '_actions', 'zobrist', 'flag_squares',
+                 'piece_counts', 'material_sums', 'occupied_squares')
 
     def __init__(self, matrix: list[list[int]], player_to_move: int,
                  blue_anticipating: bool, red_anticipating: bool):
         """
         The matrix is simply a representation of the current piece positions and
         ranks, with the rank designations being 0 to 30 (see constant
-        definitions in the Ranking class).
+        definitions in the Ranking class). It is stored as a flat buffer of
+        squares, numbered row by row from 0 (at (0, 0)) to 71 (at (7, 8)).
 
         blue_anticipating is True when the blue player's flag has reached the
         eighth row, but can still be challenged in the next turn by a red piece.
         If red fails to challenge, blue wins. The same logic applies to
         red_anticipating, except that the red player's flag must reach the
         first row.
+
+        Alongside the squares, the board keeps an index of where each player's
+        flag is, how many pieces each player has, the material sum of each
+        player and the squares each player occupies. These are lists indexed
+        by player color (see Player class), and are kept up to date by every
+        change of the squares.
         """
-        self.matrix = matrix
+        self.squares = Board.to_squares(matrix)
         self.player_to_move = player_to_move
         self.blue_anticipating = blue_anticipating
         self.red_anticipating = red_anticipating
+        self._actions = None  # Computed on the first call to actions
+        self.zobrist = Zobrist.hash_board(self)
+        self._build_index()
+
+    @staticmethod
+    def to_squares(matrix: list[list[int]]) -> bytearray:
+        """
+        This flattens a board matrix into a buffer of squares. A missing or
+        empty matrix results in a blank board.
+        """
+        squares = bytearray(Board.SQUARES)
+        if matrix:
+            for i, row in enumerate(matrix):
+                squares[i*Board.COLUMNS:(i + 1)*Board.COLUMNS] = bytes(row)
+
+        return squares
+
+    @property
+    def matrix(self) -> list[list[int]]:
+        """
+        This returns a copy of the board's squares arranged as a matrix.
+        """
+        return [list(self._row(i)) for i in range(Board.ROWS)]
+
+    @matrix.setter
+    def matrix(self, matrix: list[list[int]]):
+        self.squares = Board.to_squares(matrix)
+        self._actions = None
+        self.zobrist = Zobrist.hash_board(self)
+        self._build_index()
+
+    def _build_index(self):
+        """
+        This indexes the pieces on the board from scratch.
+        """
+        # Indexed by player color, with the arbiter's entry left unused
+        self.flag_squares = [None, None, None]
+        self.piece_counts = [0, 0, 0]
+        self.material_sums = [0, 0, 0]
+        self.occupied_squares = [set(), set(), set()]
+        for square, piece in enumerate(self.squares):
+            owner = Board.AFFILIATIONS[piece]
+            if owner is None:
+                continue
+            if Board.RANKS[piece] == Ranking.FLAG:
+                self.flag_squares[owner] = square
+            self.piece_counts[owner] += 1
+            self.material_sums[owner] += Board.MATERIAL_VALUES[piece]
+            self.occupied_squares[owner].add(square)
+
+    def _set_square(self, square: int, piece: int):
+        """
+        This places a piece value (possibly blank) on a square, updating the
+        hash and the piece index with the old and new contents of the square.
+        """
+        old_piece = self.squares[square]
+        self.squares[square] = piece
+        self.zobrist ^= (Zobrist.PIECES[square][old_piece]
+                         ^ Zobrist.PIECES[square][piece])
+        owner = Board.AFFILIATIONS[old_piece]
+        if owner is not None:
+            if self.flag_squares[owner] == square:
+                self.flag_squares[owner] = None
+            self.piece_counts[owner] -= 1
+            self.material_sums[owner] -= Board.MATERIAL_VALUES[old_piece]
+            self.occupied_squares[owner].discard(square)
+        owner = Board.AFFILIATIONS[piece]
+        if owner is not None:
+            if Board.RANKS[piece] == Ranking.FLAG:
+                self.flag_squares[owner] = square
+            self.piece_counts[owner] += 1
+            self.material_sums[owner] += Board.MATERIAL_VALUES[piece]
+            self.occupied_squares[owner].add(square)
+
+    def _row(self, row: int) -> bytearray:
+        """
+        This returns a copy of the squares in the given row.
+        """
+        return self.squares[row*Board.COLUMNS:(row + 1)*Board.COLUMNS]
+
+    def copy(self) -> 'Board':
+        """
+        This returns an independent copy of the board.
+        """
+        board = Board.__new__(Board)
+        board.squares = self.squares[:]
+        board.player_to_move = self.player_to_move
+        board.blue_anticipating = self.blue_anticipating
+        board.red_anticipating = self.red_anticipating
+        # The copy is of the same position, so it has the same actions
+        board._actions = self._actions
+        board.zobrist = self.zobrist
+        board.flag_squares = self.flag_squares[:]
+        board.piece_counts = self.piece_counts[:]
+        board.material_sums = self.material_sums[:]
+        board.occupied_squares = [occupied.copy()
+                                  for occupied in self.occupied_squares]
+
+        return board
 
     @staticmethod
     def get_piece_affiliation(piece: int):
@@ -117,9 +260,9 @@ class Board:
 
     def piece_not_found(self, piece: int):
         """
-        This checks if a particular piece is missing in the board's matrix.
+        This checks if a particular piece is missing in the board's squares.
         """
-        return not any(piece in row for row in self.matrix)
+        return piece not in self.squares
 
     @staticmethod
     def has_at_edge_column(column_number: int):
@@ -178,33 +321,27 @@ class Board:
         """
         This determines if the current game state is a terminal state.
         """
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
-
         terminality = False  # Initialize return value
 
-        blue_flag = Ranking.FLAG
-        red_flag = Ranking.FLAG + Ranking.SPY  # See ranking class for details
-        if (self.piece_not_found(blue_flag) or self.piece_not_found(red_flag)):
+        if (self.flag_squares[Player.BLUE] is None
+                or self.flag_squares[Player.RED] is None):
             terminality = True
             return terminality
 
-        blue_end = 0
-        red_end = -1  # The first and last row numbers, respectively
-        if blue_flag in self.matrix[red_end] and self.blue_anticipating:
+        blue_flag_column = self._flag_at_end(Player.BLUE)
+        red_flag_column = self._flag_at_end(Player.RED)
+        if blue_flag_column is not None and self.blue_anticipating:
             # If the flag has already survived a turn in the board's red end
             terminality = True
-        elif blue_flag in self.matrix[red_end] and not self.blue_anticipating:
-            flag_column_number = self.matrix[red_end].index(blue_flag)
-            terminality = Board.has_none_adjacent(flag_column_number,
-                                                  self.matrix[red_end])
-        elif red_flag in self.matrix[blue_end] and self.red_anticipating:
+        elif blue_flag_column is not None and not self.blue_anticipating:
+            terminality = Board.has_none_adjacent(blue_flag_column,
+                                                  self._end_row(Player.BLUE))
+        elif red_flag_column is not None and self.red_anticipating:
             # If the flag has already survived a turn in the board's blue end
             terminality = True
-        elif red_flag in self.matrix[blue_end] and not self.red_anticipating:
-            flag_column_number = self.matrix[blue_end].index(red_flag)
-            terminality = Board.has_none_adjacent(flag_column_number,
-                                                  self.matrix[blue_end])
+        elif red_flag_column is not None and not self.red_anticipating:
+            terminality = Board.has_none_adjacent(red_flag_column,
+                                                  self._end_row(Player.RED))
         else:
             terminality = False
 
@@ -248,214 +385,254 @@ class Board:
     def actions(self):
         """
         This enumerates the possible actions of the player to move in the game
-        state.
+        state, in increasing order of their ids (see the Action class). The
+        list is computed once per position and shared by every caller, so it
+        must not be modified.
         """
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
+        if self._actions is not None:
+            return self._actions
 
+        player, squares = self.player_to_move, self.squares
+        affiliations = Board.AFFILIATIONS
         valid_actions = []  # Initialize return value
-        bottom_row_number = leftmost_column_number = 0
-
-        for row in range(Board.ROWS):
-            for column in range(Board.COLUMNS):
-                entry = self.matrix[row][column]
-                # Define change in coordinates per direction (up, down, left,
-                # and right)
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                for direction in directions:
-                    direction_row, direction_column = direction
-                    new_row, new_column = (row + direction_row,
-                                           column + direction_column)
-
-                    if (bottom_row_number <= new_row < Board.ROWS
-                        and leftmost_column_number <= new_column < Board.COLUMNS
-                        and entry != Ranking.BLANK
-                        and self.is_allied_piece(entry)
-                            and self.not_allied_piece(
-                                self.matrix[new_row][new_column])):
-                        valid_actions.append(
-                            f"{row}{column}{new_row}{new_column}")
+        # Only the squares of the player to move have moves to check, and they
+        # are visited in order so that the action ids come out in order
+        for square in sorted(self.occupied_squares[player]):
+            for destination, action in Action.MOVES_FROM[square]:
+                if affiliations[squares[destination]] != player:
+                    valid_actions.append(action)
+        self._actions = valid_actions
 
         return valid_actions
 
-    @staticmethod
-    def remove_piece(board_matrix: list[list[int]], row: int,
-                     column: int):
+    def legal_mask(self) -> bytearray:
         """
-        This removes a piece entry from a given board matrix.
+        This marks the possible actions of the player to move with a 1 in a
+        buffer covering every action id, and all other actions with a 0.
         """
-        board_matrix[row][column] = Ranking.BLANK
+        mask = bytearray(Action.COUNT)
+        for action in self.actions():
+            mask[action] = 1
 
-        return board_matrix
+        return mask
 
-    def arbitrate_challenge(self, new_matrix: list[list[int]],
-                            action: str, challenger_value: int,
-                            target_value: int):
+    def remove_piece(self, square: int):
         """
-        This reflects challenge moves in a new matrix by arbitrating the
-        relative values of the opposing pieces.
+        This removes a piece entry from the given square of the board.
+        """
+        self._set_square(square, Ranking.BLANK)
+
+    @staticmethod
+    def get_challenge_result(challenger_value: int, target_value: int):
+        """
+        This applies the rules of the game to a challenge between pieces of the
+        given ranks (1 to 15), and returns its result from the challenger's
+        side (see constant definitions in the Result class).
         """
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
         if challenger_value == Ranking.PRIVATE and target_value == Ranking.SPY:
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
-            return new_matrix
+            return Result.WIN
 
         if challenger_value == Ranking.SPY and target_value == Ranking.PRIVATE:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            return new_matrix
+            return Result.LOSS
 
         if (challenger_value > target_value
             or (challenger_value == Ranking.FLAG
                 and target_value == Ranking.FLAG)):
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
+            result = Result.WIN
         elif challenger_value < target_value:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            return new_matrix
-        elif challenger_value == target_value:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            new_matrix = self.remove_piece(new_matrix, dest_row,
-                                           dest_col)
-            return new_matrix
+            result = Result.LOSS
+        else:
+            result = Result.DRAW
+
+        return result
 
-        return new_matrix
+    def arbitrate_challenge(self, start: int, destination: int,
+                            challenger_value: int, target_value: int):
+        """
+        This reflects challenge moves on the board by arbitrating the relative
+        values of the opposing pieces, and returns the result of the challenge.
+        """
+        result = Board.CHALLENGE_RESULTS[challenger_value - 1][target_value - 1]
+        if result == Result.WIN:
+            self._move_piece(start, destination)
+        elif result == Result.LOSS:
+            self.remove_piece(start)
+        else:
+            self.remove_piece(start)
+            self.remove_piece(destination)
 
-    def _move_piece_in_matrix(self, new_matrix: list[list[int]],
-                              action: str):
+        return result
+
+    def _move_piece(self, start: int, destination: int):
         """
-        This reflects non-challenge moves in a new matrix by moving the selected
-        piece in the presumably unoccupied destination square.
+        This reflects non-challenge moves by moving the selected piece to the
+        presumably unoccupied destination square.
         """
+        self._set_square(destination, self.squares[start])
+        self._set_square(start, Ranking.BLANK)
 
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        new_matrix[dest_row][dest_col] = (
-            self.matrix[start_row][start_col])
-        new_matrix[start_row][start_col] = Ranking.BLANK
+    def _flag_at_end(self, player: int):
+        """
+        This returns the column of the player's flag if it is in the row
+        furthest from the player's side (the eighth row for blue and the first
+        row for red), and None otherwise.
+        """
+        flag_square = self.flag_squares[player]
+        column = None  # Initialize return value
+        if flag_square is None:
+            return column
+        end_row_number = Board.ROWS - 1 if player == Player.BLUE else 0
+        if flag_square // Board.COLUMNS == end_row_number:
+            column = flag_square % Board.COLUMNS
 
-        return new_matrix
+        return column
 
-    def transition(self, action: str, *args, **kwargs):
+    def _end_row(self, player: int):
         """
-        This determines the next state based on the current state and the chosen
-        action.
+        This returns the squares in the row furthest from the player's side.
         """
-        _, _ = args, kwargs  # Stops the linter's complaints
+        return self._row(Board.ROWS - 1 if player == Player.BLUE else 0)
 
-        # Initialize the new game state
-        new_matrix = copy.deepcopy(self.matrix)
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        piece_to_move = self.matrix[start_row][start_col]
-        destination_square = self.matrix[dest_row][dest_col]
+    def _next_anticipations(self):
+        """
+        This determines the anticipation flags of the next state, which depend
+        on where the flags are before the move is made.
+        """
+        blue_flag_column = self._flag_at_end(Player.BLUE)
+        red_flag_column = self._flag_at_end(Player.RED)
+        player_anticipations = [False, False]  # Blue and red respectively
+        if (blue_flag_column is not None and not self.blue_anticipating
+            and not self.has_none_adjacent(
+                blue_flag_column, self._end_row(Player.BLUE))):
+            player_anticipations[0] = True
+        elif (red_flag_column is not None and not self.red_anticipating
+              and not self.has_none_adjacent(
+                  red_flag_column, self._end_row(Player.RED))):
+            player_anticipations[1] = True
+
+        return player_anticipations
+
+    def apply(self, action: int) -> MoveRecord:
+        """
+        This plays the action on the board itself rather than on a copy, and
+        returns the record that undo needs to take the action back. Tree
+        searches use this pair to walk the game tree without building a new
+        board for every node.
+        """
+        start, destination = Action.ORIGINS[action], Action.DESTINATIONS[action]
+        piece_to_move = self.squares[start]
+        destination_square = self.squares[destination]
+        record = MoveRecord(
+            start=start, destination=destination, moving_piece=piece_to_move,
+            target_piece=destination_square,
+            player_to_move=self.player_to_move,
+            blue_anticipating=self.blue_anticipating,
+            red_anticipating=self.red_anticipating, actions=self._actions,
+            zobrist=self.zobrist)
+        player_anticipations = self._next_anticipations()
 
         if destination_square == Ranking.BLANK:
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
+            self._move_piece(start, destination)
+            record.result = Result.OCCUPY
         elif self.player_to_move == Player.BLUE:
             # The Ranking.SPY offset allows the flattening of the board state
             # (see Ranking class for more details).
             red_piece_value = destination_square - Ranking.SPY
-            new_matrix = self.arbitrate_challenge(new_matrix, action,
-                                                  piece_to_move, red_piece_value
-                                                  )
+            record.result = self.arbitrate_challenge(
+                start, destination, piece_to_move, red_piece_value)
         elif self.player_to_move == Player.RED:
             red_piece_value = piece_to_move - Ranking.SPY
-            new_matrix = self.arbitrate_challenge(new_matrix, action,
-                                                  red_piece_value,
-                                                  destination_square
-                                                  )
-        blue_flag, red_flag = Ranking.FLAG, Ranking.FLAG + Ranking.SPY
-        player_anticipations = [False, False]  # Blue and red respectively
-        if (blue_flag in self.matrix[-1] and not self.blue_anticipating
-            and not self.has_none_adjacent(
-                self.matrix[-1].index(blue_flag), self.matrix[-1])):
-            player_anticipations[0] = True
-        elif (red_flag in self.matrix[0] and not self.red_anticipating
-              and not self.has_none_adjacent(
-                  self.matrix[0].index(0), self.matrix[0]
-        )):
-            player_anticipations[1] = True
+            record.result = self.arbitrate_challenge(
+                start, destination, red_piece_value, destination_square)
+
+        # The squares have already updated the hash
+        self.zobrist ^= Zobrist.RED_TO_MOVE
+        if player_anticipations[0] != self.blue_anticipating:
+            self.zobrist ^= Zobrist.BLUE_ANTICIPATING
+        if player_anticipations[1] != self.red_anticipating:
+            self.zobrist ^= Zobrist.RED_ANTICIPATING
 
-        return Board(new_matrix, player_to_move=(
-            Player.RED if self.player_to_move == Player.BLUE else Player.BLUE),
-            blue_anticipating=player_anticipations[0],
-            red_anticipating=player_anticipations[1])
+        self.player_to_move = (Player.RED if self.player_to_move == Player.BLUE
+                               else Player.BLUE)
+        self.blue_anticipating, self.red_anticipating = player_anticipations
+        self._actions = None
 
-    def _deduce_action_result(self, matrix_difference: list[list[int]],
-                              action: str):
+        return record
+
+    def undo(self, record: MoveRecord):
         """
-        This examines the characteristics of the difference matrix to classify
-        the result of the action in the board state.
+        This takes back an action previously played with apply.
         """
-        result = None  # Initialize return value
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        challenger_value, target_value = (self.matrix[start_row][start_col],
-                                          self.matrix[dest_row][dest_col])
-        # Deduce the result based on the difference matrix' characteristics
-        if (matrix_difference[start_row][start_col] == challenger_value
-                and matrix_difference[dest_row][dest_col] == target_value):
-            result = Result.DRAW
-        elif (matrix_difference[start_row][start_col] == challenger_value
-              and (matrix_difference[dest_row][dest_col] == (
-                target_value - challenger_value
-                  ) and self.matrix[dest_row][dest_col] == Ranking.BLANK)
-              ):
-            result = Result.OCCUPY
-        elif (matrix_difference[start_row][start_col] == challenger_value
-              and (matrix_difference[dest_row][dest_col] == (
-                target_value - challenger_value
-                  ) and self.matrix[dest_row][dest_col] != Ranking.BLANK)
-              ):
-            result = Result.WIN
-        elif (matrix_difference[start_row][start_col] == challenger_value
-                and matrix_difference[dest_row][dest_col] == Ranking.BLANK):
-            result = Result.LOSS
+        self._set_square(record.start, record.moving_piece)
+        self._set_square(record.destination, record.target_piece)
+        self.player_to_move = record.player_to_move
+        self.blue_anticipating = record.blue_anticipating
+        self.red_anticipating = record.red_anticipating
+        self._actions = record.actions
+        self.zobrist = record.zobrist
 
-        return result
+    def transition(self, action: int, *args, **kwargs):
+        """
+        This determines the next state based on the current state and the chosen
+        action.
+        """
+        _, _ = args, kwargs  # Stops the linter's complaints
 
-    def classify_action_result(self, action: str, new_board: 'Board'):
+        new_board, _ = self.transition_with_result(action)
+
+        return new_board
+
+    def transition_with_result(self, action: int) -> tuple['Board', int]:
+        """
+        This determines the next state along with the result of the action
+        (see constant definitions in the Result class), which the arbitration
+        of the move already decides.
+        """
+        new_board = self.copy()
+        record = new_board.apply(action)
+
+        return new_board, record.result
+
+    def classify_action_result(self, action: int, new_board: 'Board'):
         """
         This classifies action results as DRAW, WIN, LOSS (for challenge moves)
         or OCCUPY (for non-challenge moves), for use of the Infostate class'
-        transition function.
+        transition function. Only the two squares involved in the action are
+        compared.
         """
-        matrix_difference = [
-            [self.matrix[i][j] - new_board.matrix[i][j]
-             for j in range(Board.COLUMNS)] for i in range(Board.ROWS)]
+        start, destination = Action.ORIGINS[action], Action.DESTINATIONS[action]
+        challenger_value = self.squares[start]
+        if self.squares[destination] == Ranking.BLANK:
+            result = Result.OCCUPY
+        elif new_board.squares[destination] == challenger_value:
+            result = Result.WIN
+        elif new_board.squares[destination] == Ranking.BLANK:
+            result = Result.DRAW
+        else:
+            result = Result.LOSS
 
-        return self._deduce_action_result(matrix_difference, action)
+        return result
 
     def reward(self):
         """
-        This assigns a numerical value to terminal states. Initially, a positive 
-        reward indicates a blue win, negative reward indicates a red win, and a 
+        This assigns a numerical value to terminal states. Initially, a positive
+        reward indicates a blue win, negative reward indicates a red win, and a
         zero indicates a draw. The magnitude is then negated if the player to
         move is red to obtain the actual reward.
         """
-
-        blue_flag = Ranking.FLAG
-        red_flag = Ranking.FLAG + Ranking.SPY  # See ranking class for details
-        blue_end = 0
-        red_end = -1  # The first and last row numbers, respectively
         win_value = 1000000
 
         reward = 0  # Initialize return value
-        if self.piece_not_found(blue_flag):
+        if self.flag_squares[Player.BLUE] is None:
             reward = -win_value
-        elif self.piece_not_found(red_flag):
+        elif self.flag_squares[Player.RED] is None:
             reward = win_value
-        elif blue_flag in self.matrix[red_end] and self.blue_anticipating:
+        elif (self._flag_at_end(Player.BLUE) is not None
+              and self.blue_anticipating):
             # If the flag has already survived a turn in the board's red end
             reward = win_value
-        elif red_flag in self.matrix[blue_end] and self.red_anticipating:
+        elif (self._flag_at_end(Player.RED) is not None
+              and self.red_anticipating):
             # If the flag has already survived a turn in the board's blue end
             reward = -win_value
         else:
@@ -472,19 +649,8 @@ class Board:
         Initially, the value for the blue player is calculated, and the
         magnitude is negated if the current player is red.
         """
-        blue_sum = 0
-        red_sum = 0  # Initialize material sums
-
-        red_offset = Ranking.SPY  # See Ranking class for details
-
-        for row in self.matrix:
-            for piece in row:
-                if Ranking.PRIVATE <= piece <= Ranking.SPY:
-                    blue_sum += piece
-                elif Ranking.PRIVATE + red_offset <= piece <= red_offset*2:
-                    red_sum += piece - red_offset
-
-        advantage = blue_sum - red_sum
+        advantage = (self.material_sums[Player.BLUE]
+                     - self.material_sums[Player.RED])
         if self.player_to_move == Player.RED:
             advantage *= -1
 
@@ -510,6 +676,191 @@ class Board:
 
         return squares_within_radius
 
+
+def _enumerate_actions():
+    """
+    This lists the starting and destination coordinates of every action that
+    can occur in a game, in the order used for numbering the actions.
+    """
+    coordinates = []
+    for row in range(Board.ROWS):
+        for column in range(Board.COLUMNS):
+            for direction_row, direction_column in Action.DIRECTIONS:
+                new_row, new_column = (row + direction_row,
+                                       column + direction_column)
+                if 0 <= new_row < Board.ROWS and 0 <= new_column < Board.COLUMNS:
+                    coordinates.append((row, column, new_row, new_column))
+
+    return tuple(coordinates)
+
+
+class Action:
+    """
+    This class handles the integer encoding of actions. Every action that can
+    occur in a game is identified by a number from 0 to 253, enumerated from
+    the starting square (row by row) and then from the direction of movement.
+    The four-digit string form (start row, start column, destination row,
+    destination column) is only meant for display and for human input.
+    """
+
+    # Change in coordinates per direction (up, down, left, and right)
+    DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+    # These are filled in below, once the class can be referred to
+    COORDINATES: tuple[tuple[int, int, int, int]] = ()
+    ORIGINS: tuple[int] = ()
+    DESTINATIONS: tuple[int] = ()
+    LABELS: tuple[str] = ()
+    COUNT = 0
+
+    # The (destination square, action id) pairs of the moves out of each square
+    MOVES_FROM: tuple[tuple[tuple[int, int]]] = ()
+
+    _IDS: dict[tuple[int, int], int] = {}
+    _IDS_BY_LABEL: dict[str, int] = {}
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def between(start: int, destination: int) -> int:
+        """
+        This returns the id of the action moving a piece from the start square
+        to the destination square.
+        """
+        return Action._IDS[(start, destination)]
+
+    @staticmethod
+    def to_string(action: int) -> str:
+        """
+        This returns the four-digit string form of an action id.
+        """
+        return Action.LABELS[action]
+
+    @staticmethod
+    def from_string(label: str) -> int:
+        """
+        This returns the id of an action given in its four-digit string form,
+        or None if the string does not describe a possible action.
+        """
+        return Action._IDS_BY_LABEL.get(label)
+
+
+Action.COORDINATES = _enumerate_actions()
+Action.COUNT = len(Action.COORDINATES)
+Action.ORIGINS = tuple(start_row*Board.COLUMNS + start_col
+                       for start_row, start_col, _, _ in Action.COORDINATES)
+Action.DESTINATIONS = tuple(dest_row*Board.COLUMNS + dest_col
+                            for _, _, dest_row, dest_col in Action.COORDINATES)
+Action.LABELS = tuple("".join(map(str, coordinates))
+                      for coordinates in Action.COORDINATES)
+Action._IDS = {
+    (start, destination): action for action, (start, destination) in
+    enumerate(zip(Action.ORIGINS, Action.DESTINATIONS))}
+Action._IDS_BY_LABEL = {label: action
+                        for action, label in enumerate(Action.LABELS)}
+Action.MOVES_FROM = tuple(
+    tuple((destination, action) for action, (start, destination) in
+          enumerate(zip(Action.ORIGINS, Action.DESTINATIONS))
+          if start == square) for square in range(Board.SQUARES))
+Board.AFFILIATIONS = tuple(Board.get_piece_affiliation(piece)
+                           for piece in range(Ranking.SPY*2 + 1))
+Board.RANKS = (Ranking.BLANK,) + tuple(
+    piece if piece <= Ranking.SPY else piece - Ranking.SPY
+    for piece in range(Ranking.FLAG, Ranking.SPY*2 + 1))
+Board.MATERIAL_VALUES = tuple(rank if rank >= Ranking.PRIVATE else 0
+                              for rank in Board.RANKS)
+Board.CHALLENGE_RESULTS = tuple(
+    tuple(Board.get_challenge_result(challenger_value, target_value)
+          for target_value in range(Ranking.FLAG, Ranking.SPY + 1))
+    for challenger_value in range(Ranking.FLAG, Ranking.SPY + 1))
+
+
+class Zobrist:
+    """
+    This class holds the random 64-bit keys used for the Zobrist hashes of
+    boards and infostates. A hash is the XOR of the keys of everything in the
+    position, so a move only has to XOR out the old contents of the squares it
+    changes and XOR in the new ones. The keys are drawn from a fixed seed, so
+    that hashes agree between runs and between processes.
+    """
+
+    SEED = 0x01A
+
+    # Keys for each piece value on each square of the arbiter board, and for
+    # each rank floor and ceiling value (with red ranks offset by Ranking.SPY,
+    # as in the infostate matrix) on each square of an infostate. Blank
+    # squares have keys of 0, so they do not contribute to the hash. These
+    # are filled in below, once the class can be referred to.
+    PIECES: tuple[tuple[int]] = ()
+    FLOORS: tuple[tuple[int]] = ()
+    CEILINGS: tuple[tuple[int]] = ()
+    RED_TO_MOVE = 0
+    BLUE_ANTICIPATING = 0
+    RED_ANTICIPATING = 0
+    RED_OWNER = 0
+    ANTICIPATING = 0
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def hash_board(board: Board) -> int:
+        """
+        This computes the hash of an arbiter board from scratch.
+        """
+        zobrist = 0  # Initialize return value
+        for square, piece in enumerate(board.squares):
+            zobrist ^= Zobrist.PIECES[square][piece]
+        if board.player_to_move == Player.RED:
+            zobrist ^= Zobrist.RED_TO_MOVE
+        if board.blue_anticipating:
+            zobrist ^= Zobrist.BLUE_ANTICIPATING
+        if board.red_anticipating:
+            zobrist ^= Zobrist.RED_ANTICIPATING
+
+        return zobrist
+
+    @staticmethod
+    def hash_infostate(infostate: 'Infostate') -> int:
+        """
+        This computes the hash of an infostate from scratch.
+        """
+        zobrist = 0  # Initialize return value
+        flattened = infostate.flatten()
+        for square in range(Board.SQUARES):
+            floor, ceiling = flattened[2*square], flattened[2*square + 1]
+            zobrist ^= Zobrist.FLOORS[square][floor]
+            zobrist ^= Zobrist.CEILINGS[square][ceiling]
+        if infostate.player_to_move == Player.RED:
+            zobrist ^= Zobrist.RED_TO_MOVE
+        if infostate.owner == Player.RED:
+            zobrist ^= Zobrist.RED_OWNER
+        if infostate.anticipating:
+            zobrist ^= Zobrist.ANTICIPATING
+
+        return zobrist
+
+    @staticmethod
+    def _square_keys(generator: random.Random):
+        """
+        This draws a key for every nonblank value on every square.
+        """
+        return tuple(
+            (0,) + tuple(generator.getrandbits(64)
+                         for _ in range(Ranking.SPY*2))
+            for _ in range(Board.SQUARES))
+
+
+_zobrist_generator = random.Random(Zobrist.SEED)
+Zobrist.PIECES = Zobrist._square_keys(_zobrist_generator)
+Zobrist.FLOORS = Zobrist._square_keys(_zobrist_generator)
+Zobrist.CEILINGS = Zobrist._square_keys(_zobrist_generator)
+(Zobrist.RED_TO_MOVE, Zobrist.BLUE_ANTICIPATING, Zobrist.RED_ANTICIPATING,
+ Zobrist.RED_OWNER, Zobrist.ANTICIPATING) = (
+    _zobrist_generator.getrandbits(64) for _ in range(5))
+
+
 @dataclass
 class InfostatePiece:
     """
@@ -521,25 +872,49 @@ class InfostatePiece:
     rank_ceiling: int
 
 
-class Infostate(Board):
+class Infostate:
     """
     This represents the current game state as seen by either of the players.
+    It keeps its own buffers rather than the arbiter's squares, so it is not a
+    Board, although it shares the board's square numbering and the player to
+    move.
     """
 
-    def __init__(self, abstracted_board: list[list[InfostatePiece]], owner: int,
-                 player_to_move: int, anticipating=bool):
+    # The offset of each color's rank values in the infostate matrix (see
+    # Ranking class for details), indexed by player color
+    OFFSETS = (0, 0, Ranking.SPY)
+
+    __slots__ = ('colors', 'rank_floors', 'rank_ceilings', 'owner',
+                 'player_to_move', 'anticipating', 'flag_square', 'zobrist')
+
+    def __init__(self, pieces: tuple[bytearray, bytearray, bytearray],
+                 owner: int, player_to_move: int, anticipating: bool,
+                 zobrist: int = None):
         """
         In contrast to the arbiter board, the infostate must belong to strictly
         one of the players, and the value of the anticipating attribute depends
         on the location of the infostate owner's flag.
+
+        The pieces are given as three buffers over the squares of the board
+        (numbered as in the Board class): the color of each piece (see Player
+        class, with Player.ARBITER for blank squares), and the lowest and
+        highest rank it can have (without the red offset). The square of the
+        owner's flag is tracked so that it never has to be searched for.
+
+        The zobrist parameter is for passing a hash that was already updated
+        incrementally; it is computed from scratch when omitted.
         """
-        super().__init__(matrix=None, player_to_move=player_to_move,
-                         blue_anticipating=False, red_anticipating=False)
+        self.colors, self.rank_floors, self.rank_ceilings = pieces
         self.owner = owner
-        # Override attributes of the parent board class
-        self.matrix = Infostate._to_matrix(infostate_board=abstracted_board)
+        self.player_to_move = player_to_move
         self.anticipating = anticipating
-        self.abstracted_board = abstracted_board
+        self.flag_square = None
+        for square, color in enumerate(self.colors):
+            if (color == owner
+                    and self.rank_floors[square] == Ranking.FLAG):
+                self.flag_square = square
+        self.zobrist = (Zobrist.hash_infostate(self) if zobrist is None
+                        else zobrist)
 
     def print_state(self, *args, **kwargs):
         """
@@ -549,162 +924,145 @@ class Infostate(Board):
         printer = InfostatePrinter(params=StatePrinterParams(infostate=self))
         printer.print_state()
 
-    @staticmethod
-    def _to_matrix(infostate_board: list[list[InfostatePiece]]):
-        infostate_matrix = [[[0, 0] for col in range(Board.COLUMNS)]
-                            for row in range(Board.ROWS)]
-        for i, row in enumerate(infostate_board):
-            for j, piece in enumerate(row):
-                if piece.color == Player.BLUE:
-                    infostate_matrix[i][j] = [piece.rank_floor,
-                                              piece.rank_ceiling]
-                elif piece.color == Player.RED:
-                    infostate_matrix[i][j] = [piece.rank_floor + Ranking.SPY,
-                                              piece.rank_ceiling + Ranking.SPY]
-
-        return infostate_matrix
+    @property
+    def matrix(self) -> list[list[list[int]]]:
+        """
+        This returns the [floor, ceiling] entry of each square arranged as a
+        matrix, with red ranks offset by Ranking.SPY.
+        """
+        flattened = self.flatten()
+
+        return [[flattened[2*square:2*square + 2]
+                 for square in range(row*Board.COLUMNS,
+                                     (row + 1)*Board.COLUMNS)]
+                for row in range(Board.ROWS)]
+
+    @property
+    def abstracted_board(self) -> list[list[InfostatePiece]]:
+        """
+        This returns a copy of the pieces arranged as a matrix of
+        InfostatePiece instances.
+        """
+        return [[InfostatePiece(color=self.colors[square],
+                                rank_floor=self.rank_floors[square],
+                                rank_ceiling=self.rank_ceilings[square])
+                 for square in range(row*Board.COLUMNS,
+                                     (row + 1)*Board.COLUMNS)]
+                for row in range(Board.ROWS)]
+
+    def entry(self, square: int) -> tuple[int, int]:
+        """
+        This returns the floor and ceiling of a square as they appear in the
+        infostate matrix.
+        """
+        offset = Infostate.OFFSETS[self.colors[square]]
+
+        return (self.rank_floors[square] + offset,
+                self.rank_ceilings[square] + offset)
 
     @staticmethod
     def at_start(owner: int, board: Board) -> 'Infostate':
         """
         This creates the starting infostate for either of the players.
         """
-        infostate_board = copy.deepcopy(board.matrix)  # Initialize the board
+        colors, rank_floors, rank_ceilings = (
+            bytearray(Board.SQUARES), bytearray(Board.SQUARES),
+            bytearray(Board.SQUARES))  # Initialize the buffers as blank
         opponent = (Player.RED if owner == Player.BLUE else Player.BLUE)
-        offset = 0 if owner == Player.BLUE else Ranking.SPY  # For red pieces
-        for i, row in enumerate(board.matrix):
-            for j, entry in enumerate(row):
-                # Set initial value bounds for the pieces
-                if entry == Ranking.BLANK:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=Player.ARBITER, rank_floor=Ranking.BLANK,
-                        rank_ceiling=Ranking.BLANK)
-                elif Infostate.get_piece_affiliation(piece=entry) == owner:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=owner, rank_floor=entry - offset,
-                        rank_ceiling=entry - offset
-                    )
-                elif Infostate.get_piece_affiliation(piece=entry) != owner:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=opponent, rank_floor=Ranking.FLAG,
-                        rank_ceiling=Ranking.SPY
-                    )
-
-        return Infostate(abstracted_board=infostate_board, owner=owner,
-                         player_to_move=Player.BLUE, anticipating=False)
+        offset = Infostate.OFFSETS[owner]  # For red pieces
+        for square, entry in enumerate(board.squares):
+            # Set initial value bounds for the pieces
+            if entry == Ranking.BLANK:
+                continue
+            if Board.get_piece_affiliation(piece=entry) == owner:
+                colors[square] = owner
+                rank_floors[square] = rank_ceilings[square] = entry - offset
+            else:
+                colors[square] = opponent
+                rank_floors[square] = Ranking.FLAG
+                rank_ceilings[square] = Ranking.SPY
 
-    @staticmethod
-    def _remove_piece(board: list[list[InfostatePiece]],
-                      entry_location: tuple[int]):
-        entry_row, entry_col = entry_location
+        return Infostate(pieces=(colors, rank_floors, rank_ceilings),
+                         owner=owner, player_to_move=Player.BLUE,
+                         anticipating=False)
 
-        board[entry_row][entry_col] = InfostatePiece(color=Player.ARBITER,
-                                                     rank_floor=Ranking.BLANK,
-                                                     rank_ceiling=Ranking.BLANK)
+    def _copy(self) -> 'Infostate':
+        """
+        This returns a copy of the infostate with its own buffers, for the
+        transition to modify.
+        """
+        infostate = Infostate.__new__(Infostate)
+        infostate.colors = self.colors[:]
+        infostate.rank_floors = self.rank_floors[:]
+        infostate.rank_ceilings = self.rank_ceilings[:]
+        infostate.owner = self.owner
+        infostate.player_to_move = self.player_to_move
+        infostate.anticipating = self.anticipating
+        infostate.flag_square = self.flag_square
+        infostate.zobrist = self.zobrist
 
-        return board
+        return infostate
 
-    @staticmethod
-    def _remove_pieces(board: list[list[InfostatePiece]],
-                       locs: tuple[tuple[int]]):
-        start_row, start_col = locs[0]
-        dest_row, dest_col = locs[1]
-
-        matrix = Infostate._remove_piece(board=board, entry_location=(
-            start_row,
-            start_col))
-        matrix = Infostate._remove_piece(board=board, entry_location=(
-            dest_row,
-            dest_col
-        ))
-        return matrix
-
-    def _move_piece(self, board: list[list[InfostatePiece]],
-                    start: tuple[int], end: tuple[int]):
-        """
-        This reflects a move in an infostate in an infostate matrix.
-        """
-        start_row, start_col = start[0], start[1]
-        dest_row, dest_col = end[0], end[1]
-
-        board[dest_row][dest_col].rank_floor = board[
-            start_row][start_col].rank_floor
-        board[dest_row][dest_col].rank_ceiling = board[
-            start_row][start_col].rank_ceiling
-        board[dest_row][dest_col].color = board[start_row][
-            start_col].color
-        board[start_row][start_col] = InfostatePiece(color=Player.ARBITER,
-                                                     rank_floor=Ranking.BLANK,
-                                                     rank_ceiling=Ranking.BLANK)
+    def _remove_piece(self, square: int):
+        """
+        This blanks a square of the infostate.
+        """
+        self.colors[square] = Player.ARBITER
+        self.rank_floors[square] = self.rank_ceilings[square] = Ranking.BLANK
 
-        return board
+    def _move_piece(self, start: int, destination: int):
+        """
+        This reflects a move in the infostate.
+        """
+        self.colors[destination] = self.colors[start]
+        self.rank_floors[destination] = self.rank_floors[start]
+        self.rank_ceilings[destination] = self.rank_ceilings[start]
+        self._remove_piece(start)
 
-    def _piece_is_owned(self, row: int, col: int):
+    def _piece_is_owned(self, square: int):
         """
-        Determines if the piece at the specified row and column in the infostate 
+        Determines if the piece at the specified square in the infostate
         belongs to the owner of the infostate.
         """
-        return self.abstracted_board[row][col].color == self.owner
+        return self.colors[square] == self.owner
 
-    @staticmethod
-    def _update_val(board: list[list[InfostatePiece]], to_update: tuple[int],
-                    source: tuple[int]):
+    def _update_val(self, to_update: int, source: int):
         """
-        This sets a new value to the range of an unidentified piece in a copy of 
-        the infostate piece board. This value is calculated from the value of 
-        the associated opposing piece involved in the action.
+        This sets a new value to the range of an unidentified piece. This value
+        is calculated from the value of the associated opposing piece involved
+        in the action.
         """
-
-        update_row, update_col, source_row, source_col = (to_update[0],
-                                                          to_update[1],
-                                                          source[0], source[1])
-
         # Deal with the SPY vs PRIVATE edge cases
-        if board[source_row][source_col].rank_floor == Ranking.SPY:
-            board[update_row][update_col].rank_floor = Ranking.PRIVATE
-            board[update_row][update_col].rank_ceiling = Ranking.PRIVATE
+        if self.rank_floors[source] == Ranking.SPY:
+            self.rank_floors[to_update] = Ranking.PRIVATE
+            self.rank_ceilings[to_update] = Ranking.PRIVATE
         else:
-            board[update_row][update_col].rank_floor = (
-                board[source_row][source_col].rank_ceiling + 1)
-
-        return board
-
-    def _find_flag(self, board: list[list[InfostatePiece]]):
-        """
-        This finds the infostate owner's flag, useful for setting the
-        anticipating attribute.
-        """
-        for i, row in enumerate(board):
-            for j, piece in enumerate(row):
-                if (piece.color == self.owner
-                        and piece.rank_floor == Ranking.FLAG):
-                    return (i, j)
-
-        return None
+            self.rank_floors[to_update] = self.rank_ceilings[source] + 1
 
     @staticmethod
-    def _is_vacant(column_number: int, end_row: list[InfostatePiece], direction: int):
+    def _is_vacant(column_number: int, end_row: bytearray, direction: int):
         """
-        Checks if the square in the given direction of a column in a row is blank.
+        Checks if the square in the given direction of a column in a row of
+        piece colors is blank.
         """
-        return end_row[column_number + direction].color == Player.ARBITER
+        return end_row[column_number + direction] == Player.ARBITER
 
     @staticmethod
-    def is_vacant_to_the_right(column_number: int, end_row: list[InfostatePiece]):
+    def is_vacant_to_the_right(column_number: int, end_row: bytearray):
         """
         Checks if the square to the right of a given column in a row is blank.
         """
         return Infostate._is_vacant(column_number, end_row, direction=1)
 
     @staticmethod
-    def is_vacant_to_the_left(column_number: int, end_row: list[InfostatePiece]):
+    def is_vacant_to_the_left(column_number: int, end_row: bytearray):
         """
         Checks if the square to the left of a given column in a row is blank.
         """
         return Infostate._is_vacant(column_number, end_row, direction=-1)
 
     @staticmethod
-    def has_none_adjacent(column_number: int, end_row: list[InfostatePiece]):
+    def has_none_adjacent(column_number: int, end_row: bytearray):
         """
         This checks if a given column in a row has blank square neighbors.
         """
@@ -729,80 +1087,96 @@ class Infostate(Board):
 
         return result
 
-    def transition(self, action: str, *args, **kwargs):
+    def _track_flag(self, square: int):
+        """
+        This updates the location of the owner's flag after the contents of
+        the given square have changed.
+        """
+        if (self.colors[square] == self.owner
+                and self.rank_floors[square] == Ranking.FLAG):
+            self.flag_square = square
+        elif self.flag_square == square:
+            self.flag_square = None
+
+    def transition(self, action: int, *args, **kwargs):
         """
         This obtains the next infostate based on the provided action and the
-        result classification of the action.
+        result classification of the action. Only the two squares involved in
+        the action are modified in the copied buffers.
         """
         _ = args  # Stops the linter's complaints
-        new_board = copy.deepcopy(self.abstracted_board)
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
+        start, dest = Action.ORIGINS[action], Action.DESTINATIONS[action]
         # Find the action's result in the keyword arguments
         result = kwargs['result'] if 'result' in kwargs else None
+        new_infostate = self._copy()
 
         if result == Result.DRAW:
-            new_board = Infostate._remove_pieces(board=new_board, locs=(
-                (start_row, start_col), (dest_row, dest_col)))
-
-        elif (result == Result.WIN
-              and self._piece_is_owned(row=start_row, col=start_col)):
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
-
-        elif (result == Result.WIN
-              and not self._piece_is_owned(row=start_row, col=start_col)):
-            new_board = Infostate._update_val(board=new_board,
-                                              to_update=(start_row, start_col),
-                                              source=(dest_row, dest_col))
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
+            new_infostate._remove_piece(start)
+            new_infostate._remove_piece(dest)
+
+        elif result == Result.WIN and self._piece_is_owned(start):
+            new_infostate._move_piece(start, dest)
+
+        elif result == Result.WIN and not self._piece_is_owned(start):
+            new_infostate._update_val(to_update=start, source=dest)
+            new_infostate._move_piece(start, dest)
 
         elif result == Result.OCCUPY:
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
-
-        elif (result == Result.LOSS
-              and self._piece_is_owned(dest_row, dest_col)):
-            new_board = Infostate._remove_piece(
-                board=new_board, entry_location=(start_row, start_col))
-
-        elif (result == Result.LOSS
-              and not self._piece_is_owned(row=dest_row, col=dest_col)):
-            new_board = Infostate._update_val(board=new_board,
-                                              to_update=(dest_row, dest_col),
-                                              source=(start_row, start_col))
-            new_board = Infostate._remove_piece(
-                board=new_board, entry_location=(start_row, start_col))
+            new_infostate._move_piece(start, dest)
+
+        elif result == Result.LOSS and self._piece_is_owned(dest):
+            new_infostate._remove_piece(start)
+
+        elif result == Result.LOSS and not self._piece_is_owned(dest):
+            new_infostate._update_val(to_update=dest, source=start)
+            new_infostate._remove_piece(start)
+
+        new_infostate._track_flag(start)
+        new_infostate._track_flag(dest)
 
         anticipation = self.anticipating
-        flag_loc = self._find_flag(board=new_board)
-        if flag_loc is None:
+        flag_square = new_infostate.flag_square
+        if flag_square is None:
             anticipation = False
-        elif (self.owner == Player.BLUE and flag_loc[0] == Infostate.ROWS - 1
-              and not self.anticipating
-              and self.has_none_adjacent(column_number=flag_loc[1],
-                                         end_row=new_board[-1])):
-            anticipation = True
-        elif (self.owner == Player.RED and flag_loc[0] == 0
-              and not self.anticipating
-              and self.has_none_adjacent(column_number=flag_loc[1],
-                                         end_row=new_board[0])):
-            anticipation = True
-
-        return Infostate(abstracted_board=new_board, owner=self.owner,
-                         player_to_move=(
-                             Player.RED if self.player_to_move == Player.BLUE
-                             else Player.BLUE), anticipating=anticipation)
+        else:
+            flag_row, flag_column = divmod(flag_square, Board.COLUMNS)
+            end_row_number = Board.ROWS - 1 if self.owner == Player.BLUE else 0
+            end_row = new_infostate.colors[
+                end_row_number*Board.COLUMNS:(end_row_number + 1)*Board.COLUMNS]
+            if (flag_row == end_row_number and not self.anticipating
+                    and self.has_none_adjacent(column_number=flag_column,
+                                               end_row=end_row)):
+                anticipation = True
+
+        new_infostate.player_to_move = (
+            Player.RED if self.player_to_move == Player.BLUE else Player.BLUE)
+        new_infostate.anticipating = anticipation
+
+        # Only the two squares involved in the action have changed
+        zobrist = self.zobrist ^ Zobrist.RED_TO_MOVE
+        floor_keys, ceiling_keys = Zobrist.FLOORS, Zobrist.CEILINGS
+        for square in (start, dest):
+            floor, ceiling = self.entry(square)
+            new_floor, new_ceiling = new_infostate.entry(square)
+            zobrist ^= (floor_keys[square][floor] ^ floor_keys[square][new_floor]
+                        ^ ceiling_keys[square][ceiling]
+                        ^ ceiling_keys[square][new_ceiling])
+        if anticipation != self.anticipating:
+            zobrist ^= Zobrist.ANTICIPATING
+        new_infostate.zobrist = zobrist
+
+        return new_infostate
 
     def flatten(self):
         """
         This converts the infostate matrix to a list.
         """
-        flattened = [
-            rank_range for row in self.matrix
-            for piece in row for rank_range in piece]
+        offsets = Infostate.OFFSETS
+        flattened = []
+        for color, floor, ceiling in zip(self.colors, self.rank_floors,
+                                         self.rank_ceilings):
+            flattened.append(floor + offsets[color])
+            flattened.append(ceiling + offsets[color])
 
         return flattened
 
@@ -830,9 +1204,19 @@ class StatePrinterParams:
 
 class BoardPrinter:
     """
-    This class handles the printing of the board state.
+    This class handles the printing of the board state. Each state is built
+    into a single string (a frame) from precomputed tables, and written to the
+    terminal with one call.
     """
 
+    # These are filled in below, once the class can be referred to
+    # The label of each piece value (see Ranking class), None for blanks
+    LABELS: tuple[str] = ()
+    # The text of each piece value's square, by (pov, with_color) pair
+    SQUARES: dict[tuple[int, bool], tuple[str]] = {}
+    ROW_NUMBERS: tuple[str] = ()
+    COLUMN_NUMBERS = ""
+
     def __init__(self, params: StatePrinterParams):
         self.args = params
 
@@ -844,36 +1228,6 @@ class BoardPrinter:
         """
         return f"\033[{color_code}m{text:2}\033[0m"
 
-    @staticmethod
-    def _print_number_of_row(i: int):
-        """
-        This is for labelling the row with its number.
-        """
-        print(f"{i:2}", end='  ')
-
-    @staticmethod
-    def _print_square(contents: str):
-        """
-        This is for printing the contents of a square on the board.
-        """
-        print(contents, end=' ')
-
-    @staticmethod
-    def _print_blank_square():
-        """
-        This is for representing blank squares in the printed board.
-        """
-        BoardPrinter._print_square(" -")
-
-    @staticmethod
-    def _print_column_numbers():
-        """
-        This is for printing the column numbers below the board.
-        """
-        print("\n    ", end='')
-        for k in range(Board.COLUMNS):
-            print(f"{k:2}", end=' ')
-
     @staticmethod
     def label_piece_by_team(piece: int):
         """
@@ -881,14 +1235,64 @@ class BoardPrinter:
         represent the piece.
         """
         labelled_piece = None  # Initialize return value
-        if Board.get_piece_affiliation(piece) == Player.BLUE:
+        affiliation = Board.get_piece_affiliation(piece)
+        if affiliation == Player.BLUE:
             labelled_piece = "b" + get_hex_uppercase_string(piece)
-        elif Board.get_piece_affiliation(piece) == Player.RED:
+        elif affiliation == Player.RED:
             labelled_piece = "r" + get_hex_uppercase_string(
                 piece - Ranking.SPY)
 
         return labelled_piece
 
+    @staticmethod
+    def _square_table(pov: int, with_color: bool) -> tuple[str]:
+        """
+        This returns the text of the square holding each piece value. Only the
+        world's pov shows the pieces; the others show the blank squares alone.
+        """
+        # Color codes for printing colored text
+        blue, red = "34", "31"
+
+        # Shorthands for piece rankings
+        blue_flag, red_flag = Board.get_flag_values()
+
+        squares = []
+        for entry, labelled_entry in enumerate(BoardPrinter.LABELS):
+            if entry == Ranking.BLANK:
+                squares.append(" - ")
+            elif entry == blue_flag and pov == POV.WORLD and with_color:
+                squares.append(
+                    BoardPrinter._get_colored(labelled_entry, blue) + " ")
+            elif entry == red_flag and pov == POV.WORLD and with_color:
+                squares.append(
+                    BoardPrinter._get_colored(labelled_entry, red) + " ")
+            elif pov == POV.WORLD:
+                # Prints two chars wide
+                squares.append(f"{labelled_entry:2} ")
+            else:
+                squares.append("")
+
+        return tuple(squares)
+
+    def frame(self, pov: int, with_color: bool) -> str:
+        """
+        This returns the text that print_state writes to the terminal.
+        """
+        squares = BoardPrinter.SQUARES.get((pov, with_color))
+        if squares is None:
+            squares = BoardPrinter._square_table(pov, with_color)
+        board = self.args.board.squares
+
+        parts = ["\n"]  # Starts the board to a new line
+        for i in range(Board.ROWS):
+            parts.append(BoardPrinter.ROW_NUMBERS[i])
+            parts.extend(squares[entry] for entry in
+                         board[i*Board.COLUMNS:(i + 1)*Board.COLUMNS])
+            parts.append("\n")
+        parts.append(BoardPrinter.COLUMN_NUMBERS)
+
+        return "".join(parts)
+
     def print_state(self, pov: int, with_color: bool):
         """
         This displays the state represented by the Board instance to the
@@ -897,33 +1301,7 @@ class BoardPrinter:
         parameter determines whether the blue and red flags are colored
         appropriately for easier identification.
         """
-
-        # Color codes for printing colored text
-        blue, red = "34", "31"
-
-        # Shorthands for piece rankings
-        blue_flag, red_flag = self.args.board.get_flag_values()
-
-        print()  # Starts the board to a new line
-        for i, row in enumerate(self.args.board.matrix):
-            BoardPrinter._print_number_of_row(i)
-            for entry in row:
-                labelled_entry = self.label_piece_by_team(
-                    piece=entry)
-                if entry == Ranking.BLANK:
-                    BoardPrinter._print_blank_square()
-                elif entry == blue_flag and pov == POV.WORLD and with_color:
-                    BoardPrinter._print_square(
-                        BoardPrinter._get_colored(labelled_entry, blue))
-                elif entry == red_flag and pov == POV.WORLD and with_color:
-                    BoardPrinter._print_square(
-                        BoardPrinter._get_colored(labelled_entry, red))
-                elif pov == POV.WORLD:
-                    # Prints two chars wide
-                    BoardPrinter._print_square(f"{labelled_entry:2}")
-            print()  # Moves the next row to the next line
-        BoardPrinter._print_column_numbers()
-        print()  # Move the output after the board to a new line
+        sys.stdout.write(self.frame(pov=pov, with_color=with_color))
 
 
 class InfostatePrinter(BoardPrinter):
@@ -931,49 +1309,52 @@ class InfostatePrinter(BoardPrinter):
     This class handles the printing of the infostate.
     """
 
-    @staticmethod
-    def _print_blank_square():
-        """
-        This is for representing blank squares in the printed infostate.
-        """
-        BoardPrinter._print_square("[-----]")
-
-    @staticmethod
-    def _print_column_numbers():
-        """
-        This is for printing the column numbers below the board.
-        """
-        print("\n ", end='')
-        for k in range(Board.COLUMNS):
-            print(f"{k:7}", end=' ')
+    COLUMN_NUMBERS = ("\n " + "".join(f"{k:7} " for k in range(Board.COLUMNS))
+                      + "\n")
 
-    def print_state(self, *args, **kwargs):
+    def frame(self, *args, **kwargs) -> str:
         """
-        This prints the state as seen by either of the players in the terminal.
+        This returns the text that print_state writes to the terminal.
         """
-
         _, _ = args, kwargs  # Silences the linter's complaints
-
-        print()  # Starts the board to a new line
-        for i, row in enumerate(self.args.infostate.matrix):
-            self._print_number_of_row(i)
-            for entry in row:
-                lowest_possible, highest_possible = entry[0], entry[1]
-                # Label both sides of the entry range
-                labelled_entry = [self.label_piece_by_team(
-                    piece=lowest_possible),
-                    self.label_piece_by_team(
-                    piece=highest_possible)]
+        labels = BoardPrinter.LABELS
+        flattened = self.args.infostate.flatten()
+
+        parts = ["\n"]  # Starts the board to a new line
+        for i in range(Board.ROWS):
+            parts.append(BoardPrinter.ROW_NUMBERS[i])
+            for square in range(i*Board.COLUMNS, (i + 1)*Board.COLUMNS):
+                lowest_possible, highest_possible = flattened[2*square:2*square + 2]
                 if (highest_possible == Ranking.BLANK
                         and lowest_possible == Ranking.BLANK):
-                    self._print_blank_square()
+                    parts.append("[-----] ")
                 else:
-                    # Prints two chars wide
-                    self._print_square(
-                        f"({labelled_entry[0]},{labelled_entry[1]})")
-            print("\n")  # Moves the next row to the next line
-        self._print_column_numbers()
-        print()  # Move the output after the board to a new line
+                    # Label both sides of the entry range
+                    parts.append(f"({labels[lowest_possible]},"
+                                 f"{labels[highest_possible]}) ")
+            parts.append("\n\n")  # Moves the next row to the next line
+        parts.append(InfostatePrinter.COLUMN_NUMBERS)
 
         if self.args.infostate.anticipating:
-            print("\n[WAITING IF OPPONENT CHALLENGES]\n")
+            parts.append("\n[WAITING IF OPPONENT CHALLENGES]\n\n")
+
+        return "".join(parts)
+
+    def print_state(self, *args, **kwargs):
+        """
+        This prints the state as seen by either of the players in the terminal.
+        """
+        _, _ = args, kwargs  # Silences the linter's complaints
+        sys.stdout.write(self.frame())
+
+
+BoardPrinter.LABELS = tuple(BoardPrinter.label_piece_by_team(piece)
+                            for piece in range(2*Ranking.SPY + 1))
+BoardPrinter.SQUARES = {
+    (pov, with_color): BoardPrinter._square_table(pov, with_color)
+    for pov in [POV.WORLD, POV.BLUE, POV.RED, None]
+    for with_color in [False, True]}
+BoardPrinter.ROW_NUMBERS = tuple(f"{i:2}  " for i in range(Board.ROWS))
+BoardPrinter.COLUMN_NUMBERS = ("\n    "
+                               + "".join(f"{k:2} " for k in range(Board.COLUMNS))
+                               + "\n")
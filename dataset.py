@@ -0,0 +1,441 @@
+"""
+This contains the storage formats of the AI's training data.
+"""
+
+import csv
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core import Action, Board, Infostate
+
+
+class SampleFormat:
+    """
+    This describes the binary format of the training samples. Each sample is a
+    record of the infostate features (the flattened infostate matrix followed
+    by the player to move, the owner and the anticipation flag, as in the CSV
+    format) and the policy over every action id.
+
+    The policy is either dense, or sparse as a fixed number of (action id,
+    probability) pairs holding its nonzero entries, padded with the PADDING
+    action id and zero probabilities.
+    """
+
+    FEATURES = 2*Board.SQUARES + 3
+    POLICY = Action.COUNT
+    # A player has at most 21 pieces, each with at most 4 moves
+    MAX_ACTIONS = 84
+    PADDING = Action.COUNT
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def dtype(policy_dtype=np.float16, sparse_width: int = None) -> np.dtype:
+        """
+        This returns the record type of a sample with the given policy
+        precision, which is sparse if its width is given.
+        """
+        features = ('features', np.int8, (SampleFormat.FEATURES,))
+        if sparse_width is None:
+            return np.dtype([features,
+                             ('policy', policy_dtype, (SampleFormat.POLICY,))])
+
+        return np.dtype([features, ('actions', np.uint8, (sparse_width,)),
+                         ('probabilities', policy_dtype, (sparse_width,))])
+
+    @staticmethod
+    def is_sparse(records: np.ndarray) -> bool:
+        """
+        This checks if sample records have a sparse policy.
+        """
+        return 'actions' in records.dtype.names
+
+    @staticmethod
+    def sparsify(policy: np.ndarray, width: int):
+        """
+        This returns the (action id, probability) pairs of a policy's nonzero
+        entries, padded to the given width. If there are more entries than
+        that, only the most probable are kept and renormalized.
+        """
+        actions = np.flatnonzero(policy)
+        probabilities = policy[actions]
+        if len(actions) > width:
+            kept = np.sort(np.argsort(probabilities)[-width:])
+            actions, probabilities = actions[kept], probabilities[kept]
+            probabilities = probabilities/probabilities.sum()
+        padded_actions = np.full(width, SampleFormat.PADDING, dtype=np.uint8)
+        padded_probabilities = np.zeros(width, dtype=np.float32)
+        padded_actions[:len(actions)] = actions
+        padded_probabilities[:len(actions)] = probabilities
+
+        return padded_actions, padded_probabilities
+
+    @staticmethod
+    def expand(actions: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+        """
+        This converts sparse policies (a single one, or one per row) back to
+        dense single precision policies over every action id.
+        """
+        policies = np.zeros(actions.shape[:-1] + (SampleFormat.POLICY + 1,),
+                            dtype=np.float32)
+        # The padding pairs land in the extra last column
+        np.put_along_axis(policies, actions.astype(np.intp), probabilities,
+                          axis=-1)
+
+        return policies[..., :SampleFormat.POLICY]
+
+    @staticmethod
+    def policies(records: np.ndarray) -> np.ndarray:
+        """
+        This returns the dense single precision policies of sample records.
+        """
+        if SampleFormat.is_sparse(records):
+            return SampleFormat.expand(records['actions'],
+                                       records['probabilities'])
+
+        return np.array(records['policy'], dtype=np.float32)
+
+    @staticmethod
+    def features(infostate: Infostate) -> np.ndarray:
+        """
+        This encodes an infostate as it appears in a sample.
+        """
+        features = np.empty(SampleFormat.FEATURES, dtype=np.int8)
+        offsets = np.array(Infostate.OFFSETS, dtype=np.int8)[
+            np.frombuffer(infostate.colors, dtype=np.uint8)]
+        squares = 2*Board.SQUARES
+        features[0:squares:2] = np.frombuffer(
+            infostate.rank_floors, dtype=np.int8) + offsets
+        features[1:squares:2] = np.frombuffer(
+            infostate.rank_ceilings, dtype=np.int8) + offsets
+        features[squares:] = (infostate.player_to_move, infostate.owner,
+                              int(infostate.anticipating))
+
+        return features
+
+
+class SampleWriter:
+    """
+    This writes training samples to a shard in the .npy format, which is
+    preallocated for the given number of samples and filled in buffered
+    chunks. The header of the shard is rewritten for the samples written on
+    every flush, so load_shard only ever sees the flushed samples, even if the
+    writer never closes. Closing the writer also drops the unused records. The
+    policies are stored sparsely if a width is given (see SampleFormat class).
+    """
+
+    def __init__(self, path: str, capacity: int, policy_dtype=np.float16,
+                 chunk_size: int = 1024, sparse_width: int = None,
+                 growth: int = None):
+        """
+        A full shard refuses further samples, unless a growth is given, in
+        which case it is extended by that many records at a time.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.growth = growth
+        self.sparse_width = sparse_width
+        self.count = 0  # Number of samples in the shard, including the chunk
+        self.records = np.lib.format.open_memmap(
+            path, mode='w+',
+            dtype=SampleFormat.dtype(policy_dtype, sparse_width=sparse_width),
+            shape=(capacity,))
+        self.chunk = np.zeros(chunk_size, dtype=self.records.dtype)
+        self.chunk_count = 0
+        # The preallocated records are not samples until they are flushed
+        SampleWriter._write_header(path, offset=self.records.offset,
+                                   dtype=self.records.dtype, count=0)
+
+    def write(self, infostate: Infostate, policy: np.ndarray):
+        """
+        This adds a sample with the given policy over every action id.
+        """
+        self.write_features(SampleFormat.features(infostate), policy)
+
+    def write_features(self, features: np.ndarray, policy: np.ndarray):
+        """
+        This adds a sample whose infostate is already encoded.
+        """
+        if self.count >= self.capacity:
+            if not self.growth:
+                raise ValueError(
+                    f"The shard is full at {self.capacity} samples")
+            self._grow()
+
+        record = self.chunk[self.chunk_count]
+        record['features'] = features
+        if self.sparse_width is None:
+            record['policy'] = policy
+        else:
+            record['actions'], record['probabilities'] = (
+                SampleFormat.sparsify(policy, width=self.sparse_width))
+        self.chunk_count += 1
+        self.count += 1
+        if self.chunk_count == len(self.chunk):
+            self.flush()
+
+    def _grow(self):
+        """
+        This extends the shard by the growth and maps it again.
+        """
+        offset, dtype = self.records.offset, self.records.dtype
+        self.records.flush()
+        self.records = None  # Unmaps the shard
+        self.capacity += self.growth
+        with open(self.path, 'r+b') as shard:
+            shard.truncate(offset + self.capacity*dtype.itemsize)
+        self.records = np.memmap(self.path, dtype=dtype, mode='r+',
+                                 offset=offset, shape=(self.capacity,))
+
+    def flush(self):
+        """
+        This copies the buffered chunk to the shard, then updates the number
+        of samples in its header.
+        """
+        start = self.count - self.chunk_count
+        self.records[start:self.count] = self.chunk[:self.chunk_count]
+        self.records.flush()
+        self.chunk_count = 0
+        SampleWriter._write_header(self.path, offset=self.records.offset,
+                                   dtype=self.records.dtype, count=self.count)
+
+    def close(self):
+        """
+        This flushes the remaining samples and trims the shard to them.
+        """
+        if self.records is None:
+            return
+
+        self.flush()
+        offset, dtype = self.records.offset, self.records.dtype
+        self.records = None  # Unmaps the shard
+        with open(self.path, 'r+b') as shard:
+            shard.truncate(offset + self.count*dtype.itemsize)
+
+    @staticmethod
+    def _write_header(path: str, offset: int, dtype: np.dtype, count: int):
+        """
+        This rewrites the header of a shard for the given number of samples,
+        padded to the length of the original so the records stay in place.
+        """
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                       'fortran_order': False, 'shape': (count,)})
+        with open(path, 'r+b') as shard:
+            magic = shard.read(len(np.lib.format.MAGIC_PREFIX) + 2)
+            # Versions 2 and 3 use a four byte header length
+            length_size = 2 if magic[-2] == 1 else 4
+            start = len(magic) + length_size
+            header = header.ljust(offset - start - 1).encode('latin1') + b'\n'
+            shard.seek(start)
+            shard.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_shard(path: str) -> np.ndarray:
+    """
+    This maps a shard into memory as an array of sample records, without
+    reading it. Only the samples flushed by its writer are included, whether
+    or not the writer was closed.
+    """
+    return np.load(path, mmap_mode='r')
+
+
+class SampleDataset:
+    """
+    This reads the samples of several shards as one sequence of (features,
+    policy) pairs, with the policies given densely in single precision.
+    """
+
+    def __init__(self, paths: list[str]):
+        self.shards = [load_shard(path) for path in paths]
+        self.offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        shard = int(np.searchsorted(self.offsets, index, side='right')) - 1
+        record = self.shards[shard][index - self.offsets[shard]]
+
+        return np.array(record['features']), SampleFormat.policies(record)
+
+    def arrays(self):
+        """
+        This returns the features and policies of every sample as two arrays.
+        """
+        features = np.concatenate([shard['features'] for shard in self.shards])
+        policies = np.concatenate([SampleFormat.policies(shard)
+                                   for shard in self.shards])
+
+        return features, policies
+
+
+def convert_csv(csv_path: str, shard_path: str, policy_dtype=np.float16,
+                sparse_width: int = None):
+    """
+    This converts training data in the CSV format to a binary shard, returning
+    the number of samples converted.
+    """
+    with open(csv_path, encoding="utf-8") as training_data:
+        capacity = sum(1 for row in training_data if row.strip())
+
+    with SampleWriter(shard_path, capacity=capacity, policy_dtype=policy_dtype,
+                      sparse_width=sparse_width) as writer:
+        with open(csv_path, encoding="utf-8") as training_data:
+            for row in csv.reader(training_data):
+                if not row:
+                    continue
+                writer.write_features(
+                    np.array(row[:SampleFormat.FEATURES], dtype=np.int8),
+                    np.array(row[SampleFormat.FEATURES:], dtype=np.float32))
+
+    return writer.count
+
+
+class CSVSampleWriter:
+    """
+    This appends training samples to a file in the CSV format, with the same
+    interface as SampleWriter. The file is kept open between samples.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.file = open(path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        self.writer = csv.writer(self.file)
+
+    def write(self, infostate: Infostate, policy: np.ndarray):
+        """
+        This adds a sample with the given policy over every action id.
+        """
+        self.write_features(SampleFormat.features(infostate), policy)
+
+    def write_features(self, features: np.ndarray, policy: np.ndarray):
+        """
+        This adds a sample whose infostate is already encoded.
+        """
+        self.writer.writerow(features.tolist() + policy.tolist())
+        self.count += 1
+
+    def flush(self):
+        """
+        This hands the written rows to the operating system.
+        """
+        self.file.flush()
+
+    def close(self):
+        """
+        This flushes the written rows and closes the file.
+        """
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncSampleSink:
+    """
+    This passes training samples to a writer (a SampleWriter or a
+    CSVSampleWriter) through a bounded queue drained by a background thread,
+    so that the file I/O overlaps with the search for the next move. The
+    thread writes the samples in batches and flushes the writer once a batch
+    has batch_size samples, or flush_interval seconds after its first sample
+    was queued.
+
+    A full queue blocks the caller rather than dropping samples, so a crash
+    loses at most the queued samples and those written since the last flush.
+    This holds for both writers, since a SampleWriter shard only counts the
+    samples of its last flush (see SampleWriter class). Closing the sink
+    drains the queue and closes the writer.
+    """
+
+    _CLOSE = None  # Queued to stop the background thread
+
+    def __init__(self, writer, max_queued: int = 4096, batch_size: int = 256,
+                 flush_interval: float = 1.0):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.samples = queue.Queue(maxsize=max_queued)
+        self.error = None  # The exception that stopped the background thread
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def write(self, infostate: Infostate, policy: np.ndarray):
+        """
+        This queues a sample with the given policy over every action id. The
+        infostate is encoded right away, so it may change afterwards.
+        """
+        self._raise_error()
+        self.samples.put((SampleFormat.features(infostate), policy))
+
+    def _drain(self):
+        """
+        This runs in the background thread, writing the queued samples until
+        the sink is closed.
+        """
+        # The batch is flushed by the deadline set by its first sample
+        batch, deadline, closing = [], None, False
+        try:
+            while not closing:
+                timeout = (None if deadline is None
+                           else max(0.0, deadline - time.monotonic()))
+                try:
+                    sample = self.samples.get(timeout=timeout)
+                    if sample is AsyncSampleSink._CLOSE:
+                        closing = True
+                    else:
+                        batch.append(sample)
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+                except queue.Empty:
+                    pass
+                if batch and (closing or len(batch) >= self.batch_size
+                              or time.monotonic() >= deadline):
+                    for features, policy in batch:
+                        self.writer.write_features(features, policy)
+                    self.writer.flush()
+                    batch, deadline = [], None
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self.error = error
+            # Keep the producer from blocking on a queue nobody drains
+            while not closing:
+                closing = self.samples.get() is AsyncSampleSink._CLOSE
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError("The sample writer failed") from self.error
+
+    def close(self):
+        """
+        This writes the remaining samples, then closes the writer.
+        """
+        if self.thread.is_alive():
+            self.samples.put(AsyncSampleSink._CLOSE)
+            self.thread.join()
+        self.writer.close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
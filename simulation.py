@@ -2,11 +2,213 @@
 This contains the logic for simulating a GG match.
 """
 
+import abc
 import random
+import sys
+import time
+
+from dataclasses import dataclass
+from typing import Callable
 
 from constants import Ranking, POV, Controller
 from helpers import get_blank_matrix
-from core import Player, Board, Infostate
+from core import (Action, Player, Board, Infostate, BoardPrinter,
+                  InfostatePrinter, StatePrinterParams)
+
+
+@dataclass
+class Rendering:
+    """
+    This is for storing how much of a simulation is shown in the terminal:
+    every game_interval-th game is rendered, and within it every
+    ply_interval-th ply (neither is rendered if the interval is None). The
+    progress is reported every report_interval seconds (never if None).
+
+    For a live view, each frame can be redrawn in place of the last, and at
+    most max_fps frames are drawn per second (see FrameRenderer class).
+    """
+    game_interval: int = 1
+    ply_interval: int = 1
+    report_interval: float = None
+    in_place: bool = False
+    max_fps: float = None
+
+    @staticmethod
+    def headless(report_interval: float = 10.0) -> 'Rendering':
+        """
+        This returns the settings for rendering nothing but the periodic
+        progress reports.
+        """
+        return Rendering(game_interval=None, ply_interval=None,
+                         report_interval=report_interval)
+
+    def renders_game(self, game_number: int):
+        """
+        This checks if a game (numbered from 1) is shown.
+        """
+        return (self.game_interval is not None
+                and (game_number - 1) % self.game_interval == 0)
+
+    def renders_ply(self, game_number: int, turn_number: int):
+        """
+        This checks if a ply (numbered from 1 within its game) is shown.
+        """
+        return (self.renders_game(game_number) and self.ply_interval is not None
+                and (turn_number - 1) % self.ply_interval == 0)
+
+
+@dataclass
+class ProgressReport:
+    """
+    This is for storing the progress of a simulation: the games finished, the
+    plies played and the training samples saved, after the elapsed seconds.
+    """
+    games: int = 0
+    plies: int = 0
+    samples: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self):
+        elapsed = max(self.elapsed, 1e-9)
+        return (f"games={self.games} plies={self.plies} samples={self.samples} "
+                f"elapsed={self.elapsed:.1f}s "
+                f"games/s={self.games/elapsed:.2f} "
+                f"plies/s={self.plies/elapsed:.2f}")
+
+
+class ProgressReporter:
+    """
+    This counts the progress of a simulation and passes a ProgressReport to a
+    callback (print by default) whenever the report interval has passed.
+    """
+
+    def __init__(self, interval: float = None,
+                 callback: Callable[[ProgressReport], None] = print):
+        self.interval = interval
+        self.callback = callback
+        self.report = ProgressReport()
+        self.start_time = time.perf_counter()
+        self.last_report = self.start_time
+
+    def update(self, games: int = 0, plies: int = 0, samples: int = 0):
+        """
+        This adds to the counts, reporting them if they are due.
+        """
+        self.report.games += games
+        self.report.plies += plies
+        self.report.samples += samples
+        if self.interval is None:
+            return
+
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.emit()
+
+    def emit(self):
+        """
+        This reports the counts right away.
+        """
+        self.report.elapsed = time.perf_counter() - self.start_time
+        self.callback(self.report)
+
+
+class Agent(abc.ABC):
+    """
+    This is the interface of the programs that can choose the moves of either
+    side of a MatchSimulator, in place of the constants of the Controller
+    class. An agent is shown the arbiter's board and its own infostate, and
+    returns the id of the action it plays. Agents are copied to the worker
+    processes of arenas and tournaments, so they must be picklable.
+    """
+
+    name = "agent"
+
+    def reset(self):
+        """
+        This is called at the start of every game.
+        """
+
+    def observe(self, action: int, result: int):
+        """
+        This is called after every action of either side, with the result
+        announced by the arbiter (see Result class).
+        """
+
+    @abc.abstractmethod
+    def choose_action(self, state: Board, infostate: Infostate) -> int:
+        """
+        This returns the action to play in the given position.
+        """
+
+
+class RandomAgent(Agent):
+    """
+    This plays uniformly random moves, like Controller.RANDOM.
+    """
+
+    def __init__(self, name: str = "random"):
+        self.name = name
+
+    def choose_action(self, state: Board, infostate: Infostate) -> int:
+        return random.choice(state.actions())
+
+
+@dataclass
+class GameRecord:
+    """
+    This is for storing the outcome of a simulated game: the color of its
+    winner (Player.ARBITER for a draw), the color of the first controller, the number
+    of plies played and the total number of actions available over them.
+    """
+    winner: int
+    player_one_color: int
+    plies: int
+    branches_encountered: int
+
+    @property
+    def branching_factor(self) -> float:
+        """
+        This returns the average number of actions available per ply.
+        """
+        return self.branches_encountered/self.plies if self.plies else 0.0
+
+
+class FrameRenderer:
+    """
+    This writes frames of text to a stream, each with a single call. A frame
+    can replace the last one on the terminal instead of scrolling it away.
+    If a frame rate is given, frames that come sooner than it allows are
+    dropped rather than waited for, so that rendering never slows down the
+    simulation.
+    """
+
+    # Moves the cursor to the top left and clears the screen below it
+    REDRAW = "\033[H\033[J"
+
+    def __init__(self, stream=None, in_place: bool = False,
+                 max_fps: float = None):
+        self.stream = stream
+        self.in_place = in_place
+        self.min_interval = 1/max_fps if max_fps else 0.0
+        self.last_draw = None
+
+    def draw(self, frame: str, force: bool = False) -> bool:
+        """
+        This writes a frame unless it comes too soon after the last one (or is
+        forced), returning whether it was written.
+        """
+        now = time.perf_counter()
+        if (not force and self.last_draw is not None
+                and now - self.last_draw < self.min_interval):
+            return False
+
+        self.last_draw = now
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(FrameRenderer.REDRAW + frame if self.in_place else frame)
+        stream.flush()
+
+        return True
 
 
 class MatchSimulator:
@@ -19,7 +221,8 @@ class MatchSimulator:
         """
         The controllers parameter sets whether a human or an algorithm chooses
         the moves for either or both sides of the simulated match (see constant
-        definitions in the Controller class).
+        definitions in the Controller class). An Agent instance can be given
+        in place of either constant.
         """
         if formations[0] is not None:
             self.blue_formation = formations[0]
@@ -36,6 +239,11 @@ class MatchSimulator:
         self.save_data = save_data
         self.game_history = []
         self.pov = pov
+        # Every game and ply is shown unless headless settings are given
+        self.rendering = Rendering()
+        self.progress = None  # The ProgressReporter of the last start
+        self.game_records = []  # The GameRecord of every game played
+        self.renderer = FrameRenderer()
 
     @staticmethod
     def _place_in_red_range(formation: list[int]):
@@ -127,19 +335,32 @@ class MatchSimulator:
         return arbiter_matrix
 
     @staticmethod
-    def _print_game_status(turn_number: int, arbiter_board: Board,
-                           infostates: list[Infostate], pov: int):
-
+    def _game_status_frame(turn_number: int, arbiter_board: Board,
+                           infostates: list[Infostate], pov: int,
+                           action: int = None) -> str:
+        """
+        This returns the text showing the turn number, the state from the given
+        pov, the player to move and (if given) the move chosen.
+        """
         blue_infostate, red_infostate = infostates[0], infostates[1]
-        print(f"Turn Number: {turn_number}")
+        state = ""
         if pov == POV.WORLD:
-            arbiter_board.print_state(POV.WORLD, with_color=True)
+            state = BoardPrinter(
+                params=StatePrinterParams(board=arbiter_board)).frame(
+                    POV.WORLD, with_color=True)
         elif pov == POV.BLUE:
-            blue_infostate.print_state()
+            state = InfostatePrinter(
+                params=StatePrinterParams(infostate=blue_infostate)).frame()
         elif pov == POV.RED:
-            red_infostate.print_state()
+            state = InfostatePrinter(
+                params=StatePrinterParams(infostate=red_infostate)).frame()
+
+        frame = (f"Turn Number: {turn_number}\n{state}"
+                 f"Player to move: {arbiter_board.player_to_move}\n")
+        if action is not None:
+            frame += f"Chosen Move: {Action.to_string(action)}\n"
 
-        print(f"Player to move: {arbiter_board.player_to_move}")
+        return frame
 
     def get_current_controller(self, board: Board):
         """
@@ -176,42 +397,77 @@ class MatchSimulator:
         elif Controller.HUMAN in self.controllers:
             self.pov = None
 
-    def get_controller_input(self, arbiter_board: Board):
+    def _agents(self) -> list[Agent]:
+        """
+        This lists the distinct agents among the controllers.
+        """
+        agents = []
+        for controller in self.controllers:
+            if isinstance(controller, Agent) and all(
+                    controller is not agent for agent in agents):
+                agents.append(controller)
+
+        return agents
+
+    def get_controller_input(self, arbiter_board: Board,
+                             infostate: Infostate = None):
         """
         This is for obtaining the controller's chosen action, be it human or
-        bot.
+        bot. Agents are shown the infostate of the player to move.
         """
         valid_actions = arbiter_board.actions()
-        if self.get_current_controller(arbiter_board) == Controller.RANDOM:
+        action = None  # Initialize return value
+        controller = self.get_current_controller(arbiter_board)
+        if isinstance(controller, Agent):
+            action = controller.choose_action(arbiter_board, infostate)
+        elif self.get_current_controller(arbiter_board) == Controller.RANDOM:
             action = random.choice(valid_actions)
         elif self.get_current_controller(arbiter_board) == Controller.HUMAN:
+            # Moves are typed in their four-digit string form
             while action not in valid_actions:
-                action = input("Choose a move: ")
+                action = Action.from_string(input("Choose a move: "))
 
         return action
 
     @staticmethod
     def _update_infostates(blue_infostate: Infostate, red_infostate: Infostate,
-                           action: str, result: str):
+                           action: int, result: int):
         blue_infostate = blue_infostate.transition(action, result=result)
         red_infostate = red_infostate.transition(action, result=result)
 
         return blue_infostate, red_infostate
 
     @staticmethod
-    def _print_result(arbiter_board: Board):
+    def get_winner(arbiter_board: Board):
+        """
+        This returns the color of the winner of a finished game, or
+        Player.ARBITER for a draw (None if the game has not ended).
+        """
         win_value = 1000000
+        winner = None  # Initialize return value
         if ((arbiter_board.reward() == win_value
                 and arbiter_board.player_to_move == Player.BLUE)
                 or (arbiter_board.reward() == -win_value
                     and arbiter_board.player_to_move == Player.RED)):
-            print("\n[VICTORY FOR BLUE]\n")
+            winner = Player.BLUE
         elif ((arbiter_board.reward() == win_value
               and arbiter_board.player_to_move == Player.RED)
               or (arbiter_board.reward() == -win_value
               and arbiter_board.player_to_move == Player.BLUE)):
-            print("\n[VICTORY FOR RED]\n")
+            winner = Player.RED
         elif arbiter_board.reward() == 0:
+            winner = Player.ARBITER
+
+        return winner
+
+    @staticmethod
+    def _print_result(arbiter_board: Board):
+        winner = MatchSimulator.get_winner(arbiter_board)
+        if winner == Player.BLUE:
+            print("\n[VICTORY FOR BLUE]\n")
+        elif winner == Player.RED:
+            print("\n[VICTORY FOR RED]\n")
+        elif winner == Player.ARBITER:
             print("\n[DRAW]\n")
 
     def start(self, iterations: int = 1, target: int = None):
@@ -220,7 +476,11 @@ class MatchSimulator:
         from humans or choosing moves based on an algorithm or even both.
         """
         _ = target  # Placeholder for use in CFRTrainingSimulator subclass
-        for _ in range(iterations):
+        self.progress = ProgressReporter(
+            interval=self.rendering.report_interval)
+        self.renderer = FrameRenderer(in_place=self.rendering.in_place,
+                                      max_fps=self.rendering.max_fps)
+        for game_number in range(1, iterations + 1):
             arbiter_board = Board(self.setup_arbiter_matrix(),
                                   player_to_move=Player.BLUE,
                                   blue_anticipating=False, red_anticipating=False)
@@ -229,33 +489,58 @@ class MatchSimulator:
 
             blue_infostate, red_infostate = MatchSimulator._starting_infostates(
                 arbiter_board)
+            for agent in self._agents():
+                agent.reset()
 
             turn_number = 1
             branches_encountered = 0
             while not arbiter_board.is_terminal():
                 self.manage_pov_switching(arbiter_board)
 
-                MatchSimulator._print_game_status(turn_number, arbiter_board,
-                                                  infostates=[
-                                                      blue_infostate,
-                                                      red_infostate],
-                                                  pov=self.pov)
+                rendered = self.rendering.renders_ply(game_number, turn_number)
+                human = (self.get_current_controller(arbiter_board)
+                         == Controller.HUMAN)
+                if rendered and human:
+                    # The position must be shown before the move is typed
+                    self.renderer.draw(MatchSimulator._game_status_frame(
+                        turn_number, arbiter_board,
+                        infostates=[blue_infostate, red_infostate],
+                        pov=self.pov), force=True)
                 valid_actions = arbiter_board.actions()
                 branches_encountered += len(valid_actions)
 
-                action = ""  # Initialize variable for storing chosen action
-                action = self.get_controller_input(arbiter_board)
-                print(f"Chosen Move: {action}")
+                action = self.get_controller_input(
+                    arbiter_board,
+                    infostate=(blue_infostate
+                               if arbiter_board.player_to_move == Player.BLUE
+                               else red_infostate))
+                if rendered and human:
+                    print(f"Chosen Move: {Action.to_string(action)}")
+                elif rendered:
+                    self.renderer.draw(MatchSimulator._game_status_frame(
+                        turn_number, arbiter_board,
+                        infostates=[blue_infostate, red_infostate],
+                        pov=self.pov, action=action))
                 if self.save_data:
                     self.game_history.append(action)
 
-                new_arbiter_board = arbiter_board.transition(action)
-                result = arbiter_board.classify_action_result(action,
-                                                              new_arbiter_board)
+                # The previous position is not needed again, so the action is
+                # played on the arbiter board itself
+                record = arbiter_board.apply(action)
                 blue_infostate, red_infostate = MatchSimulator._update_infostates(
-                    blue_infostate, red_infostate, action=action, result=result
+                    blue_infostate, red_infostate, action=action,
+                    result=record.result
                 )
-                arbiter_board = new_arbiter_board
+                for agent in self._agents():
+                    agent.observe(action, record.result)
                 turn_number += 1
-
-            MatchSimulator._print_result(arbiter_board)
+                self.progress.update(plies=1)
+
+            if self.rendering.renders_game(game_number):
+                MatchSimulator._print_result(arbiter_board)
+            self.game_records.append(GameRecord(
+                winner=MatchSimulator.get_winner(arbiter_board),
+                player_one_color=self.player_one_color,
+                plies=turn_number - 1,
+                branches_encountered=branches_encountered))
+            self.progress.update(games=1)
@@ -0,0 +1,98 @@
+"""
+This is for testing classes and functions in the arena module.
+"""
+import unittest
+
+from constants import Controller
+from core import Player
+from arena import Arena, Tournament, MatchResult, elo_ratings
+from simulation import RandomAgent
+
+
+class TestArena(unittest.TestCase):
+    """
+    This is for testing the bulk playing of games.
+    """
+
+    def test_tasks(self):
+        """
+        This checks that the games are split into seeded batches.
+        """
+        arena = Arena(controllers=[Controller.RANDOM, Controller.RANDOM],
+                      seed=10, batch_size=4)
+        tasks = arena.tasks(games=10)
+        self.assertListEqual([task.games for task in tasks], [4, 4, 2])
+        self.assertListEqual([task.seed for task in tasks], [10, 11, 12])
+
+    def test_play(self):
+        """
+        This checks that the worker pool plays the same seeded games as a
+        single process, and that every game is accounted for.
+        """
+        reports = [Arena(controllers=[Controller.RANDOM, Controller.RANDOM],
+                         workers=workers, seed=0, batch_size=3).play(games=8)
+                   for workers in [1, 2]]
+        self.assertListEqual(reports[0].records, reports[1].records)
+        self.assertEqual(sum(reports[0].outcomes()), 8)
+        counts, _ = reports[0].length_histogram(bins=4)
+        self.assertEqual(counts.sum(), 8)
+        for record in reports[0].records:
+            self.assertGreater(record.plies, 0)
+            self.assertGreater(record.branching_factor, 1)
+        self.assertIn("Win/Draw/Loss", str(reports[0]))
+
+    def test_human_controller(self):
+        """
+        This checks that games needing human input are refused.
+        """
+        with self.assertRaises(ValueError):
+            Arena(controllers=[Controller.HUMAN, Controller.RANDOM])
+
+
+class TestTournament(unittest.TestCase):
+    """
+    This is for testing the round robin between agents and their ratings.
+    """
+
+    def test_elo_ratings(self):
+        """
+        This checks that the stronger agent is rated higher, within its
+        confidence interval, and that the ratings average 1500.
+        """
+        results = ([MatchResult("a", "b", Player.BLUE, 10)]*6
+                   + [MatchResult("b", "a", Player.BLUE, 10)]*2
+                   + [MatchResult("b", "c", Player.ARBITER, 10)]*4)
+        ratings = elo_ratings(results, names=["a", "b", "c"], bootstrap=50)
+        self.assertGreater(ratings["a"].elo, ratings["b"].elo)
+        self.assertAlmostEqual(ratings["b"].elo, ratings["c"].elo, places=3)
+        self.assertAlmostEqual(
+            sum(rating.elo for rating in ratings.values())/3, 1500)
+        for rating in ratings.values():
+            self.assertLessEqual(rating.low, rating.elo + 1e-6)
+            self.assertGreaterEqual(rating.high, rating.elo - 1e-6)
+
+    def test_play(self):
+        """
+        This checks that every pairing plays a color-swapped deal, and that
+        the worker pool plays the same seeded games as a single process.
+        """
+        agents = [RandomAgent(name) for name in ["x", "y", "z"]]
+        reports = [Tournament(agents, workers=workers, seed=0).play(
+            bootstrap=10) for workers in [1, 2]]
+        self.assertListEqual(reports[0].results, reports[1].results)
+        self.assertEqual(len(reports[0].results), 6)
+        self.assertEqual(reports[0].results[0].blue,
+                         reports[0].results[1].red)
+        self.assertSetEqual(set(reports[0].ratings), {"x", "y", "z"})
+        self.assertEqual(sum(reports[0].record("x")), 4)
+
+    def test_duplicate_names(self):
+        """
+        This checks that agents sharing a name are refused.
+        """
+        with self.assertRaises(ValueError):
+            Tournament([RandomAgent("x"), RandomAgent("x")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,8 +8,9 @@ from unittest.mock import patch
 
 from helpers import (get_random_permutation, get_blank_matrix,
                      get_hex_uppercase_string)
-from constants import Result, Ranking
-from core import Board, Infostate, Player, BoardPrinter
+from constants import Result, Ranking, POV
+from core import (Action, Board, Infostate, Player, BoardPrinter,
+                  StatePrinterParams, Zobrist)
 
 
 class TestGetRandomPermutation(unittest.TestCase):
@@ -124,6 +125,24 @@ class TestBoard(unittest.TestCase):
             expected = "r" + get_hex_uppercase_string(piece - Ranking.SPY)
             self.assertEqual(BoardPrinter.label_piece_by_team(piece), expected)
 
+    def test_frame(self):
+        """
+        This checks the text of a printed board, with the flags colored.
+        """
+        sample_state_matrix = [[0]*Board.COLUMNS for _ in range(Board.ROWS)]
+        sample_state_matrix[0][0] = Ranking.FLAG
+        sample_state_matrix[7][7] = Ranking.FLAG + Ranking.SPY
+        sample_state_matrix[7][8] = Ranking.SPY + Ranking.SPY
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        lines = BoardPrinter(params=StatePrinterParams(
+            board=sample_board)).frame(pov=POV.WORLD,
+                                       with_color=True).split("\n")
+        self.assertEqual(lines[1], " 0  \033[34mb1\033[0m " + " - "*8)
+        self.assertEqual(lines[8], " 7  " + " - "*7
+                         + "\033[31mr1\033[0m rF ")
+        self.assertEqual(lines[10], "     0  1  2  3  4  5  6  7  8 ")
+
     def test_actions(self):
         """
         This checks if the possible actions in the given game state are
@@ -145,6 +164,30 @@ class TestBoard(unittest.TestCase):
         sample_board = Board(sample_state_matrix, player_to_move=Player.RED,
                              blue_anticipating=False, red_anticipating=False)
         self.assertEqual(len(sample_board.actions()), 12)
+        self.assertListEqual(sample_board.actions(),
+                             sorted(sample_board.actions()))
+
+    def test_legal_mask(self):
+        """
+        This checks if the legality mask marks exactly the possible actions.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        mask = sample_board.legal_mask()
+        self.assertEqual(len(mask), Action.COUNT)
+        self.assertListEqual(
+            [action for action in range(Action.COUNT) if mask[action]],
+            sample_board.actions())
 
     def test_reward(self):
         """
@@ -226,6 +269,42 @@ class TestBoard(unittest.TestCase):
                              blue_anticipating=False, red_anticipating=False)
         self.assertEqual(sample_board.material(), -2)
 
+    def test_piece_index(self):
+        """
+        This verifies that the index of flags, piece counts, material sums and
+        occupied squares follows the pieces as they move and get captured.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        self.assertEqual(sample_board.flag_squares[Player.BLUE], 12)
+        self.assertEqual(sample_board.flag_squares[Player.RED], 59)
+        self.assertEqual(sample_board.piece_counts[Player.BLUE], 4)
+        self.assertEqual(sample_board.material_sums[Player.BLUE], 26)
+        self.assertEqual(sample_board.material_sums[Player.RED], 22)
+        sample_board.apply(action=Action.from_string("1323"))
+        sample_board.apply(action=Action.from_string("6566"))
+        self.assertEqual(sample_board.flag_squares[Player.BLUE], 21)
+        self.assertEqual(sample_board.flag_squares[Player.RED], 60)
+        # The red general of the army (29) takes the blue colonel (9)
+        sample_board.apply(action=Action.from_string("2535"))
+        sample_board.apply(action=Action.from_string("4535"))
+        self.assertEqual(sample_board.piece_counts[Player.BLUE], 3)
+        self.assertEqual(sample_board.material_sums[Player.BLUE], 17)
+        self.assertSetEqual(sample_board.occupied_squares[Player.RED],
+                            {32, 39, 60})
+        self.assertNotIn(32, sample_board.occupied_squares[Player.BLUE])
+        self.assertEqual(sample_board.material(), 17 - 22)
+
     def test_transition(self):
         """
         This verifies that the next state can be determined given the current
@@ -243,20 +322,156 @@ class TestBoard(unittest.TestCase):
         ]
         sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
                              blue_anticipating=False, red_anticipating=False)
-        next_board = sample_board.transition(action="2535")
+        next_board = sample_board.transition(
+            action=Action.from_string("2535"))
         self.assertEqual(next_board.matrix[3][5], 9)  # Verify piece movement
 
         sample_state_matrix[3][2] = 16  # Place red flag in front of blue spy
         sample_state_matrix[6][5] = Ranking.BLANK  # Remove former red flag
         sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
                              blue_anticipating=False, red_anticipating=False)
-        next_board = sample_board.transition(action="2232")
+        next_board = sample_board.transition(
+            action=Action.from_string("2232"))
         self.assertTrue(next_board.is_terminal())
         sample_board = Board(sample_state_matrix, player_to_move=Player.RED,
                              blue_anticipating=False, red_anticipating=False)
-        next_board = sample_board.transition(action="3222")
+        next_board = sample_board.transition(
+            action=Action.from_string("3222"))
         self.assertTrue(next_board.is_terminal())
 
+    def test_challenge_results(self):
+        """
+        This checks the precomputed results of challenges between ranks.
+        """
+        self.assertEqual(len(Board.CHALLENGE_RESULTS), Ranking.SPY)
+        results = Board.CHALLENGE_RESULTS
+        self.assertEqual(results[Ranking.PRIVATE - 1][Ranking.SPY - 1],
+                         Result.WIN)
+        self.assertEqual(results[Ranking.SPY - 1][Ranking.PRIVATE - 1],
+                         Result.LOSS)
+        self.assertEqual(results[Ranking.FLAG - 1][Ranking.FLAG - 1],
+                         Result.WIN)
+        self.assertEqual(results[Ranking.GENERAL - 1][Ranking.MAJOR - 1],
+                         Result.WIN)
+        self.assertEqual(results[Ranking.MAJOR - 1][Ranking.GENERAL - 1],
+                         Result.LOSS)
+        self.assertEqual(results[Ranking.MAJOR - 1][Ranking.MAJOR - 1],
+                         Result.DRAW)
+
+    def test_transition_with_result(self):
+        """
+        This verifies that the result reported along with the next state
+        agrees with the classification of the two states.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 17, 1, 0, 0, 2, 30, 0],
+            [0, 0, 15, 0, 0, 9, 15, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 6, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        expected_results = {"1222": Result.WIN, "1617": Result.WIN,
+                            "2535": Result.OCCUPY, "5343": Result.LOSS}
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        for action in sample_board.actions():
+            next_board, result = sample_board.transition_with_result(action)
+            self.assertEqual(
+                result, sample_board.classify_action_result(action, next_board))
+            if Action.to_string(action) in expected_results:
+                self.assertEqual(
+                    result, expected_results[Action.to_string(action)])
+
+    def test_apply_and_undo(self):
+        """
+        This verifies that an action played in place can be taken back, leaving
+        the board exactly as it was.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        actions = sample_board.actions()
+        record = sample_board.apply(action=Action.from_string("2535"))
+        self.assertEqual(sample_board.matrix[3][5], 9)
+        self.assertEqual(sample_board.player_to_move, Player.RED)
+        self.assertEqual(record.result, Result.OCCUPY)
+        record_after = sample_board.apply(action=Action.from_string("4535"))
+        self.assertEqual(record_after.result, Result.WIN)
+        sample_board.undo(record_after)
+        sample_board.undo(record)
+        self.assertListEqual(sample_board.matrix, sample_state_matrix)
+        self.assertEqual(sample_board.player_to_move, Player.BLUE)
+        self.assertIs(sample_board.actions(), actions)
+
+    def test_actions_are_cached(self):
+        """
+        This verifies that the actions of a position are only enumerated once,
+        and that they are enumerated again once an action is played.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        actions = sample_board.actions()
+        self.assertIs(sample_board.actions(), actions)
+        next_board = sample_board.transition(action=Action.from_string("2535"))
+        self.assertEqual(len(next_board.actions()), 12)
+        self.assertIs(sample_board.actions(), actions)
+
+
+class TestAction(unittest.TestCase):
+    """
+    This tests the integer encoding of actions.
+    """
+
+    def test_count(self):
+        """
+        This checks that every possible action in a game has an id.
+        """
+        self.assertEqual(Action.COUNT, 254)
+        self.assertEqual(len(Action.LABELS), Action.COUNT)
+
+    def test_string_conversion(self):
+        """
+        This checks that the string form of an action is converted to its id
+        and back.
+        """
+        action = Action.from_string("2535")
+        self.assertEqual(Action.COORDINATES[action], (2, 5, 3, 5))
+        self.assertEqual(Action.ORIGINS[action], 2*Board.COLUMNS + 5)
+        self.assertEqual(Action.DESTINATIONS[action], 3*Board.COLUMNS + 5)
+        self.assertEqual(Action.to_string(action), "2535")
+        self.assertEqual(Action.between(Action.ORIGINS[action],
+                                        Action.DESTINATIONS[action]), action)
+
+    def test_invalid_string(self):
+        """
+        This checks that strings which do not describe a possible action have
+        no id.
+        """
+        self.assertIsNone(Action.from_string("2537"))
+        self.assertIsNone(Action.from_string("move"))
+
 
 class TestInfostate(unittest.TestCase):
     """
@@ -283,16 +498,16 @@ class TestInfostate(unittest.TestCase):
                              blue_anticipating=False, red_anticipating=False)
         sample_blue_infostate = Infostate.at_start(owner=Player.BLUE,
                                                    board=sample_board)
-        next_infostate = sample_blue_infostate.transition(action="4353",
-                                                          result=Result.WIN)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("4353"), result=Result.WIN)
         self.assertEqual(next_infostate.matrix[5][3][0], 22)
         self.assertEqual(next_infostate.abstracted_board[5][3].rank_floor, 7)
-        next_infostate = sample_blue_infostate.transition(action="1617",
-                                                          result=Result.WIN)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("1617"), result=Result.WIN)
         self.assertEqual(next_infostate.matrix[1][6][0], 0)
         self.assertEqual(next_infostate.abstracted_board[1][6].rank_floor, 0)
-        next_infostate = sample_blue_infostate.transition(action="1222",
-                                                          result=Result.WIN)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("1222"), result=Result.WIN)
         self.assertEqual(next_infostate.abstracted_board[2][2].rank_floor, 2)
         self.assertEqual(next_infostate.abstracted_board[2][2].rank_ceiling, 2)
         sample_state_matrix = [
@@ -309,8 +524,8 @@ class TestInfostate(unittest.TestCase):
                              blue_anticipating=False, red_anticipating=False)
         sample_blue_infostate = Infostate.at_start(owner=Player.BLUE,
                                                    board=sample_board)
-        next_infostate = sample_blue_infostate.transition(action="6777",
-                                                          result=Result.OCCUPY)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("6777"), result=Result.OCCUPY)
         self.assertEqual(next_infostate.abstracted_board[7][7].rank_floor, 1)
         self.assertTrue(next_infostate.anticipating)
         sample_state_matrix = [
@@ -327,13 +542,59 @@ class TestInfostate(unittest.TestCase):
                              blue_anticipating=False, red_anticipating=False)
         sample_blue_infostate = Infostate.at_start(owner=Player.RED,
                                                    board=sample_board)
-        next_infostate = sample_blue_infostate.transition(action="6757",
-                                                          result=Result.OCCUPY)
-        next_infostate = sample_blue_infostate.transition(action="1000",
-                                                          result=Result.OCCUPY)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("6757"), result=Result.OCCUPY)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("1000"), result=Result.OCCUPY)
         self.assertEqual(next_infostate.abstracted_board[0][0].rank_floor, 1)
         self.assertTrue(next_infostate.anticipating)
 
+    def test_flag_square(self):
+        """
+        This checks that the infostate tracks its owner's flag through
+        transitions without modifying the previous infostate.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 17, 0, 0, 0, 2, 30, 0],
+            [0, 0, 15, 0, 0, 9, 15, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 6, 0, 0, 0, 16, 0],
+            [0, 0, 0, 0, 0, 16, 0, 1, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        sample_blue_infostate = Infostate.at_start(owner=Player.BLUE,
+                                                   board=sample_board)
+        starting_string = str(sample_blue_infostate)
+        self.assertEqual(sample_blue_infostate.flag_square, 6*Board.COLUMNS + 7)
+        next_infostate = sample_blue_infostate.transition(
+            action=Action.from_string("6777"), result=Result.OCCUPY)
+        self.assertEqual(next_infostate.flag_square, 7*Board.COLUMNS + 7)
+        self.assertEqual(str(sample_blue_infostate), starting_string)
+        next_infostate = next_infostate.transition(
+            action=Action.from_string("5767"), result=Result.OCCUPY)
+        next_infostate = next_infostate.transition(
+            action=Action.from_string("6777"), result=Result.WIN)
+        self.assertIsNone(next_infostate.flag_square)
+        self.assertFalse(next_infostate.anticipating)
+
+    def test_not_a_board(self):
+        """
+        This checks that the infostate does not carry the arbiter board's
+        methods, which need squares that the infostate does not have.
+        """
+        sample_board = Board(get_blank_matrix(Board.ROWS, Board.COLUMNS),
+                             player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        sample_infostate = Infostate.at_start(owner=Player.BLUE,
+                                              board=sample_board)
+        self.assertNotIsInstance(sample_infostate, Board)
+        for method in ["actions", "is_terminal", "copy"]:
+            self.assertFalse(hasattr(sample_infostate, method))
+
     def test_flatten(self):
         """
         This confirms whether the infostate is properly flattened on its way to 
@@ -365,6 +626,58 @@ class TestInfostate(unittest.TestCase):
         self.assertEqual(len(infostate_split), 147)
 
 
+class TestZobrist(unittest.TestCase):
+    """
+    This tests the incrementally updated hashes of boards and infostates.
+    """
+
+    sample_state_matrix = [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 17, 1, 0, 0, 2, 30, 0],
+        [0, 0, 15, 0, 0, 9, 15, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 23, 0, 29, 0, 0, 0],
+        [0, 0, 0, 6, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 16, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ]
+
+    def test_board_hash(self):
+        """
+        This checks that the hash updated by apply and undo always matches the
+        hash computed from scratch.
+        """
+        sample_board = Board(self.sample_state_matrix,
+                             player_to_move=Player.RED,
+                             blue_anticipating=False, red_anticipating=False)
+        starting_hash = sample_board.zobrist
+        record = sample_board.apply(action=Action.from_string("4353"))
+        self.assertNotEqual(sample_board.zobrist, starting_hash)
+        self.assertEqual(sample_board.zobrist, Zobrist.hash_board(sample_board))
+        sample_board.undo(record)
+        self.assertEqual(sample_board.zobrist, starting_hash)
+
+    def test_infostate_hash(self):
+        """
+        This checks that the hash updated by an infostate transition matches
+        the hash computed from scratch.
+        """
+        sample_board = Board(self.sample_state_matrix,
+                             player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        sample_infostate = Infostate.at_start(owner=Player.BLUE,
+                                              board=sample_board)
+        for action, result in [("4353", Result.WIN), ("1222", Result.WIN),
+                               ("2535", Result.OCCUPY), ("1617", Result.LOSS),
+                               ("1211", Result.DRAW)]:
+            next_infostate = sample_infostate.transition(
+                action=Action.from_string(action), result=result)
+            self.assertEqual(next_infostate.zobrist,
+                             Zobrist.hash_infostate(next_infostate))
+            self.assertNotEqual(next_infostate.zobrist,
+                                sample_infostate.zobrist)
+
+
 class TestPlayer(unittest.TestCase):
     """
     This tests the Player class, which handles player related functions such as
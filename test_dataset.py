@@ -0,0 +1,231 @@
+"""
+This is for testing classes and functions in the dataset module.
+"""
+import csv
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from core import Board, Infostate, Player
+from dataset import (SampleFormat, SampleWriter, SampleDataset, load_shard,
+                     convert_csv, CSVSampleWriter, AsyncSampleSink)
+
+
+class TestSampleFormat(unittest.TestCase):
+    """
+    This is for testing the binary format of the training samples.
+    """
+
+    sample_state_matrix = [
+        [1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 5, 0, 0, 0, 0, 0],
+        [0, 0, 0, 16, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 20],
+    ]
+
+    def test_features(self):
+        """
+        This checks that the features match the infostate string of the CSV
+        format.
+        """
+        board = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        for owner in [Player.BLUE, Player.RED]:
+            infostate = Infostate.at_start(owner=owner, board=board)
+            self.assertListEqual(
+                SampleFormat.features(infostate).tolist(),
+                list(map(int, str(infostate).split(" "))))
+
+    def test_writer(self):
+        """
+        This checks that a shard holds exactly the samples written, across
+        chunks and shards.
+        """
+        rng = np.random.default_rng(0)
+        features = rng.integers(0, 31, size=(5, SampleFormat.FEATURES))
+        policies = rng.random((5, SampleFormat.POLICY))
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"shard_{n}.npy")
+                     for n in range(2)]
+            for path, samples in zip(paths, [range(3), range(3, 5)]):
+                with SampleWriter(path, capacity=10, policy_dtype=np.float32,
+                                  chunk_size=2) as writer:
+                    for n in samples:
+                        writer.write_features(features[n], policies[n])
+
+            self.assertEqual(len(load_shard(paths[0])), 3)
+            dataset = SampleDataset(paths)
+            self.assertEqual(len(dataset), 5)
+            sample_features, sample_policy = dataset[3]
+            np.testing.assert_array_equal(sample_features, features[3])
+            np.testing.assert_allclose(sample_policy, policies[3], rtol=1e-6)
+            all_features, all_policies = dataset.arrays()
+            np.testing.assert_array_equal(all_features, features)
+            self.assertEqual(all_policies.shape, policies.shape)
+            del dataset, all_features, all_policies
+
+    def test_growth(self):
+        """
+        This checks that a full shard with a growth is extended rather than
+        refusing samples.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard.npy")
+            with SampleWriter(path, capacity=2, chunk_size=2,
+                              growth=2) as writer:
+                for n in range(5):
+                    writer.write_features(np.full(SampleFormat.FEATURES, n),
+                                          np.zeros(SampleFormat.POLICY))
+                self.assertEqual(writer.capacity, 6)
+            records = load_shard(path)
+            self.assertEqual(len(records), 5)
+            np.testing.assert_array_equal(records['features'][:, 0],
+                                          np.arange(5))
+            del records
+
+    def test_unclosed_writer(self):
+        """
+        This checks that a shard whose writer was never closed holds only the
+        flushed samples, not the preallocated records.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard.npy")
+            writer = SampleWriter(path, capacity=10, chunk_size=2)
+            self.assertEqual(len(load_shard(path)), 0)
+            for n in range(3):
+                writer.write_features(np.full(SampleFormat.FEATURES, n),
+                                      np.zeros(SampleFormat.POLICY))
+            records = load_shard(path)
+            self.assertEqual(len(records), 2)
+            np.testing.assert_array_equal(records['features'][1], 1)
+            self.assertEqual(len(SampleDataset([path])), 2)
+            writer.close()
+            self.assertEqual(len(load_shard(path)), 3)
+            del records
+
+    def test_sparse_policy(self):
+        """
+        This checks that sparse policies are expanded to the dense policies
+        written, keeping only the most probable actions that fit.
+        """
+        policies = np.zeros((2, SampleFormat.POLICY))
+        policies[0, [0, 7, 253]] = [0.25, 0.25, 0.5]
+        policies[1, [3, 4, 5, 6]] = [0.1, 0.2, 0.3, 0.4]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard.npy")
+            with SampleWriter(path, capacity=2, policy_dtype=np.float32,
+                              sparse_width=3) as writer:
+                for policy in policies:
+                    writer.write_features(
+                        np.zeros(SampleFormat.FEATURES), policy)
+
+            dataset = SampleDataset([path])
+            np.testing.assert_allclose(dataset[0][1], policies[0])
+            _, expanded = dataset.arrays()
+            np.testing.assert_allclose(expanded[1, [3, 4, 5, 6]],
+                                       [0.0, 2/9, 3/9, 4/9], rtol=1e-6)
+            del dataset
+
+    def test_convert_csv(self):
+        """
+        This checks that the CSV format converts to the same samples.
+        """
+        rows = [[n]*SampleFormat.FEATURES + [0.25*n]*SampleFormat.POLICY
+                for n in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "training_data.csv")
+            shard_path = os.path.join(directory, "training_data.npy")
+            with open(csv_path, "w", encoding="utf-8") as training_data:
+                csv.writer(training_data).writerows(rows)
+
+            self.assertEqual(convert_csv(csv_path, shard_path), 3)
+            records = load_shard(shard_path)
+            np.testing.assert_array_equal(records['features'][2],
+                                          rows[2][:SampleFormat.FEATURES])
+            np.testing.assert_allclose(records['policy'][2],
+                                       rows[2][SampleFormat.FEATURES:])
+            del records
+
+
+class TestAsyncSampleSink(unittest.TestCase):
+    """
+    This is for testing the background writing of training samples.
+    """
+
+    def setUp(self):
+        board = Board(TestSampleFormat.sample_state_matrix,
+                      player_to_move=Player.BLUE, blue_anticipating=False,
+                      red_anticipating=False)
+        self.infostate = Infostate.at_start(owner=Player.BLUE, board=board)
+        self.policy = np.zeros(SampleFormat.POLICY)
+        self.policy[[1, 2]] = 0.5
+
+    def test_flush(self):
+        """
+        This checks that queued samples are flushed after the time threshold
+        and that closing the sink writes the rest.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "training_data.csv")
+            sink = AsyncSampleSink(CSVSampleWriter(path), batch_size=100,
+                                   flush_interval=0.05)
+            sink.write(self.infostate, self.policy)
+            time.sleep(0.5)
+            with open(path, encoding="utf-8") as training_data:
+                rows = list(csv.reader(training_data))
+            self.assertEqual(len(rows), 1)
+            self.assertListEqual(
+                rows[0][:SampleFormat.FEATURES],
+                str(self.infostate).split(" "))
+
+            for _ in range(9):
+                sink.write(self.infostate, self.policy)
+            sink.close()
+            with open(path, encoding="utf-8") as training_data:
+                self.assertEqual(len(training_data.readlines()), 10)
+
+    def test_unclosed_shard(self):
+        """
+        This checks that a binary shard behind a sink that was never closed
+        holds only the samples of the flushed batches.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard.npy")
+            writer = SampleWriter(path, capacity=100)
+            sink = AsyncSampleSink(writer, batch_size=4, flush_interval=60.0)
+            for _ in range(6):
+                sink.write(self.infostate, self.policy)
+            deadline = time.monotonic() + 5.0
+            while (len(load_shard(path)) < 4
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+            records = load_shard(path)
+            self.assertEqual(len(records), 4)
+            np.testing.assert_array_equal(
+                records['features'][3], SampleFormat.features(self.infostate))
+            del records
+            sink.close()
+
+    def test_writer_error(self):
+        """
+        This checks that a failure of the writer is raised to the producer.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard.npy")
+            sink = AsyncSampleSink(SampleWriter(path, capacity=1),
+                                   batch_size=1)
+            for _ in range(2):
+                sink.write(self.infostate, self.policy)
+            with self.assertRaises(RuntimeError):
+                sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+This is for testing classes and functions in the simulation module.
+"""
+import contextlib
+import io
+import random
+import unittest
+
+from constants import Controller, POV, Ranking
+from core import Player
+from simulation import (MatchSimulator, Rendering, FrameRenderer, Agent,
+                        RandomAgent)
+
+
+class TestMatchSimulator(unittest.TestCase):
+    """
+    This is for testing the simulation of GG matches.
+    """
+
+    def setUp(self):
+        random.seed(0)
+        formations = [list(Player.get_sensible_random_formation(
+            piece_list=Ranking.SORTED_FORMATION)) for _ in range(2)]
+        self.simulator = MatchSimulator(
+            formations=formations,
+            controllers=[Controller.RANDOM, Controller.RANDOM],
+            save_data=False, pov=POV.WORLD)
+
+    def test_headless(self):
+        """
+        This checks that a headless simulation prints nothing but its
+        progress reports, which count every game and ply.
+        """
+        reports = []
+        self.simulator.rendering = Rendering.headless(report_interval=0.0)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.simulator.start(iterations=2)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.startswith("games=") for line in lines))
+
+        self.simulator.progress.callback = reports.append
+        self.simulator.progress.emit()
+        self.assertEqual(reports[0].games, 2)
+        self.assertGreater(reports[0].plies, 0)
+
+    def test_sampled_rendering(self):
+        """
+        This checks that only every Nth ply of every Nth game is rendered.
+        """
+        self.simulator.rendering = Rendering(game_interval=2, ply_interval=10)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.simulator.start(iterations=2)
+        turns = [int(line.split(": ")[1]) for line
+                 in output.getvalue().splitlines()
+                 if line.startswith("Turn Number")]
+        self.assertEqual(turns[:2], [1, 11])
+        self.assertEqual(len(turns), len(set(turns)))
+        self.assertEqual(output.getvalue().count("[VICTORY")
+                         + output.getvalue().count("[DRAW]"), 1)
+
+
+class TestFrameRenderer(unittest.TestCase):
+    """
+    This is for testing the writing of rendered frames.
+    """
+
+    def test_draw(self):
+        """
+        This checks that frames are redrawn in place and that frames beyond
+        the rate limit are dropped unless forced.
+        """
+        stream = io.StringIO()
+        renderer = FrameRenderer(stream=stream, in_place=True, max_fps=1)
+        self.assertTrue(renderer.draw("first\n"))
+        self.assertFalse(renderer.draw("second\n"))
+        self.assertTrue(renderer.draw("last\n", force=True))
+        self.assertEqual(stream.getvalue(),
+                         FrameRenderer.REDRAW + "first\n"
+                         + FrameRenderer.REDRAW + "last\n")
+
+
+class TestAgent(unittest.TestCase):
+    """
+    This is for testing the interface of the agents.
+    """
+
+    def test_abstract(self):
+        """
+        This checks that an agent cannot be created without a way of choosing
+        its actions.
+        """
+        class IdleAgent(Agent):
+            """
+            This only observes the game.
+            """
+
+        with self.assertRaises(TypeError):
+            IdleAgent()
+        self.assertEqual(RandomAgent("x").name, "x")
+
+
+if __name__ == '__main__':
+    unittest.main()
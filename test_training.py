@@ -1,9 +1,23 @@
 """
 This is for testing classes and functions in the training module.
 """
+import contextlib
+import io
+import os
+import tempfile
 import unittest
-from core import Board
-from training import TimelessBoard
+
+import numpy as np
+
+from core import Action, Board, Infostate, Player
+from constants import UpdateRule
+from dataset import SampleDataset
+from helpers import get_blank_matrix
+from training import (TimelessBoard, Abstraction, CFRTrainer,
+                      DepthLimitedCFRTrainer, CFRTrainingSimulator, Pruning,
+                      SharedTableStore, ExternalSamplingMCCFRTrainer,
+                      OutcomeSamplingMCCFRTrainer, SelfPlayCoordinator,
+                      CFRParameters)
 
 
 class TestTimelessBoard(unittest.TestCase):
@@ -36,6 +50,524 @@ class TestTimelessBoard(unittest.TestCase):
 
         self.assertEqual(len(actions), 254)
 
+    def test_actions_match_ids(self):
+        """
+        This checks that the position of each action in the list is its id.
+        """
+        for action, label in enumerate(TimelessBoard.actions()):
+            self.assertEqual(Action.from_string(label), action)
+
+
+class TestDepthLimitedCFRTrainer(unittest.TestCase):
+    """
+    This is for testing the DepthLimitedCFRTrainer class.
+    """
+
+    sample_state_matrix = [
+        [1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 5, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 20, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 16],
+    ]
+
+    def test_reach_probabilities(self):
+        """
+        This checks the tables of a depth 2 traversal for red against tables
+        computed by hand: red's infostates are reached with blue's uniform
+        probability at the root, which weights their regrets, while red's own
+        probability of one weights their strategies.
+        """
+        board = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=board)
+        trainer = DepthLimitedCFRTrainer()
+        trainer.cfr(params=CFRParameters(
+            abstraction=Abstraction(state=board, infostate=infostate),
+            current_player=Player.RED, iteration=0, blue_probability=1,
+            red_probability=1, depth=2))
+
+        blue_probability = 1/len(board.actions())
+        expected_tables = []
+        for action in board.actions():
+            child = board.transition(action)
+            # Red's utilities are those of blue's material after red moves
+            utilities = [-child.transition(red_action).material()
+                         for red_action in child.actions()]
+            node_utility = sum(utilities)/len(utilities)
+            expected_tables.append((
+                [blue_probability*(utility - node_utility)
+                 for utility in utilities],
+                [1/len(utilities)]*len(utilities)))
+        tables = [(trainer.regret_tables[key], trainer.strategy_tables[key])
+                  for key in trainer.regret_tables]
+
+        self.assertEqual(len(tables), len(expected_tables))
+        for (regrets, strategy), (expected_regrets, expected_strategy) in zip(
+                sorted(tables, key=lambda table: list(table[0])),
+                sorted(expected_tables, key=lambda table: table[0])):
+            self.assertEqual(len(regrets), len(expected_regrets))
+            for value, expected in zip(list(regrets) + list(strategy),
+                                       expected_regrets + expected_strategy):
+                self.assertAlmostEqual(value, expected)
+
+
+class TestCFRTrainer(unittest.TestCase):
+    """
+    This is for testing the table computations of the CFRTrainer class.
+    """
+
+    sample_state_matrix = [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 1, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 16, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ]
+
+    def test_regret_match(self):
+        """
+        This checks that the next profile is proportional to the positive
+        regrets, and uniform when no action has positive regret.
+        """
+        profile = CFRTrainer._regret_match(
+            regret_table=np.array([3.0, -1.0, 1.0, 0.0]))
+        np.testing.assert_allclose(profile, [0.75, 0.0, 0.25, 0.0])
+        profile = CFRTrainer._regret_match(
+            regret_table=np.array([-3.0, -1.0, 1.0, 0.0]))
+        np.testing.assert_allclose(profile, [0.0, 0.0, 1.0, 0.0])
+        profile = CFRTrainer._regret_match(
+            regret_table=np.array([-3.0, -1.0, -1.0, 0.0]))
+        np.testing.assert_allclose(profile, [0.25, 0.25, 0.25, 0.25])
+
+    def test_update_rules(self):
+        """
+        This checks the regret and strategy accumulation of each update rule.
+        """
+        regrets, strategy = np.array([2.0, -2.0]), np.array([0.5, 0.5])
+        expected = {
+            UpdateRule.VANILLA: ([3.0, -3.0], [1.0, 1.0]),
+            UpdateRule.CFR_PLUS: ([3.0, 0.0], [1.5, 1.5]),
+            UpdateRule.LINEAR: ([4.0, -4.0], [1.5, 1.5]),
+            UpdateRule.DISCOUNTED: ([2.0*2**1.5/(2**1.5 + 1) + 1, -2.0],
+                                    [0.5*(2/3)**2 + 0.5, 0.5*(2/3)**2 + 0.5])
+        }
+        for update_rule, (expected_regrets, expected_strategy) in (
+                expected.items()):
+            trainer = CFRTrainer(update_rule=update_rule)
+            regret_table, strategy_table = regrets.copy(), strategy.copy()
+            # The second iteration, so that the weights are not all one
+            trainer._accumulate_regrets(0, regret_table, np.array([1.0, -1.0]),
+                                        iteration=1)
+            trainer._accumulate_strategy(0, strategy_table, strategy,
+                                         iteration=1)
+            np.testing.assert_allclose(regret_table, expected_regrets)
+            np.testing.assert_allclose(strategy_table, expected_strategy)
+
+    def test_discounting_once_per_iteration(self):
+        """
+        This checks that an infostate reached again in the same iteration only
+        has its increments added, without discounting its tables again.
+        """
+        trainer = CFRTrainer(update_rule=UpdateRule.DISCOUNTED)
+        regret_table, strategy_table = np.array([2.0, -2.0]), np.ones(2)
+        for _ in range(2):
+            trainer._accumulate_regrets(0, regret_table, np.array([1.0, -1.0]),
+                                        iteration=1)
+            trainer._accumulate_strategy(0, strategy_table, np.ones(2),
+                                         iteration=1)
+        np.testing.assert_allclose(
+            regret_table, [2.0*2**1.5/(2**1.5 + 1) + 2, -3.0])
+        np.testing.assert_allclose(strategy_table, [(2/3)**2 + 2]*2)
+
+    def test_winning_move(self):
+        """
+        This checks that every update rule favors capturing the flag within a
+        few iterations.
+        """
+        sample_state_matrix = [
+            [1, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 5, 0, 0, 0, 0, 0],
+            [0, 0, 0, 16, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 20],
+        ]
+        for update_rule in [UpdateRule.VANILLA, UpdateRule.CFR_PLUS,
+                            UpdateRule.LINEAR, UpdateRule.DISCOUNTED]:
+            state = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                          blue_anticipating=False, red_anticipating=False)
+            infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+            trainer = DepthLimitedCFRTrainer(update_rule=update_rule)
+            trainer.solve(abstraction=Abstraction(state=state,
+                                                  infostate=infostate),
+                          iterations=3)
+            strategy = CFRTrainingSimulator._distill_strategy(
+                raw_strategy=trainer.strategy_tables[infostate.zobrist])
+            winning_move = Action.from_string("3343")
+            self.assertEqual(
+                state.actions()[int(np.argmax(strategy))], winning_move)
+
+    def test_pruning(self):
+        """
+        This checks that pruning skips subtrees without changing the preferred
+        action, and that the pruned nodes are counted per solve.
+        """
+        sample_state_matrix = [
+            [1, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 5, 0, 0, 0, 0, 0],
+            [0, 0, 0, 16, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 20],
+        ]
+        strategies = []
+        for pruning in [None, Pruning(threshold=0.0)]:
+            state = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                          blue_anticipating=False, red_anticipating=False)
+            infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+            trainer = DepthLimitedCFRTrainer(pruning=pruning)
+            for _ in range(2):
+                trainer.solve(abstraction=Abstraction(state=state,
+                                                      infostate=infostate),
+                              iterations=5)
+                self.assertEqual(trainer.pruned_nodes > 0, pruning is not None)
+            strategies.append(trainer.strategy_tables[infostate.zobrist])
+        self.assertEqual(np.argmax(strategies[0]), np.argmax(strategies[1]))
+
+    def test_warm_start(self):
+        """
+        This checks that a trainer keeps its tables across solves while
+        evicting the least recently used ones beyond its size bound.
+        """
+        state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+        trainer = DepthLimitedCFRTrainer(max_tables=10)
+        trainer.solve(abstraction=Abstraction(state=state, infostate=infostate),
+                      iterations=2, depth=3)
+        self.assertEqual(len(trainer.regret_tables), 10)
+        strategy = trainer.strategy_tables[infostate.zobrist].copy()
+        trainer.solve(abstraction=Abstraction(state=state, infostate=infostate),
+                      iterations=2, depth=1)
+        self.assertEqual(trainer.iterations_run, 4)
+        self.assertLessEqual(len(trainer.regret_tables), 10)
+        self.assertEqual(set(trainer.regret_tables),
+                         set(trainer.strategy_tables))
+        # The root's strategy continues from the first solve
+        self.assertTrue(
+            (trainer.strategy_tables[infostate.zobrist] >= strategy).all())
+        self.assertGreater(trainer.strategy_tables[infostate.zobrist].sum(),
+                           strategy.sum())
+
+    def test_transposition_table(self):
+        """
+        This checks that caching the leaf utilities leaves the strategy
+        unchanged, and that the cache lookups are counted. The cache is only
+        kept when a size is given.
+        """
+        self.assertIsNone(DepthLimitedCFRTrainer().transposition_table)
+        strategies = []
+        for size in [None, 1 << 10]:
+            state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                          blue_anticipating=False, red_anticipating=False)
+            infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+            trainer = DepthLimitedCFRTrainer(transposition_table_size=size)
+            trainer.solve(abstraction=Abstraction(state=state,
+                                                  infostate=infostate),
+                          iterations=3, depth=3)
+            strategies.append(trainer.strategy_tables[infostate.zobrist])
+        table = trainer.transposition_table
+        self.assertGreater(table.hits, 0)
+        self.assertGreater(table.misses, 0)
+        self.assertAlmostEqual(table.hit_rate(),
+                               table.hits/(table.hits + table.misses))
+        np.testing.assert_allclose(strategies[0], strategies[1])
+
+    def test_filtered_utility(self):
+        """
+        This checks that an action left out by the actions filter is valued
+        from the side of the player whose utility is computed, whoever is to
+        move at the node.
+        """
+        state_matrix = get_blank_matrix(Board.ROWS, Board.COLUMNS)
+        state_matrix[0][0], state_matrix[0][1] = 1, 5
+        state_matrix[7][8] = 16
+        state = Board(state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        self.assertNotEqual(state.material(), 0)
+        trainer = DepthLimitedCFRTrainer()
+        self.assertEqual(trainer._filtered_utility(state, Player.BLUE),
+                         state.material())
+        self.assertEqual(trainer._filtered_utility(state, Player.RED),
+                         -state.material())
+
+    def test_solve_within(self):
+        """
+        This checks that a time budgeted search deepens from depth 1 and
+        leaves a strategy for the solved infostate.
+        """
+        state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+        trainer = DepthLimitedCFRTrainer()
+        depth = trainer.solve_within(
+            abstraction=Abstraction(state=state, infostate=infostate),
+            time_budget=50, max_depth=3)
+        self.assertIn(depth, [1, 2, 3])
+        self.assertGreater(trainer.iterations_run, 0)
+        self.assertEqual(len(trainer.strategy_tables[infostate.zobrist]),
+                         len(state.actions()))
+
+    def test_parallel_solve(self):
+        """
+        This checks that searching the root's subtrees in worker processes
+        gives the same tables as searching them in order. The search is deep
+        enough for each player's infostates to appear inside the subtrees,
+        and runs for more than one iteration, so the workers must be given
+        the tables found by the traversals of both players. Infostates are
+        also reached along more than one line, and must be discounted once in
+        each iteration wherever their visits are accumulated.
+        """
+        state_matrix = get_blank_matrix(Board.ROWS, Board.COLUMNS)
+        state_matrix[1][3], state_matrix[1][5] = 1, 2
+        state_matrix[6][5], state_matrix[6][2] = 16, 18
+        for update_rule in [UpdateRule.VANILLA, UpdateRule.CFR_PLUS,
+                            UpdateRule.DISCOUNTED]:
+            trainers = []
+            for workers in [1, 2]:
+                state = Board(state_matrix, player_to_move=Player.BLUE,
+                              blue_anticipating=False, red_anticipating=False)
+                infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+                trainer = DepthLimitedCFRTrainer(update_rule=update_rule)
+                trainer.solve(abstraction=Abstraction(state=state,
+                                                      infostate=infostate),
+                              iterations=2, depth=5, workers=workers)
+                trainers.append(trainer)
+            self.assertSetEqual(set(trainers[0].regret_tables),
+                                set(trainers[1].regret_tables))
+            # The merged increments are summed in another order
+            for key, strategy_table in trainers[0].strategy_tables.items():
+                np.testing.assert_allclose(strategy_table,
+                                           trainers[1].strategy_tables[key],
+                                           atol=1e-9)
+                np.testing.assert_allclose(trainers[0].regret_tables[key],
+                                           trainers[1].regret_tables[key],
+                                           atol=1e-9)
+                np.testing.assert_allclose(trainers[0].profiles[key],
+                                           trainers[1].profiles[key],
+                                           atol=1e-9)
+
+    def test_merge_increments(self):
+        """
+        This checks that the increments of workers that reached the same
+        infostate are accumulated under the update rule, with the profile
+        matched to the merged regrets.
+        """
+        trainer = DepthLimitedCFRTrainer(update_rule=UpdateRule.CFR_PLUS)
+        trainer.regret_tables[1] = np.array([1.0, 0.0])
+        trainer.strategy_tables[1] = np.zeros(2)
+        for regrets in [[-3.0, 1.0], [0.5, 1.0]]:
+            trainer._merge_increments(
+                {1: (np.array(regrets), np.array([0.5, 0.5]))}, iteration=0)
+        np.testing.assert_allclose(trainer.regret_tables[1], [0.5, 2.0])
+        np.testing.assert_allclose(trainer.strategy_tables[1], [1.0, 1.0])
+        np.testing.assert_allclose(trainer.profiles[1], [0.2, 0.8])
+
+    def test_shared_table_keys(self):
+        """
+        This checks that every hash, including zero, gets its own slot in a
+        shared store.
+        """
+        store = SharedTableStore.create(capacity=4)
+        try:
+            for key in [0, 1, 4]:
+                store.regret_tables[key] = np.full(2, float(key))
+            self.assertEqual(len(store), 3)
+            self.assertSetEqual(set(store.regret_tables), {0, 1, 4})
+            for key in [0, 1, 4]:
+                np.testing.assert_array_equal(store.regret_tables[key],
+                                              [key, key])
+            self.assertNotIn(2, store.regret_tables)
+        finally:
+            store.close()
+            store.unlink()
+
+    def test_shared_table_store(self):
+        """
+        This checks that a trainer keeping its tables in shared memory matches
+        one keeping them in dictionaries, and that worker processes accumulate
+        into the shared tables.
+        """
+        store = SharedTableStore.create(capacity=1 << 12)
+        try:
+            trainers = []
+            for table_store in [None, store]:
+                state = Board(self.sample_state_matrix,
+                              player_to_move=Player.BLUE,
+                              blue_anticipating=False, red_anticipating=False)
+                infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+                trainer = DepthLimitedCFRTrainer(
+                    update_rule=UpdateRule.CFR_PLUS, table_store=table_store)
+                trainer.solve(abstraction=Abstraction(state=state,
+                                                      infostate=infostate),
+                              iterations=3, depth=3)
+                trainers.append(trainer)
+            for key, strategy_table in trainers[0].strategy_tables.items():
+                np.testing.assert_allclose(store.strategy_tables[key],
+                                           strategy_table, rtol=1e-5)
+
+            root_strategy = store.strategy_tables[infostate.zobrist].copy()
+            trainers[1].solve(abstraction=Abstraction(state=state,
+                                                      infostate=infostate),
+                              iterations=1, depth=3, workers=2)
+            self.assertGreater(store.strategy_tables[infostate.zobrist].sum(),
+                               root_strategy.sum())
+            self.assertEqual(len(store), len(store.regret_tables))
+        finally:
+            store.close()
+            store.unlink()
+
+    def test_distill_strategy(self):
+        """
+        This checks that the strategy sums are normalized over their positive
+        entries.
+        """
+        strategy = CFRTrainingSimulator._distill_strategy(
+            raw_strategy=np.array([2.0, 0.0, 6.0, -1.0]))
+        np.testing.assert_allclose(strategy, [0.25, 0.0, 0.75, 0.0])
+
+
+class TestMCCFRTrainers(unittest.TestCase):
+    """
+    This is for testing the Monte Carlo CFR trainers.
+    """
+
+    sample_state_matrix = [
+        [1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 5, 0, 0, 0, 0, 0],
+        [0, 0, 0, 16, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 20],
+    ]
+
+    def test_solve(self):
+        """
+        This checks that the sampling trainers fill in the same kind of tables
+        as the other trainers, without changing the solved position.
+        """
+        for trainer_class in [ExternalSamplingMCCFRTrainer,
+                              OutcomeSamplingMCCFRTrainer]:
+            state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                          blue_anticipating=False, red_anticipating=False)
+            infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+            trainer = trainer_class()
+            trainer.solve(abstraction=Abstraction(state=state,
+                                                  infostate=infostate),
+                          iterations=20)
+            strategy = trainer.strategy_tables[infostate.zobrist]
+            self.assertEqual(len(strategy), len(state.actions()))
+            self.assertTrue((strategy >= 0).all() and strategy.sum() > 0)
+            self.assertListEqual(state.matrix, self.sample_state_matrix)
+
+    def test_unsupported_options(self):
+        """
+        This checks that the sampling trainers take the options of the full
+        width trainers, refusing the ones they do not support.
+        """
+        state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+        for trainer_class in [ExternalSamplingMCCFRTrainer,
+                              OutcomeSamplingMCCFRTrainer]:
+            trainer = trainer_class(update_rule=UpdateRule.CFR_PLUS,
+                                    transposition_table_size=1 << 10)
+            self.assertEqual(trainer.transposition_table.size, 1 << 10)
+            with self.assertRaises(ValueError):
+                trainer_class(pruning=Pruning())
+            with self.assertRaises(ValueError):
+                trainer.solve(abstraction=Abstraction(state=state,
+                                                      infostate=infostate),
+                              iterations=1, workers=2)
+
+    def test_get_cfr_input(self):
+        """
+        This checks that the training simulator can choose its moves with a
+        sampling trainer.
+        """
+        simulator = CFRTrainingSimulator(formations=[None, None],
+                                         controllers=None, save_data=False,
+                                         pov=None)
+        simulator.trainer_class = OutcomeSamplingMCCFRTrainer
+        state = Board(self.sample_state_matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=state)
+        action, trainer = simulator.get_cfr_input(
+            abstraction=Abstraction(state=state, infostate=infostate))
+        self.assertIn(action, state.actions())
+        self.assertIsInstance(trainer, OutcomeSamplingMCCFRTrainer)
+
+
+class TestSelfPlayCoordinator(unittest.TestCase):
+    """
+    This is for testing the parallel generation of training data.
+    """
+
+    def test_run(self):
+        """
+        This checks that the workers write exactly the target number of
+        samples between their shards.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            coordinator = SelfPlayCoordinator(
+                workers=2, seed=0, binary=False,
+                shard_prefix=os.path.join(directory, "training_data"))
+            tasks = coordinator.tasks(target=4)
+            self.assertListEqual([task.seed for task in tasks], [0, 1])
+            with contextlib.redirect_stdout(io.StringIO()):
+                sampled = coordinator.run(target=4, report_interval=1.0)
+            self.assertEqual(sampled, 4)
+            rows = 0
+            for task in tasks:
+                if os.path.exists(task.data_path):
+                    with open(task.data_path, encoding="utf-8") as shard:
+                        rows += len(shard.readlines())
+            self.assertEqual(rows, 4)
+
+    def test_run_binary(self):
+        """
+        This checks that the binary shards written by default are sized for
+        each worker's share, and trimmed to the samples written.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            coordinator = SelfPlayCoordinator(
+                workers=2, seed=0,
+                shard_prefix=os.path.join(directory, "training_data"))
+            self.assertListEqual(
+                [task.capacity for task in coordinator.tasks(target=3)],
+                [2, 2])
+            with contextlib.redirect_stdout(io.StringIO()):
+                coordinator.run(target=3, report_interval=1.0)
+            dataset = SampleDataset([task.data_path for task
+                                     in coordinator.tasks(target=3)])
+            self.assertEqual(len(dataset), 3)
+            _, policy = dataset[0]
+            self.assertAlmostEqual(float(policy.sum()), 1.0, places=2)
+            del dataset
+
 
 if __name__ == '__main__':
     unittest.main()
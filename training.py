@@ -2,14 +2,27 @@
 This contains definitions relevant to the training of an AI for GG.
 """
 
+import os
 import random
 import csv
+import time
+import multiprocessing
 
-from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
 
-from core import Board, Infostate, Player
-from simulation import MatchSimulator
-from constants import POV, Ranking, Result
+import numpy as np
+
+from core import Action, Board, Infostate, Player
+from dataset import (SampleFormat, SampleWriter, CSVSampleWriter,
+                     AsyncSampleSink)
+from simulation import (MatchSimulator, ProgressReporter, Rendering,
+                        FrameRenderer, Agent)
+from constants import POV, Ranking, Result, UpdateRule
 
 
 class Abstraction:
@@ -64,28 +77,11 @@ class TimelessBoard:
     def actions():
         """
         This enumerates all the possible actions that can be chosen in every
-        game for all the players.
+        game for all the players, in their string form. The position of each
+        action in the list is its id (see the Action class).
         """
 
-        valid_actions = []  # Initialize return value
-        bottom_row_number = leftmost_column_number = 0
-
-        for row in range(Board.ROWS):
-            for column in range(Board.COLUMNS):
-                # Define change in coordinates per direction (up, down, left,
-                # and right)
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                for direction in directions:
-                    direction_row, direction_column = direction
-                    new_row, new_column = (row + direction_row,
-                                           column + direction_column)
-
-                    if (bottom_row_number <= new_row < Board.ROWS
-                            and leftmost_column_number <= new_column < Board.COLUMNS):
-                        valid_actions.append(
-                            f"{row}{column}{new_row}{new_column}")
-
-        return valid_actions
+        return list(Action.LABELS)
 
 
 @dataclass
@@ -101,6 +97,33 @@ class CFRParameters:
     red_probability: float
     depth: int = None
     actions_filter: 'ActionsFilter' = None
+    sample_probability: float = 1.0
+    parallel: bool = False
+
+
+@dataclass
+class Discounting:
+    """
+    This is for storing the exponents of discounted CFR. Positive regrets are
+    scaled by t^alpha/(t^alpha + 1), negative regrets by t^beta/(t^beta + 1)
+    and the strategy sums by (t/(t + 1))^gamma, where t is the iteration.
+    """
+    alpha: float = 1.5
+    beta: float = 0.0
+    gamma: float = 2.0
+
+
+@dataclass
+class Pruning:
+    """
+    This is for storing the settings of regret-based pruning. An action is
+    skipped while regret matching gives it no probability and its regret is
+    at most the threshold, except on every full_traversal_interval-th
+    iteration, when the whole tree is traversed again so that the regrets of
+    the pruned actions can recover.
+    """
+    threshold: float = 0.0
+    full_traversal_interval: int = 10
 
 
 @dataclass
@@ -119,13 +142,13 @@ class Tables:
     A class used to represent tables for storing regrets and strategies.
     Attributes
     ----------
-    regret_table : list of float
-        A list to store regret values.
-    strategy_table : list of float
-        A list to store strategy probabilities.
+    regret_table : numpy.ndarray of float
+        An array to store regret values.
+    strategy_table : numpy.ndarray of float
+        An array to store strategy probabilities.
     """
-    regret_table: list[float]
-    strategy_table: list[float]
+    regret_table: np.ndarray
+    strategy_table: np.ndarray
 
 
 @dataclass
@@ -136,11 +159,284 @@ class UpdateTablesParams:
     """
     state: Board
     tables: Tables
-    profile: list[float]
-    utilities: list[float]
+    profile: np.ndarray
+    utilities: np.ndarray
     node_utility: float
     probabilities: Probabilities
     infostate: Infostate
+    iteration: int = 0
+
+
+@dataclass
+class SubtreeTask:
+    """
+    This is for storing what a worker process needs to run an iteration of CFR
+    on the subtree of one of the root's children: the parameters of the child
+    node, and the tables of the infostates the subtree is known to contain, as
+    (regret, strategy, profile) triples. The tables are not sent if they are
+    kept in a SharedTableStore.
+    """
+    parameters: CFRParameters
+    tables: dict = field(default_factory=dict)
+    shared: bool = False  # Whether the worker's attached store has the tables
+
+
+@dataclass
+class SubtreeResult:
+    """
+    This is for storing the outcome of a SubtreeTask: the utility of the child,
+    the regrets and reach weighted profiles of the iteration for every
+    infostate visited, as (regrets, strategy) pairs summed over its visits
+    before any update rule is applied, and the number of pruned nodes.
+    """
+    utility: float
+    increments: dict
+    pruned_nodes: int
+
+
+@dataclass
+class SharedTableHandle:
+    """
+    This is for storing what a process needs to attach to a SharedTableStore.
+    The locks can only be handed to processes as they are started, e.g.
+    through the initializer of a process pool.
+    """
+    name: str
+    capacity: int
+    width: int
+    locks: list
+
+
+class SharedTableStore:
+    """
+    This keeps the regret and strategy tables of every infostate in a single
+    block of shared memory, so that several processes can accumulate into the
+    same tables without copying them. The block holds an open addressing index
+    from infostate hashes to slots, with a flag marking the occupied slots,
+    followed by a float32 row of regrets and a float32 row of strategy sums
+    for each slot.
+
+    Writes are guarded by lock striping: a slot is claimed under the lock of
+    the slot, and the rows of an infostate are updated under the lock of its
+    hash, each chosen among a fixed number of locks. Reads are not locked, so
+    a profile may be matched to regrets that are partway through an update,
+    which only delays that update to the next visit.
+    """
+
+    # A player has at most 21 pieces, each with at most 4 moves
+    WIDTH = 84
+    # The store attached by each worker process of a parallel solve
+    worker_store = None
+
+    def __init__(self, memory: shared_memory.SharedMemory,
+                 handle: SharedTableHandle):
+        self.memory = memory
+        self.handle = handle
+        capacity, width = handle.capacity, handle.width
+        offset = 0
+        self.keys = np.ndarray((capacity,), dtype=np.uint64,
+                               buffer=memory.buf, offset=offset)
+        offset += self.keys.nbytes
+        self.counts = np.ndarray((capacity,), dtype=np.uint16,
+                                 buffer=memory.buf, offset=offset)
+        offset += self.counts.nbytes
+        self.occupied = np.ndarray((capacity,), dtype=np.uint8,
+                                   buffer=memory.buf, offset=offset)
+        offset += self.occupied.nbytes
+        offset += -offset % np.dtype(np.float32).itemsize  # Keep rows aligned
+        self.regrets = np.ndarray((capacity, width), dtype=np.float32,
+                                  buffer=memory.buf, offset=offset)
+        offset += self.regrets.nbytes
+        self.strategies = np.ndarray((capacity, width), dtype=np.float32,
+                                     buffer=memory.buf, offset=offset)
+        self.regret_tables = SharedTables(store=self, rows=self.regrets)
+        self.strategy_tables = SharedTables(store=self, rows=self.strategies)
+
+    @staticmethod
+    def _size(capacity: int, width: int):
+        index_size = capacity*(np.dtype(np.uint64).itemsize
+                               + np.dtype(np.uint16).itemsize
+                               + np.dtype(np.uint8).itemsize)
+        index_size += -index_size % np.dtype(np.float32).itemsize
+
+        return index_size + 2*capacity*width*np.dtype(np.float32).itemsize
+
+    @staticmethod
+    def create(capacity: int = 1 << 16, width: int = WIDTH,
+               stripes: int = 64) -> 'SharedTableStore':
+        """
+        This allocates a new, zeroed store with the given number of slots.
+        """
+        memory = shared_memory.SharedMemory(
+            create=True, size=SharedTableStore._size(capacity, width))
+        memory.buf[:] = bytes(memory.size)
+        handle = SharedTableHandle(
+            name=memory.name, capacity=capacity, width=width,
+            locks=[multiprocessing.Lock() for _ in range(stripes)])
+
+        return SharedTableStore(memory=memory, handle=handle)
+
+    @staticmethod
+    def attach(handle: SharedTableHandle) -> 'SharedTableStore':
+        """
+        This opens a store created by another process.
+        """
+        return SharedTableStore(
+            memory=shared_memory.SharedMemory(name=handle.name), handle=handle)
+
+    @staticmethod
+    def attach_worker(handle: SharedTableHandle):
+        """
+        This attaches a worker process to a store, as the initializer of its
+        process pool.
+        """
+        SharedTableStore.worker_store = SharedTableStore.attach(handle)
+
+    def close(self):
+        """
+        This detaches the process from the store.
+        """
+        self.regret_tables = self.strategy_tables = None
+        self.keys = self.counts = self.occupied = None
+        self.regrets = self.strategies = None
+        self.memory.close()
+
+    def unlink(self):
+        """
+        This frees the shared memory, which only the creator should do once
+        every process has closed the store.
+        """
+        self.memory.unlink()
+
+    def lock(self, key: int):
+        """
+        This returns the lock that guards the rows of the given infostate.
+        """
+        locks = self.handle.locks
+        return locks[key % len(locks)]
+
+    def slot(self, key: int, count: int = None):
+        """
+        This finds the slot of an infostate by linear probing. If the number
+        of its actions is given, a free slot is claimed for a new infostate,
+        otherwise None is returned for it.
+        """
+        capacity, locks = self.handle.capacity, self.handle.locks
+        slot = key % capacity
+        for _ in range(capacity):
+            if self.occupied[slot]:
+                if int(self.keys[slot]) == key:
+                    return slot
+                slot = (slot + 1) % capacity
+                continue
+            if count is None:
+                return None
+            with locks[slot % len(locks)]:
+                if not self.occupied[slot]:
+                    if count > self.handle.width:
+                        raise ValueError(
+                            f"{count} actions do not fit in a row")
+                    # The slot is marked last, since readers only look at
+                    # the key and count of occupied slots
+                    self.counts[slot] = count
+                    self.keys[slot] = key
+                    self.occupied[slot] = 1
+                    return slot
+                if int(self.keys[slot]) == key:
+                    return slot
+            slot = (slot + 1) % capacity
+
+        if count is None:
+            return None
+        raise MemoryError("The shared table store is full")
+
+    def tables(self, key: int, count: int):
+        """
+        This returns views of the regret and strategy rows of an infostate
+        with the given number of actions, adding it if it is new.
+        """
+        slot = self.slot(key, count)
+
+        return self.regrets[slot, :count], self.strategies[slot, :count]
+
+    def __len__(self):
+        return int(np.count_nonzero(self.occupied))
+
+
+class SharedTables(MutableMapping):
+    """
+    This presents one kind of row of a SharedTableStore as a dictionary from
+    infostate hashes to arrays, like the tables of a CFRTrainer.
+    """
+
+    def __init__(self, store: SharedTableStore, rows: np.ndarray):
+        self.store = store
+        self.rows = rows
+
+    def __getitem__(self, key: int):
+        slot = self.store.slot(key)
+        if slot is None:
+            raise KeyError(key)
+
+        return self.rows[slot, :self.store.counts[slot]]
+
+    def __setitem__(self, key: int, table: np.ndarray):
+        row = self.rows[self.store.slot(key, len(table)), :len(table)]
+        if not np.shares_memory(row, table):
+            row[:] = table
+
+    def __delitem__(self, key: int):
+        raise TypeError("Infostates cannot be removed from a shared store")
+
+    def __iter__(self):
+        return (int(key) for key in self.store.keys[self.store.occupied != 0])
+
+    def __len__(self):
+        return len(self.store)
+
+
+class TranspositionTable:
+    """
+    This caches the utilities of leaf and terminal nodes, so that a position
+    reached through different move orders is evaluated only once. The entries
+    are keyed by the Zobrist hash of the arbiter's position along with the
+    remaining depth and the player whose utility is stored.
+
+    The table has a fixed number of slots, each holding a single entry, and a
+    new entry always replaces the one in its slot, since transpositions tend to
+    be reached again soon after each other.
+    """
+
+    def __init__(self, size: int = 1 << 16):
+        self.size = size
+        self.slots = [None]*size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[int, int, int]):
+        """
+        This returns the cached utility for the key, or None if it is absent.
+        """
+        entry = self.slots[hash(key) % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return None
+
+    def store(self, key: tuple[int, int, int], utility: float):
+        """
+        This caches the utility for the key, replacing the entry in its slot.
+        """
+        self.slots[hash(key) % self.size] = (key, utility)
+
+    def hit_rate(self) -> float:
+        """
+        This returns the fraction of lookups that found their utility.
+        """
+        lookups = self.hits + self.misses
+        return self.hits/lookups if lookups > 0 else 0.0
 
 
 @dataclass
@@ -180,75 +476,76 @@ class ActionsFilter:
 
         return filtered_actions
 
-    def _to_include(self, action: str):
+    def _to_include(self, action: int):
         """
         This method checks if an action is valid.
         """
+        start_row, start_col, dest_row, dest_col = Action.COORDINATES[action]
         is_included = False  # Initialize the return value
         # If the action's starting or destination square is in the whitelist
-        if ((int(action[0]), int(action[1])) in self.square_whitelist
-                or (int(action[2]), int(action[3])) in self.square_whitelist):
+        if ((start_row, start_col) in self.square_whitelist
+                or (dest_row, dest_col) in self.square_whitelist):
             is_included = True
         else:
             return False
 
         # Blue's forward moves are those that increase the row number
         if (self.state.player_to_move == Player.BLUE
-                and int(action[0]) < int(action[2]) and self.directions.forward):
+                and start_row < dest_row and self.directions.forward):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[0]) < int(action[2]) and not self.directions.forward):
+                and start_row < dest_row and not self.directions.forward):
             is_included = False
 
         if (self.state.player_to_move == Player.BLUE
-                and int(action[0]) > int(action[2]) and self.directions.back):
+                and start_row > dest_row and self.directions.back):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[0]) > int(action[2]) and not self.directions.back):
+                and start_row > dest_row and not self.directions.back):
             is_included = False
 
         # Blue's right moves are those that decrease the column number
         if (self.state.player_to_move == Player.BLUE
-                and int(action[1]) > int(action[3]) and self.directions.right):
+                and start_col > dest_col and self.directions.right):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[1]) > int(action[3]) and not self.directions.right):
+                and start_col > dest_col and not self.directions.right):
             is_included = False
 
         if (self.state.player_to_move == Player.BLUE
-                and int(action[1]) < int(action[3]) and self.directions.left):
+                and start_col < dest_col and self.directions.left):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[1]) < int(action[3]) and not self.directions.left):
+                and start_col < dest_col and not self.directions.left):
             is_included = False
 
         # Flip the logic for red player
         if (self.state.player_to_move == Player.RED
-                and int(action[0]) > int(action[2]) and self.directions.forward):
+                and start_row > dest_row and self.directions.forward):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[0]) > int(action[2]) and not self.directions.forward):
+                and start_row > dest_row and not self.directions.forward):
             is_included = False
 
         if (self.state.player_to_move == Player.RED
-                and int(action[0]) < int(action[2]) and self.directions.back):
+                and start_row < dest_row and self.directions.back):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[0]) < int(action[2]) and not self.directions.back):
+                and start_row < dest_row and not self.directions.back):
             is_included = False
 
         if (self.state.player_to_move == Player.RED
-                and int(action[1]) < int(action[3]) and self.directions.right):
+                and start_col < dest_col and self.directions.right):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[1]) < int(action[3]) and not self.directions.right):
+                and start_col < dest_col and not self.directions.right):
             is_included = False
 
         if (self.state.player_to_move == Player.RED and self.directions.left
-                and int(action[1]) > int(action[3])):
+                and start_col > dest_col):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[1]) > int(action[3]) and not self.directions.left):
+                and start_col > dest_col and not self.directions.left):
             is_included = False
         return is_included
 
@@ -256,50 +553,109 @@ class ActionsFilter:
 class CFRTrainer:
     """
     This is responsible for generating regret and strategy tables using the
-    counterfactual regret minimization algorithm.
+    counterfactual regret minimization algorithm. Each table holds a NumPy
+    array with an entry for every action of the infostate's position.
     """
 
-    def __init__(self):
-        self.regret_tables = {}
-        self.strategy_tables = {}
+    # The trainer built by each worker process of a parallel solve
+    worker_trainer = None
+
+    def __init__(self, update_rule: int = UpdateRule.VANILLA,
+                 discounting: Discounting = None, pruning: Pruning = None,
+                 max_tables: int = None, table_store: SharedTableStore = None):
+        """
+        The update rule sets how the regrets and strategies are accumulated
+        (see constant definitions in the UpdateRule class). The discounting
+        parameter is only used by discounted CFR. Regret-based pruning is
+        disabled unless its settings are given.
+
+        The tables are kept across calls to solve, so a trainer can be reused
+        to warm start the search of later positions. If max_tables is given,
+        the least recently used infostates are evicted at the end of every
+        solve until at most that many remain.
+
+        If a table store is given, the tables are kept in its shared memory
+        instead, where trainers in other processes accumulate into them too.
+        The profiles are then matched to the shared regrets whenever they are
+        needed, and nothing is evicted.
+        """
+        self.table_store = table_store
+        if table_store is not None:
+            self.regret_tables = table_store.regret_tables
+            self.strategy_tables = table_store.strategy_tables
+        else:
+            # The regret tables are ordered from the least recently used
+            self.regret_tables = OrderedDict()
+            self.strategy_tables = {}
         self.profiles = {}
+        self.max_tables = max_tables
+        self.iterations_run = 0  # Continues the iteration count of warm starts
+        self.update_rule = update_rule
+        self.discounting = (discounting if discounting is not None
+                            else Discounting())
+        self.pruning = pruning
+        self.pruned_nodes = 0  # Number of children skipped in the last solve
+        self._executor = None  # The process pool of a parallel solve
+        # The infostates found under each child of the roots solved in
+        # parallel, keyed by the child's infostate hash
+        self._subtree_keys = {}
+        # The plain table increments of each infostate, which are only
+        # recorded while a worker process solves a subtree
+        self._increments = None
+        # The last iteration in which the regret and strategy tables of each
+        # infostate were discounted, so that an infostate reached more than
+        # once in an iteration is discounted only once
+        self._regrets_discounted = {}
+        self._strategy_discounted = {}
 
     @staticmethod
     def _initialize_utilities(state: Board):
         node_utility = 0
-        utilities = [0.0 for action in state.actions()]
+        utilities = np.zeros(len(state.actions()))
 
         return node_utility, utilities
 
     def _get_tables(self, state: Board, infostate: Infostate):
-        if str(infostate) not in self.regret_tables:
-            regret_table = [0.0 for action in state.actions()]
+        # The tables are keyed by the infostate's Zobrist hash
+        actions, key = state.actions(), infostate.zobrist
+        if self.table_store is not None:
+            regret_table, strategy_table = self.table_store.tables(
+                key, len(actions))
+            return (regret_table, strategy_table,
+                    CFRTrainer._regret_match(regret_table=regret_table))
+
+        if key not in self.regret_tables:
+            regret_table = np.zeros(len(actions))
         else:
-            regret_table = self.regret_tables[str(infostate)]
+            regret_table = self.regret_tables[key]
+            self.regret_tables.move_to_end(key)
 
-        if str(infostate) not in self.strategy_tables:
-            strategy_table = [0.0 for action in state.actions()]
+        if key not in self.strategy_tables:
+            strategy_table = np.zeros(len(actions))
         else:
-            strategy_table = self.strategy_tables[str(infostate)]
+            strategy_table = self.strategy_tables[key]
 
-        if str(infostate) not in self.profiles:
-            profile = [1.0/len(state.actions()) for action in state.actions()]
+        if key not in self.profiles:
+            profile = np.full(len(actions), 1.0/len(actions))
         else:
-            profile = self.profiles[str(infostate)]
+            profile = self.profiles[key]
 
         return regret_table, strategy_table, profile
 
     @staticmethod
-    def _get_next(state: Board, infostate: Infostate, action: str):
-        next_state = state.transition(action=action)
-        result = state.classify_action_result(action=action,
-                                              new_board=next_state)
-        next_infostate = infostate.transition(action=action, result=result)
+    def _get_next(state: Board, infostate: Infostate, action: int):
+        """
+        This plays the action on the state in place, returning the record for
+        undoing it along with the next infostate.
+        """
+        record = state.apply(action)
+        next_infostate = infostate.transition(action=action,
+                                              result=record.result)
 
-        return next_state, next_infostate
+        return record, next_infostate
 
     @staticmethod
-    def _update_probabilities(state: Board, profile: list[float],
+    def _update_probabilities(state: Board, profile: np.ndarray,
                               blue_probability: float, red_probability: float,
                               action_index: int):
         new_blue_probability = blue_probability
@@ -323,44 +679,304 @@ class CFRTrainer:
         return player_probability, opponent_probability
 
     @staticmethod
-    def _regret_match(state: Board, regret_table: list[float]):
-        # Calculate next profile using nonnegative regret matching
-        next_profile = [0.0 for action in state.actions()]
-        if sum(regret_table) < 0:
-            next_profile = [1/len(state.actions())
-                            for action in state.actions()]
+    def _regret_match(regret_table: np.ndarray):
+        # Calculate next profile using nonnegative regret matching, playing
+        # uniformly when no action has positive regret
+        positive_regrets = np.maximum(regret_table, 0.0)
+        positive_regret_sum = positive_regrets.sum()
+        if positive_regret_sum <= 0:
+            return np.full(len(regret_table), 1/len(regret_table))
+
+        return positive_regrets/positive_regret_sum
+
+    def _evict_tables(self, root: Infostate):
+        """
+        This removes the tables of the least recently used infostates until
+        the size bound is met, keeping those of the solved infostate.
+        """
+        if self.max_tables is None or self.table_store is not None:
+            return
+
+        if root.zobrist in self.regret_tables:
+            self.regret_tables.move_to_end(root.zobrist)
+        while len(self.regret_tables) > self.max_tables:
+            key, _ = self.regret_tables.popitem(last=False)
+            self.strategy_tables.pop(key, None)
+            self.profiles.pop(key, None)
+            self._regrets_discounted.pop(key, None)
+            self._strategy_discounted.pop(key, None)
+
+    def _table_lock(self, infostate: Infostate):
+        """
+        This returns the lock to hold while accumulating into the tables of an
+        infostate, which is only needed for a shared table store.
+        """
+        if self.table_store is None:
+            return nullcontext()
+
+        return self.table_store.lock(infostate.zobrist)
+
+    def _accumulate_regrets(self, key: int, regret_table: np.ndarray,
+                            regrets: np.ndarray, iteration: int):
+        """
+        This adds the regrets of an iteration to the regret table of the
+        infostate with the given hash in place, following the trainer's update
+        rule.
+        """
+        t = iteration + 1  # Iterations are weighted starting from one
+        if self.update_rule == UpdateRule.CFR_PLUS:
+            regret_table += regrets
+            np.maximum(regret_table, 0.0, out=regret_table)
+        elif self.update_rule == UpdateRule.LINEAR:
+            regret_table += t*regrets
+        elif self.update_rule == UpdateRule.DISCOUNTED:
+            if self._regrets_discounted.get(key) != iteration:
+                self._regrets_discounted[key] = iteration
+                positive_scale = t**self.discounting.alpha
+                negative_scale = t**self.discounting.beta
+                regret_table *= np.where(
+                    regret_table > 0, positive_scale/(positive_scale + 1),
+                    negative_scale/(negative_scale + 1))
+            regret_table += regrets
         else:
-            positive_regret_sum = 0
-            for regret in regret_table:
-                if regret > 0:
-                    positive_regret_sum += regret
-            for r, regret in enumerate(regret_table):
-                if regret > 0:
-                    next_profile[r] = regret/positive_regret_sum
-
-        return next_profile
-
-    def _cfr_children(self, parameters: CFRParameters, profile: list[float], utilities: list[float],
-                      node_utility: float):
-        state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
-        for a, action in enumerate(state.actions()):
-            next_state, next_infostate = CFRTrainer._get_next(
-                state=state, infostate=infostate, action=action)
+            regret_table += regrets
+
+    def _accumulate_strategy(self, key: int, strategy_table: np.ndarray,
+                             strategy: np.ndarray, iteration: int):
+        """
+        This adds the reach weighted profile of an iteration to the strategy
+        table of the infostate with the given hash in place, following the
+        trainer's update rule.
+        """
+        t = iteration + 1  # Iterations are weighted starting from one
+        if self.update_rule in [UpdateRule.CFR_PLUS, UpdateRule.LINEAR]:
+            strategy_table += t*strategy
+        elif self.update_rule == UpdateRule.DISCOUNTED:
+            if self._strategy_discounted.get(key) != iteration:
+                self._strategy_discounted[key] = iteration
+                strategy_table *= (t/(t + 1))**self.discounting.gamma
+            strategy_table += strategy
+        else:
+            strategy_table += strategy
+
+    def _pruned_actions(self, parameters: CFRParameters, profile: np.ndarray):
+        """
+        This marks the actions of the node whose subtrees are skipped in the
+        current iteration, or returns None if none of them can be.
+        """
+        if (self.pruning is None or parameters.iteration
+                % self.pruning.full_traversal_interval == 0):
+            return None
 
-            new_blue_probability, new_red_probability = (
-                CFRTrainer._update_probabilities(
-                    state=state, profile=profile, blue_probability=parameters.blue_probability,
-                    red_probability=parameters.red_probability, action_index=a))
-            new_parameters = CFRParameters(abstraction=Abstraction(
-                state=next_state, infostate=next_infostate),
-                current_player=parameters.current_player, iteration=parameters.iteration,
-                blue_probability=new_blue_probability, red_probability=new_red_probability)
-            utilities[a] = -self.cfr(params=new_parameters)
+        regret_table = self.regret_tables.get(
+            parameters.abstraction.infostate.zobrist)
+        if regret_table is None:
+            return None
 
-            node_utility += profile[a]*utilities[a]
+        # A skipped action must not contribute to the node utility
+        return (regret_table <= self.pruning.threshold) & (profile == 0)
+
+    def _finish_children(self, pruned: np.ndarray, profile: np.ndarray,
+                         utilities: np.ndarray, node_utility: float):
+        """
+        This computes the node utility from the utilities of the children, and
+        gives the pruned actions the node utility so their regrets stay put.
+        """
+        node_utility += np.dot(profile, utilities)
+        if pruned is not None:
+            utilities[pruned] = node_utility
+            self.pruned_nodes += int(pruned.sum())
 
         return node_utility
 
+    def _child_utility(self, params: CFRParameters):
+        """
+        This returns the utility of a child node as used by its parent.
+        """
+        return -self.cfr(params=params)
+
+    @staticmethod
+    def _child_parameters(parameters: CFRParameters, profile: np.ndarray,
+                          action_index: int, child: Abstraction):
+        """
+        This prepares the parameters for a child of the node. The reach
+        probabilities must be updated before the action is applied, while the
+        player to move is still that of the node.
+        """
+        new_blue_probability, new_red_probability = (
+            CFRTrainer._update_probabilities(
+                state=parameters.abstraction.state, profile=profile,
+                blue_probability=parameters.blue_probability,
+                red_probability=parameters.red_probability,
+                action_index=action_index))
+
+        return CFRParameters(
+            abstraction=child, current_player=parameters.current_player,
+            iteration=parameters.iteration,
+            blue_probability=new_blue_probability,
+            red_probability=new_red_probability,
+            depth=(parameters.depth - 1 if parameters.depth is not None
+                   else None))
+
+    def _expand_children(self, parameters: CFRParameters, profile: np.ndarray,
+                         utilities: np.ndarray, indices: list[int]):
+        """
+        This fills in the utilities of the children at the given action
+        indices, over the process pool at the root of a parallel solve.
+        """
+        if parameters.parallel and self._executor is not None:
+            self._expand_in_parallel(parameters=parameters, profile=profile,
+                                     utilities=utilities, indices=indices)
+            return
+
+        state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
+        actions = state.actions()
+        for a in indices:
+            child = Abstraction(state=state, infostate=infostate)
+            new_parameters = CFRTrainer._child_parameters(
+                parameters=parameters, profile=profile, action_index=a,
+                child=child)
+            record, next_infostate = CFRTrainer._get_next(
+                state=state, infostate=infostate, action=actions[a])
+            child.set_infostate(next_infostate)
+            utilities[a] = self._child_utility(params=new_parameters)
+            state.undo(record)
+
+    def _expand_in_parallel(self, parameters: CFRParameters,
+                            profile: np.ndarray, utilities: np.ndarray,
+                            indices: list[int]):
+        """
+        This runs the subtree of each child in a worker process, then merges
+        the increments of the tables into the trainer's tables.
+        """
+        state = parameters.abstraction.state
+        infostate = parameters.abstraction.infostate
+        actions = state.actions()
+        tasks, child_keys = [], []
+        for a in indices:
+            record, next_infostate = CFRTrainer._get_next(
+                state=state, infostate=infostate, action=actions[a])
+            # The workers get their own copy of the child's position
+            child = Abstraction(state=state.copy(), infostate=next_infostate)
+            state.undo(record)
+            tables = {}
+            for key in (self._subtree_keys.get(next_infostate.zobrist, ())
+                        if self.table_store is None else ()):
+                if key in self.regret_tables:
+                    tables[key] = (self.regret_tables[key],
+                                   self.strategy_tables[key],
+                                   self.profiles[key])
+            tasks.append(SubtreeTask(
+                parameters=CFRTrainer._child_parameters(
+                    parameters=parameters, profile=profile, action_index=a,
+                    child=child), tables=tables,
+                shared=self.table_store is not None))
+            child_keys.append(next_infostate.zobrist)
+
+        for a, child_key, result in zip(
+                indices, child_keys,
+                self._executor.map(CFRTrainer._solve_subtree, tasks)):
+            utilities[a] = result.utility
+            self.pruned_nodes += result.pruned_nodes
+            self._merge_increments(result.increments,
+                                   iteration=parameters.iteration)
+            # The traversals of both players add to the infostates known
+            self._subtree_keys.setdefault(child_key, set()).update(
+                result.increments)
+
+    @staticmethod
+    def _start_worker(trainer_class: type, settings: dict,
+                      handle: SharedTableHandle = None):
+        """
+        This builds the trainer of a worker process once, as the initializer
+        of its process pool, so that its transposition table is allocated
+        once and kept across the subtrees the worker solves.
+        """
+        table_store = None
+        if handle is not None:
+            SharedTableStore.attach_worker(handle)
+            table_store = SharedTableStore.worker_store
+        CFRTrainer.worker_trainer = trainer_class(table_store=table_store,
+                                                  **settings)
+
+    @staticmethod
+    def _solve_subtree(task: SubtreeTask) -> SubtreeResult:
+        """
+        This runs in a worker process, starting from the given tables and
+        reporting the increments of the iteration. With a shared store, the
+        worker accumulates straight into it and reports no increments.
+        """
+        trainer = CFRTrainer.worker_trainer
+        trainer.pruned_nodes = 0
+        if task.shared:
+            utility = trainer._child_utility(params=task.parameters)
+            return SubtreeResult(utility=utility, increments={},
+                                 pruned_nodes=trainer.pruned_nodes)
+
+        trainer.regret_tables.clear()
+        trainer.strategy_tables.clear()
+        trainer.profiles.clear()
+        trainer._regrets_discounted.clear()
+        trainer._strategy_discounted.clear()
+        for key, tables in task.tables.items():
+            regret_table, strategy_table, profile = tables
+            trainer.regret_tables[key] = regret_table.copy()
+            trainer.strategy_tables[key] = strategy_table.copy()
+            trainer.profiles[key] = profile
+        trainer._increments = {}
+        try:
+            utility = trainer._child_utility(params=task.parameters)
+            increments = trainer._increments
+        finally:
+            trainer._increments = None
+
+        return SubtreeResult(utility=utility, increments=increments,
+                             pruned_nodes=trainer.pruned_nodes)
+
+    def _record_increments(self, key: int, regrets: np.ndarray,
+                           strategy: np.ndarray):
+        """
+        This adds the plain increments of a visit to an infostate to those
+        recorded for the subtree being solved.
+        """
+        if key in self._increments:
+            recorded_regrets, recorded_strategy = self._increments[key]
+            recorded_regrets += regrets
+            recorded_strategy += strategy
+        else:
+            self._increments[key] = (regrets.copy(), strategy.copy())
+
+    def _merge_increments(self, increments: dict, iteration: int):
+        """
+        This accumulates the increments reported by a worker into the
+        trainer's tables following the update rule, as if they had been
+        reached in the trainer itself, and matches new profiles to the merged
+        regrets.
+        """
+        for key, (regrets, strategy) in increments.items():
+            if key not in self.regret_tables:
+                self.regret_tables[key] = np.zeros(len(regrets))
+                self.strategy_tables[key] = np.zeros(len(strategy))
+            regret_table = self.regret_tables[key]
+            self._accumulate_regrets(key, regret_table, regrets,
+                                     iteration=iteration)
+            self._accumulate_strategy(key, self.strategy_tables[key],
+                                      strategy, iteration=iteration)
+            self.profiles[key] = CFRTrainer._regret_match(
+                regret_table=regret_table)
+
+    def _cfr_children(self, parameters: CFRParameters, profile: np.ndarray,
+                      utilities: np.ndarray, node_utility: float):
+        pruned = self._pruned_actions(parameters=parameters, profile=profile)
+        indices = [a for a in range(len(utilities))
+                   if pruned is None or not pruned[a]]
+        self._expand_children(parameters=parameters, profile=profile,
+                              utilities=utilities, indices=indices)
+
+        return self._finish_children(pruned=pruned, profile=profile,
+                                     utilities=utilities,
+                                     node_utility=node_utility)
+
     def cfr(self, params: CFRParameters):
         """
         This is the recursive algorithm for calculating counterfactual regret.
@@ -394,7 +1010,9 @@ class CFRTrainer:
                     node_utility=node_utility,
                     probabilities=Probabilities(
                         opponent_probability=opponent_probability,
-                        player_probability=player_probability), infostate=abstraction.infostate))
+                        player_probability=player_probability),
+                    infostate=abstraction.infostate,
+                    iteration=params.iteration))
 
         return node_utility
 
@@ -405,30 +1023,69 @@ class CFRTrainer:
         return -state.reward()
 
     def _update_tables(self, params: UpdateTablesParams):
-        for a in range(len(params.state.actions())):
-            params.tables.regret_table[a] += params.probabilities.opponent_probability * \
-                (params.utilities[a] - params.node_utility)
-            params.tables.strategy_table[a] += params.probabilities.player_probability * \
-                params.profile[a]
-
-        self.regret_tables[str(params.infostate)] = params.tables.regret_table
-        self.strategy_tables[str(params.infostate)
-                             ] = params.tables.strategy_table
+        regrets = params.probabilities.opponent_probability*(
+            params.utilities - params.node_utility)
+        strategy = params.probabilities.player_probability*params.profile
+        key = params.infostate.zobrist
+        with self._table_lock(params.infostate):
+            self._accumulate_regrets(key, params.tables.regret_table, regrets,
+                                     iteration=params.iteration)
+            self._accumulate_strategy(key, params.tables.strategy_table,
+                                      strategy, iteration=params.iteration)
+        if self.table_store is not None:
+            return  # The shared tables were updated in place
+
+        if self._increments is not None:
+            self._record_increments(key, regrets, strategy)
+        self.regret_tables[key] = params.tables.regret_table
+        self.strategy_tables[key] = params.tables.strategy_table
 
         next_profile = CFRTrainer._regret_match(
-            state=params.state, regret_table=params.tables.regret_table)
-        self.profiles[str(params.infostate)] = next_profile
+            regret_table=params.tables.regret_table)
+        self.profiles[key] = next_profile
 
-    def solve(self, abstraction: Abstraction, iterations: int = 100000):
+    def solve(self, abstraction: Abstraction, iterations: int = 100000,
+              workers: int = 1):
         """
         This runs the counterfactual regret minimization algorithm to produce
-        the tables needed by the AI.
+        the tables needed by the AI. With more than one worker, the subtrees of
+        the root's children are searched in separate processes.
+        """
+        self.pruned_nodes = 0
+        with self._worker_pool(workers):
+            for i in range(self.iterations_run,
+                           self.iterations_run + iterations):
+                for player in [Player.BLUE, Player.RED]:
+                    arguments = CFRParameters(
+                        abstraction=abstraction, current_player=player,
+                        iteration=i, blue_probability=1, red_probability=1,
+                        parallel=True)
+                    self.cfr(params=arguments)
+        self.iterations_run += iterations
+        self._evict_tables(root=abstraction.infostate)
+
+    @contextmanager
+    def _worker_pool(self, workers: int):
         """
-        for i in range(iterations):
-            for player in [Player.BLUE, Player.RED]:
-                arguments = CFRParameters(abstraction=abstraction, current_player=player,
-                                          iteration=i, blue_probability=1, red_probability=1)
-                self.cfr(params=arguments)
+        This provides the process pool for the duration of a parallel solve.
+        """
+        if workers <= 1:
+            yield
+            return
+
+        settings = {'update_rule': self.update_rule,
+                    'discounting': self.discounting, 'pruning': self.pruning}
+        handle = (self.table_store.handle if self.table_store is not None
+                  else None)
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=CFRTrainer._start_worker,
+            initargs=(type(self), settings, handle))
+        with executor:
+            self._executor = executor
+            try:
+                yield
+            finally:
+                self._executor = None
 
 
 class DepthLimitedCFRTrainer(CFRTrainer):
@@ -437,40 +1094,47 @@ class DepthLimitedCFRTrainer(CFRTrainer):
     uses heuristic reward evaluations.
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, update_rule: int = UpdateRule.VANILLA,
+                 discounting: Discounting = None, pruning: Pruning = None,
+                 max_tables: int = None, table_store: SharedTableStore = None,
+                 transposition_table_size: int = None):
+        """
+        If a size is given, the utilities of leaf and terminal nodes are cached
+        in a transposition table with that many slots. It is disabled by
+        default, since these utilities are cheap to evaluate and caching them
+        has not been measured to shorten a solve.
+        """
+        super().__init__(update_rule=update_rule, discounting=discounting,
+                         pruning=pruning, max_tables=max_tables,
+                         table_store=table_store)
         self.vanilla_cfr = CFRTrainer()  # FOr accessing original implementation
+        self.transposition_table = (
+            TranspositionTable(size=transposition_table_size)
+            if transposition_table_size is not None else None)
 
-    def _cfr_children(self, parameters: CFRParameters, profile: list[float], utilities: list[float],
-                      node_utility: float
-                      ):
-        state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
+    def _cfr_children(self, parameters: CFRParameters, profile: np.ndarray,
+                      utilities: np.ndarray, node_utility: float):
+        state = parameters.abstraction.state
         if parameters.actions_filter is not None:
             filtered_actions = parameters.actions_filter.filter()
         else:
             filtered_actions = None
+        pruned = self._pruned_actions(parameters=parameters, profile=profile)
+        indices = []  # The actions whose subtrees are searched
         for a, action in enumerate(state.actions()):
             if filtered_actions is not None and action not in filtered_actions:
-                utilities[a] = state.material()
-                node_utility += profile[a]*utilities[a]
+                utilities[a] = self._filtered_utility(
+                    state, parameters.current_player)
                 continue
-            next_state, next_infostate = CFRTrainer._get_next(
-                state=state, infostate=infostate, action=action)
-
-            new_blue_probability, new_red_probability = (
-                CFRTrainer._update_probabilities(
-                    state=state, profile=profile, blue_probability=parameters.blue_probability,
-                    red_probability=parameters.red_probability, action_index=a))
-            arguments = CFRParameters(abstraction=Abstraction(
-                state=next_state, infostate=next_infostate),
-                current_player=parameters.current_player, iteration=parameters.iteration,
-                blue_probability=new_blue_probability, red_probability=new_red_probability,
-                depth=parameters.depth-1)
-            utilities[a] = self.cfr(params=arguments)
+            if pruned is not None and pruned[a]:
+                continue
+            indices.append(a)
+        self._expand_children(parameters=parameters, profile=profile,
+                              utilities=utilities, indices=indices)
 
-            node_utility += profile[a]*utilities[a]
-
-        return node_utility
+        return self._finish_children(pruned=pruned, profile=profile,
+                                     utilities=utilities,
+                                     node_utility=node_utility)
 
     def cfr(self, params: CFRParameters):
         """
@@ -481,11 +1145,10 @@ class DepthLimitedCFRTrainer(CFRTrainer):
             params.red_probability, params.depth
         )
 
-        if abstraction.state.is_terminal():
-            return self._terminal_state_utility(abstraction.state, current_player)
-
-        if depth == 0:
-            return self._depth_limited_utility(abstraction.state, current_player)
+        leaf_utility = self._leaf_utility(abstraction.state, current_player,
+                                          depth)
+        if leaf_utility is not None:
+            return leaf_utility
 
         node_utility, utilities = CFRTrainer._initialize_utilities(
             state=abstraction.state)
@@ -509,27 +1172,372 @@ class DepthLimitedCFRTrainer(CFRTrainer):
                     node_utility=node_utility,
                     probabilities=Probabilities(
                         opponent_probability=opponent_probability,
-                        player_probability=player_probability), infostate=abstraction.infostate))
+                        player_probability=player_probability),
+                    infostate=abstraction.infostate,
+                    iteration=params.iteration))
 
         return node_utility
 
+    def _child_utility(self, params: CFRParameters):
+        # The utilities are already those of the current player
+        return self.cfr(params=params)
+
     def _depth_limited_utility(self, state: Board, current_player: int):
         if state.player_to_move == current_player:
             return state.material()
         return -state.material()
 
+    def _filtered_utility(self, state: Board, current_player: int):
+        """
+        This returns the utility of an action left out by the actions filter,
+        which is not searched and is valued as the node's own position.
+        """
+        return self._depth_limited_utility(state, current_player)
+
+    def _leaf_utility(self, state: Board, current_player: int, depth: int):
+        """
+        This returns the utility of a terminal node or of a node at the depth
+        limit, looking it up in the transposition table first. None is
+        returned for the nodes that have to be expanded.
+        """
+        is_terminal = state.is_terminal()
+        if not is_terminal and depth != 0:
+            return None
+
+        key = (state.zobrist, depth, current_player)
+        if self.transposition_table is not None:
+            utility = self.transposition_table.get(key)
+            if utility is not None:
+                return utility
+
+        if is_terminal:
+            utility = self._terminal_state_utility(state, current_player)
+        else:
+            utility = self._depth_limited_utility(state, current_player)
+        if self.transposition_table is not None:
+            self.transposition_table.store(key, utility)
+
+        return utility
+
     def solve(self, abstraction: Abstraction, iterations: int = 10,
-              depth: int = 2, actions_filter: ActionsFilter = None):
+              depth: int = 2, actions_filter: ActionsFilter = None,
+              workers: int = 1):
         """
         This runs the counterfactual regret minimization algorithm to produce
-        the tables needed by the AI.
+        the tables needed by the AI. With more than one worker, the subtrees of
+        the root's children are searched in separate processes.
+        """
+        self.pruned_nodes = 0
+        with self._worker_pool(workers):
+            for i in range(self.iterations_run,
+                           self.iterations_run + iterations):
+                for player in [Player.BLUE, Player.RED]:
+                    arguments = CFRParameters(
+                        abstraction=abstraction, current_player=player,
+                        iteration=i, blue_probability=1, red_probability=1,
+                        depth=depth, actions_filter=actions_filter,
+                        parallel=True)
+                    self.cfr(params=arguments)
+        self.iterations_run += iterations
+        self._evict_tables(root=abstraction.infostate)
+
+    def solve_within(self, abstraction: Abstraction, time_budget: float,
+                     actions_filter: ActionsFilter = None, max_depth: int = 8):
+        """
+        This runs iterations until the time budget (in milliseconds) is spent,
+        deepening the search from depth 1 whenever an iteration at the next
+        depth is expected to fit in the remaining time. At least one iteration
+        is always run, and the depth reached is returned.
+        """
+        deadline = time.perf_counter() + time_budget/1000
+        branching = max(len(abstraction.state.actions()), 1)
+        depth = 1
+        while True:
+            started = time.perf_counter()
+            self.solve(abstraction=abstraction, iterations=1, depth=depth,
+                       actions_filter=actions_filter)
+            finished = time.perf_counter()
+            iteration_time, remaining = finished - started, deadline - finished
+            # A deeper iteration costs about one more level of branching
+            if depth < max_depth and iteration_time*branching <= remaining:
+                depth += 1
+            elif iteration_time > remaining:
+                return depth
+
+
+class ExternalSamplingMCCFRTrainer(DepthLimitedCFRTrainer):
+    """
+    This implements external sampling Monte Carlo CFR. Every action of the
+    traversing player is explored, but a single action is sampled from the
+    current profile at each of the opponent's nodes, so that an iteration only
+    walks a narrow subtree and the search can afford to go deeper.
+    """
+
+    def __init__(self, update_rule: int = UpdateRule.VANILLA,
+                 discounting: Discounting = None, pruning: Pruning = None,
+                 max_tables: int = None, table_store: SharedTableStore = None,
+                 transposition_table_size: int = None):
+        """
+        The parameters are those of the full width trainers, so that the
+        trainers can be swapped for one another. Regret-based pruning is not
+        supported, since the sampled regrets of an action are too noisy to
+        skip its subtree on.
+        """
+        if pruning is not None:
+            raise ValueError(
+                f"{type(self).__name__} does not support regret-based pruning")
+
+        super().__init__(update_rule=update_rule, discounting=discounting,
+                         max_tables=max_tables, table_store=table_store,
+                         transposition_table_size=transposition_table_size)
+
+    def _check_workers(self, workers: int):
+        """
+        This refuses a parallel solve, which the sampling trainers do not
+        support since their iterations do not expand the root's children.
         """
-        for i in range(iterations):
-            for player in [Player.BLUE, Player.RED]:
-                arguments = CFRParameters(abstraction=abstraction, current_player=player,
-                                          iteration=i, blue_probability=1, red_probability=1,
-                                          depth=depth, actions_filter=actions_filter)
-                self.cfr(params=arguments)
+        if workers > 1:
+            raise ValueError(
+                f"{type(self).__name__} does not support parallel solves")
+
+    @staticmethod
+    def _sampling_weights(parameters: CFRParameters, profile: np.ndarray):
+        """
+        This returns the weights for sampling an action at the node, which are
+        restricted to the filtered actions if a filter is given.
+        """
+        if parameters.actions_filter is None:
+            return profile
+
+        filtered_actions = parameters.actions_filter.filter()
+        mask = np.isin(parameters.abstraction.state.actions(),
+                       filtered_actions)
+        return profile*mask
+
+    @staticmethod
+    def _sample_index(weights: np.ndarray):
+        """
+        This samples the index of an action in proportion to the given weights,
+        falling back to a uniform choice if all of them are zero.
+        """
+        if weights.sum() <= 0:
+            return random.randrange(len(weights))
+
+        return random.choices(range(len(weights)), weights=weights, k=1)[0]
+
+    @staticmethod
+    def _next_parameters(parameters: CFRParameters, infostate: Infostate,
+                         **kwargs):
+        """
+        This prepares the parameters for the node reached by an action, where
+        the given keyword arguments replace those of the current node.
+        """
+        arguments = {
+            'abstraction': Abstraction(state=parameters.abstraction.state,
+                                       infostate=infostate),
+            'current_player': parameters.current_player,
+            'iteration': parameters.iteration,
+            'blue_probability': parameters.blue_probability,
+            'red_probability': parameters.red_probability,
+            'depth': parameters.depth - 1,
+            'sample_probability': parameters.sample_probability
+        }
+        arguments.update(kwargs)
+
+        return CFRParameters(**arguments)
+
+    def _traverser_node(self, params: CFRParameters, tables: Tables,
+                        profile: np.ndarray):
+        """
+        This explores every action of the traversing player and updates the
+        regrets of the node.
+        """
+        state = params.abstraction.state
+        infostate = params.abstraction.infostate
+        utilities = np.zeros(len(state.actions()))
+        filtered_actions = (params.actions_filter.filter()
+                            if params.actions_filter is not None else None)
+        for a, action in enumerate(state.actions()):
+            if filtered_actions is not None and action not in filtered_actions:
+                utilities[a] = self._filtered_utility(
+                    state, params.current_player)
+                continue
+            record, next_infostate = CFRTrainer._get_next(
+                state=state, infostate=infostate, action=action)
+            utilities[a] = self.cfr(
+                params=self._next_parameters(params, next_infostate))
+            state.undo(record)
+
+        node_utility = np.dot(profile, utilities)
+        with self._table_lock(infostate):
+            self._accumulate_regrets(infostate.zobrist, tables.regret_table,
+                                     utilities - node_utility,
+                                     iteration=params.iteration)
+        self._store_tables(infostate=infostate, tables=tables)
+
+        return node_utility
+
+    def _store_tables(self, infostate: Infostate, tables: Tables):
+        """
+        This saves the tables of the node and its regret matched profile.
+        """
+        if self.table_store is not None:
+            return  # The shared tables were updated in place
+
+        key = infostate.zobrist
+        self.regret_tables[key] = tables.regret_table
+        self.strategy_tables[key] = tables.strategy_table
+        self.profiles[key] = CFRTrainer._regret_match(
+            regret_table=tables.regret_table)
+
+    def cfr(self, params: CFRParameters):
+        """
+        This is the recursive algorithm for sampling counterfactual regrets,
+        returning the utility of the traversing player.
+        """
+        state, infostate, current_player = (
+            params.abstraction.state, params.abstraction.infostate,
+            params.current_player)
+
+        leaf_utility = self._leaf_utility(state, current_player, params.depth)
+        if leaf_utility is not None:
+            return leaf_utility
+
+        regret_table, strategy_table, profile = self._get_tables(
+            state=state, infostate=infostate)
+        tables = Tables(regret_table=regret_table,
+                        strategy_table=strategy_table)
+
+        if state.player_to_move == current_player:
+            return self._traverser_node(params=params, tables=tables,
+                                        profile=profile)
+
+        # The opponent's average strategy is accumulated where it is sampled
+        with self._table_lock(infostate):
+            self._accumulate_strategy(infostate.zobrist, tables.strategy_table,
+                                      profile, iteration=params.iteration)
+        self._store_tables(infostate=infostate, tables=tables)
+        action = state.actions()[ExternalSamplingMCCFRTrainer._sample_index(
+            self._sampling_weights(params, profile))]
+        record, next_infostate = CFRTrainer._get_next(
+            state=state, infostate=infostate, action=action)
+        node_utility = self.cfr(
+            params=self._next_parameters(params, next_infostate))
+        state.undo(record)
+
+        return node_utility
+
+    def solve(self, abstraction: Abstraction, iterations: int = 10,
+              depth: int = 4, actions_filter: ActionsFilter = None,
+              workers: int = 1):
+        """
+        This runs external sampling MCCFR to produce the tables needed by the
+        AI. Only a single worker is supported.
+        """
+        self._check_workers(workers)
+        super().solve(abstraction=abstraction, iterations=iterations,
+                      depth=depth, actions_filter=actions_filter)
+
+
+class OutcomeSamplingMCCFRTrainer(ExternalSamplingMCCFRTrainer):
+    """
+    This implements outcome sampling Monte Carlo CFR. The actions of both
+    players are sampled, so every iteration walks a single path from the root,
+    and the sampled utilities are importance weighted by the probability of
+    sampling that path. The traversing player's samples are mixed with a
+    uniform exploration to keep every action reachable.
+    """
+
+    def __init__(self, update_rule: int = UpdateRule.VANILLA,
+                 discounting: Discounting = None, pruning: Pruning = None,
+                 max_tables: int = None, table_store: SharedTableStore = None,
+                 transposition_table_size: int = None,
+                 exploration: float = 0.6):
+        super().__init__(update_rule=update_rule, discounting=discounting,
+                         pruning=pruning, max_tables=max_tables,
+                         table_store=table_store,
+                         transposition_table_size=transposition_table_size)
+        self.exploration = exploration
+
+    def cfr(self, params: CFRParameters):
+        """
+        This is the recursive algorithm for sampling counterfactual regrets
+        along a single path. It returns the importance weighted utility of the
+        traversing player along with the probability of the rest of the path
+        under the current profile.
+        """
+        state, infostate, current_player = (
+            params.abstraction.state, params.abstraction.infostate,
+            params.current_player)
+
+        leaf_utility = self._leaf_utility(state, current_player, params.depth)
+        if leaf_utility is not None:
+            return leaf_utility/params.sample_probability, 1.0
+
+        regret_table, strategy_table, profile = self._get_tables(
+            state=state, infostate=infostate)
+        tables = Tables(regret_table=regret_table,
+                        strategy_table=strategy_table)
+        is_traverser = state.player_to_move == current_player
+        weights = profile
+        if is_traverser:
+            weights = (self.exploration/len(profile)
+                       + (1 - self.exploration)*profile)
+        weights = self._sampling_weights(params, weights)
+        if weights.sum() <= 0:
+            weights = np.ones(len(profile))
+        a = ExternalSamplingMCCFRTrainer._sample_index(weights)
+        sample_probability = weights[a]/weights.sum()
+
+        new_blue_probability, new_red_probability = (
+            CFRTrainer._update_probabilities(
+                state=state, profile=profile,
+                blue_probability=params.blue_probability,
+                red_probability=params.red_probability, action_index=a))
+        record, next_infostate = CFRTrainer._get_next(
+            state=state, infostate=infostate, action=state.actions()[a])
+        utility, tail_probability = self.cfr(
+            params=self._next_parameters(
+                params, next_infostate, blue_probability=new_blue_probability,
+                red_probability=new_red_probability,
+                sample_probability=(params.sample_probability
+                                    * sample_probability)))
+        state.undo(record)
+
+        if is_traverser:
+            player_probability, opponent_probability = (
+                CFRTrainer._probabilities(
+                    current_player=current_player,
+                    blue_probability=params.blue_probability,
+                    red_probability=params.red_probability))
+            weighted_utility = utility*opponent_probability
+            # Only the sampled action gains regret, while every action loses
+            # the sampled value of the node
+            regrets = np.full(len(profile),
+                              -weighted_utility*tail_probability*profile[a])
+            regrets[a] += weighted_utility*tail_probability
+            with self._table_lock(infostate):
+                self._accumulate_regrets(infostate.zobrist,
+                                         tables.regret_table, regrets,
+                                         iteration=params.iteration)
+                self._accumulate_strategy(
+                    infostate.zobrist, tables.strategy_table,
+                    (player_probability/params.sample_probability)*profile,
+                    iteration=params.iteration)
+            self._store_tables(infostate=infostate, tables=tables)
+
+        return utility, tail_probability*profile[a]
+
+    def solve(self, abstraction: Abstraction, iterations: int = 300,
+              depth: int = 16, actions_filter: ActionsFilter = None,
+              workers: int = 1):
+        """
+        This runs outcome sampling MCCFR to produce the tables needed by the
+        AI. Only a single worker is supported.
+        """
+        super().solve(abstraction=abstraction, iterations=iterations,
+                      depth=depth, actions_filter=actions_filter,
+                      workers=workers)
 
 
 class CFRTrainingSimulator(MatchSimulator):
@@ -543,45 +1551,72 @@ class CFRTrainingSimulator(MatchSimulator):
                  save_data: bool, pov: int):
         super().__init__(formations, controllers, save_data, pov)
         self.controllers = None
+        # Any of the depth limited trainers can be used to choose the moves
+        self.trainer_class = DepthLimitedCFRTrainer
+        # CFR+ gives a usable strategy within the few iterations of each move
+        self.update_rule = UpdateRule.CFR_PLUS
+        # The solver is kept across moves and games to warm start each search,
+        # holding the tables of at most this many infostates between solves
+        self.solver = None
+        self.max_solver_tables = 50000
+        # The milliseconds that each move's search may take (if not None)
+        self.time_budget = None
+        # The file that the training samples are appended to, unless they are
+        # given to a sample sink (e.g. an AsyncSampleSink or a SampleWriter)
+        self.data_path = "training_data.csv"
+        self.sample_sink = None
+        # The sample count and stop signal shared by the workers of a
+        # SelfPlayCoordinator (if not None)
+        self.sample_counter = None
+        self.stop_event = None
 
     @staticmethod
-    def _distill_strategy(raw_strategy: list[float]):
-        positive_sum = 0  # Initialize sum of positive probabilities
-        # Initialize list for the normalized strategy
-        normalized_strategy = [0.0 for i in range(len(raw_strategy))]
-        for probability in raw_strategy:
-            if probability > 0:
-                positive_sum += probability
+    def _distill_strategy(raw_strategy: np.ndarray):
+        positive_strategy = np.maximum(raw_strategy, 0.0)
+        positive_sum = positive_strategy.sum()
+        if positive_sum == 0:
+            return np.zeros(len(raw_strategy))
 
-        for i, probability in enumerate(raw_strategy):
-            if probability > 0:
-                normalized_strategy[i] = probability/positive_sum
+        return positive_strategy/positive_sum
 
-        return normalized_strategy
-
-    def get_cfr_input(self, abstraction: Abstraction, actions_filter: ActionsFilter = None):
+    def get_cfr_input(self, abstraction: Abstraction,
+                      actions_filter: ActionsFilter = None,
+                      time_budget: float = None):
         """
-        This is for obtaining the CFR controller's chosen action
+        This is for obtaining the CFR controller's chosen action. If a time
+        budget (in milliseconds) is given, or set in the time_budget attribute,
+        the solver deepens its search until the budget is spent instead of
+        running a fixed number of iterations.
         """
         valid_actions = abstraction.state.actions()
-        action = ""
-        trainer = DepthLimitedCFRTrainer()
-        trainer.solve(abstraction=abstraction, actions_filter=actions_filter)
+        action = None
+        if (self.solver is None
+                or self.solver.__class__ is not self.trainer_class):
+            self.solver = self.trainer_class(update_rule=self.update_rule,
+                                             max_tables=self.max_solver_tables)
+        trainer = self.solver
+        if time_budget is None:
+            time_budget = self.time_budget
+        if time_budget is None:
+            trainer.solve(abstraction=abstraction,
+                          actions_filter=actions_filter)
+        else:
+            trainer.solve_within(abstraction=abstraction,
+                                 time_budget=time_budget,
+                                 actions_filter=actions_filter)
         strategy = CFRTrainingSimulator._distill_strategy(
-            raw_strategy=trainer.strategy_tables[str(abstraction.infostate)])
+            raw_strategy=trainer.strategy_tables[
+                abstraction.infostate.zobrist])
         bottom_k = 3  # Number of lowest probabilities to set to 0
-        for i in range(bottom_k):
+        for _ in range(bottom_k):
             # Set the lowest probability as the minimum threshold
-            threshold = min(strategy)
-            for i, probability in enumerate(strategy):
-                if probability <= threshold:
-                    strategy[i] = 0
-        normalizing_sum = sum(strategy)
+            strategy[strategy <= strategy.min()] = 0
+        normalizing_sum = strategy.sum()
         if normalizing_sum > 0:
-            strategy = [p/normalizing_sum for p in strategy]
+            strategy = strategy/normalizing_sum
         else:
             # Reset options if all evaluated actions seem bad
-            strategy = [1/len(valid_actions) for a in valid_actions]
+            strategy = np.full(len(valid_actions), 1/len(valid_actions))
 
         if actions_filter is None:
             action = random.choices(valid_actions, weights=strategy, k=1)[0]
@@ -611,7 +1646,7 @@ class CFRTrainingSimulator(MatchSimulator):
             if previous_result in [Result.WIN, Result.LOSS]:
                 center = attack_location
             elif attack_location is None:
-                center = (int(previous_action[0]), int(previous_action[1]))
+                center = Action.COORDINATES[previous_action][:2]
             else:
                 return None
 
@@ -622,6 +1657,23 @@ class CFRTrainingSimulator(MatchSimulator):
             reduced_branching = len(actions_filter.filter())
         return actions_filter
 
+    @staticmethod
+    def _turn_actions_filter(arbiter_board, turn_number, previous_action,
+                             previous_result, attack_location):
+        """
+        This returns the filter of the actions searched in a turn.
+        """
+        # For the first turns of each player, choose a forward move
+        if turn_number in [1, 2]:
+            return ActionsFilter(
+                state=arbiter_board, directions=DirectionFilter(
+                    back=False, right=False, left=False),
+                square_whitelist=[(x, y) for y in range(Board.COLUMNS)
+                                  for x in range(Board.ROWS)])
+
+        return CFRTrainingSimulator._get_actions_filter(
+            arbiter_board, previous_action, previous_result, attack_location)
+
     def _initialize_arbiter_board(self):
         arbiter_board = Board(self.setup_arbiter_matrix(),
                               player_to_move=Player.BLUE,
@@ -630,44 +1682,88 @@ class CFRTrainingSimulator(MatchSimulator):
             self.game_history.append(arbiter_board.matrix)
         return arbiter_board
 
-    def _process_action(self, arbiter_board: Board, action: str):
-        new_arbiter_board = arbiter_board.transition(action)
-        result = arbiter_board.classify_action_result(
-            action, new_arbiter_board)
+    def _process_action(self, arbiter_board: Board, action: int):
+        new_arbiter_board, result = arbiter_board.transition_with_result(
+            action)
         if result in [Result.WIN, Result.LOSS]:
-            attack_location = (int(action[2]), int(action[3]))
+            attack_location = Action.COORDINATES[action][2:]
         else:
             attack_location = None
         return new_arbiter_board, result, attack_location
 
     @staticmethod
-    def _save_strategy_to_csv(current_abstraction: Abstraction,
-                              trainer: DepthLimitedCFRTrainer):
-        # Map the strategy to all possible actions
-        fullgame_actions = TimelessBoard.actions()
+    def _full_strategy(current_abstraction: Abstraction,
+                       trainer: DepthLimitedCFRTrainer):
+        """
+        This maps the strategy to all possible actions, whose ids are their
+        positions in the full size strategy.
+        """
         strategy = CFRTrainingSimulator._distill_strategy(
-            raw_strategy=trainer.strategy_tables[str(current_abstraction.infostate)])
+            raw_strategy=trainer.strategy_tables[
+                current_abstraction.infostate.zobrist])
         # Initialize the full size strategy
-        full_strategy = [0.0 for a in range(len(fullgame_actions))]
-        for action in current_abstraction.state.actions():
-            full_strategy[fullgame_actions.index(action)] = strategy[
-                current_abstraction.state.actions().index(action)]
+        full_strategy = np.zeros(Action.COUNT)
+        full_strategy[current_abstraction.state.actions()] = strategy
+
+        return full_strategy
+
+    @staticmethod
+    def _save_strategy_to_csv(current_abstraction: Abstraction,
+                              trainer: DepthLimitedCFRTrainer,
+                              path: str = "training_data.csv"):
+        full_strategy = CFRTrainingSimulator._full_strategy(
+            current_abstraction=current_abstraction, trainer=trainer)
         # Store the infostate string with the corresponding strategy in a CSV file
-        with open("training_data.csv", "a", encoding="utf-8") as training_data:
+        with open(path, "a", encoding="utf-8") as training_data:
             writer = csv.writer(training_data)
             # Split the infostate string
             infostate_split = list(
                 map(int, str(current_abstraction.infostate).split(" ")))
-            writer.writerow(infostate_split + full_strategy)
+            writer.writerow(infostate_split + full_strategy.tolist())
+
+    def _claim_sample(self, sampled: int, target: int):
+        """
+        This counts a sample before it is saved, returning the number of
+        samples so far. If the count is shared with other workers, None is
+        returned once the target has been reached, and the stop signal is
+        raised.
+        """
+        if self.sample_counter is None:
+            return sampled + 1
+
+        with self.sample_counter.get_lock():
+            if self.sample_counter.value < target:
+                self.sample_counter.value += 1
+                sampled = self.sample_counter.value
+            else:
+                sampled = None
+        if sampled is None or sampled >= target:
+            self.stop_event.set()
+
+        return sampled
+
+    def _stopped(self):
+        """
+        This checks if a coordinator has signaled the workers to stop.
+        """
+        return self.stop_event is not None and self.stop_event.is_set()
 
     def start(self, iterations: int = 1, target: int = None):
         """
         This method simulates a GG match generating training data, using the
-        counterfactual regret minimization algorithm.
+        counterfactual regret minimization algorithm. When run by a
+        SelfPlayCoordinator, the target is shared with the other workers and
+        the game in progress is abandoned once it is reached.
         """
         _ = iterations  # Not used in this subclass
         sampled = 0  # Initialize data sample count
-        while target is not None and sampled < target:
+        game_number = 0
+        self.progress = ProgressReporter(
+            interval=self.rendering.report_interval)
+        self.renderer = FrameRenderer(in_place=self.rendering.in_place,
+                                      max_fps=self.rendering.max_fps)
+        while target is not None and sampled < target and not self._stopped():
+            game_number += 1
             self.blue_formation = list(
                 Player.get_sensible_random_formation(
                     piece_list=Ranking.SORTED_FORMATION)
@@ -680,32 +1776,30 @@ class CFRTrainingSimulator(MatchSimulator):
             blue_infostate, red_infostate = MatchSimulator._starting_infostates(
                 arbiter_board)
             action, result, previous_action, previous_result, attack_location = (
-                "", "", "", "", None)  # Initialize needed values
+                None, None, None, None, None)  # Initialize needed values
 
             turn_number = 1
-            while not arbiter_board.is_terminal():
-                MatchSimulator._print_game_status(turn_number, arbiter_board, infostates=[
-                    blue_infostate, red_infostate],
-                    pov=self.pov)
-                action = ""  # Initialize variable for storing chosen action
+            while not arbiter_board.is_terminal() and not self._stopped():
+                rendered = self.rendering.renders_ply(game_number, turn_number)
+                action = None  # Initialize variable for storing chosen action
                 current_infostate = (blue_infostate if arbiter_board.player_to_move == Player.BLUE
                                      else red_infostate)
                 current_abstraction = Abstraction(
                     state=arbiter_board, infostate=current_infostate)
 
-                # For the first turns of each player, choose a forward move
-                if turn_number in [1, 2]:
-                    actions_filter = ActionsFilter(state=arbiter_board, directions=DirectionFilter(
-                        back=False, right=False, left=False),
-                        square_whitelist=[(x, y) for y in range(Board.COLUMNS)
-                                          for x in range(Board.ROWS)])
-                else:
-                    actions_filter = CFRTrainingSimulator._get_actions_filter(
-                        arbiter_board, previous_action, previous_result, attack_location)
+                actions_filter = CFRTrainingSimulator._turn_actions_filter(
+                    arbiter_board, turn_number, previous_action,
+                    previous_result, attack_location)
 
                 action, trainer = self.get_cfr_input(abstraction=current_abstraction,
                                                      actions_filter=actions_filter)
-                print(f"Chosen Move: {action}")
+                if rendered:
+                    # Dropped frames are not followed by their sample count
+                    rendered = self.renderer.draw(
+                        MatchSimulator._game_status_frame(
+                            turn_number, arbiter_board,
+                            infostates=[blue_infostate, red_infostate],
+                            pov=self.pov, action=action))
                 previous_action = action  # Store for the next iteration
                 if self.save_data:
                     self.game_history.append(action)
@@ -716,17 +1810,209 @@ class CFRTrainingSimulator(MatchSimulator):
                     blue_infostate, red_infostate, action=action, result=result
                 )
                 turn_number += 1
-                sampled += 1
-                print(f"Sampled: {sampled}/{target}")
 
-                self._save_strategy_to_csv(current_abstraction=current_abstraction,
-                                           trainer=trainer)
+                claimed = self._claim_sample(sampled, target)
+                if claimed is None:
+                    break  # Other workers have reached the target
+                sampled = claimed
+                if rendered:
+                    print(f"Sampled: {sampled}/{target}")
+
+                if self.sample_sink is not None:
+                    self.sample_sink.write(
+                        current_abstraction.infostate,
+                        self._full_strategy(
+                            current_abstraction=current_abstraction,
+                            trainer=trainer))
+                else:
+                    self._save_strategy_to_csv(
+                        current_abstraction=current_abstraction,
+                        trainer=trainer, path=self.data_path)
+                self.progress.update(plies=1, samples=1)
+
+            if arbiter_board.is_terminal():
+                if self.rendering.renders_game(game_number):
+                    MatchSimulator._print_result(arbiter_board)
+                self.progress.update(games=1)
+
+
+class CFRAgent(Agent):
+    """
+    This plays the moves that CFRTrainingSimulator would choose with the same
+    solver settings, searching the actions near the last one played.
+    """
+
+    def __init__(self, name: str = "cfr",
+                 trainer_class: type = DepthLimitedCFRTrainer,
+                 update_rule: int = UpdateRule.CFR_PLUS,
+                 time_budget: float = None):
+        self.name = name
+        self.trainer_class = trainer_class
+        self.update_rule = update_rule
+        self.time_budget = time_budget
+        # Created on the first move, so that unused agents copy cheaply
+        self.simulator = None
+        self.turn_number = 1
+        self.previous_action, self.previous_result = None, None
+        self.attack_location = None
+
+    def reset(self):
+        self.turn_number = 1
+        self.previous_action, self.previous_result = None, None
+        self.attack_location = None
+
+    def observe(self, action: int, result: int):
+        self.turn_number += 1
+        self.previous_action, self.previous_result = action, result
+        if result in [Result.WIN, Result.LOSS]:
+            self.attack_location = Action.COORDINATES[action][2:]
+        else:
+            self.attack_location = None
+
+    def choose_action(self, state: Board, infostate: Infostate) -> int:
+        if self.simulator is None:
+            self.simulator = CFRTrainingSimulator(
+                formations=[None, None], controllers=None, save_data=False,
+                pov=None)
+            self.simulator.trainer_class = self.trainer_class
+            self.simulator.update_rule = self.update_rule
+            self.simulator.time_budget = self.time_budget
+        actions_filter = CFRTrainingSimulator._turn_actions_filter(
+            state, self.turn_number, self.previous_action,
+            self.previous_result, self.attack_location)
+        action, _ = self.simulator.get_cfr_input(
+            abstraction=Abstraction(state=state, infostate=infostate),
+            actions_filter=actions_filter)
+
+        return action
+
+
+@dataclass
+class SelfPlayTask:
+    """
+    This is for storing what a self-play worker needs: its shard number, the
+    seed of its random number generators, the file it writes its samples to,
+    and the global sample target. Binary shards are preallocated for the
+    worker's share of the target, and grow by a quarter of that share at a
+    time if the worker writes more.
+    """
+    shard: int
+    seed: int
+    data_path: str
+    target: int
+    binary: bool = True
+    sparse_width: int = SampleFormat.MAX_ACTIONS
+    capacity: int = 1
+
+
+class SelfPlayCoordinator:
+    """
+    This generates training data with several worker processes, each playing
+    independent CFRTrainingSimulator games with its own seed and writing its
+    samples to its own shard. The workers share a sample count, and all of
+    them stop at their next move once the global target is reached.
+    """
+
+    def __init__(self, workers: int = 2, seed: int = None,
+                 shard_prefix: str = "training_data", binary: bool = True,
+                 sparse_width: int = SampleFormat.MAX_ACTIONS):
+        """
+        The seed of each worker is the given seed plus its shard number, and
+        is drawn at random if the seed is None. Shard n is written to the file
+        named by the prefix followed by _n.npy, in the binary format of the
+        dataset module, or to _n.csv if binary is False. Binary policies are
+        stored sparsely with the given width, or densely if it is None.
+        """
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+        self.shard_prefix = shard_prefix
+        self.binary = binary
+        self.sparse_width = sparse_width
+
+    def tasks(self, target: int) -> list[SelfPlayTask]:
+        """
+        This lists the task of every worker.
+        """
+        extension = "npy" if self.binary else "csv"
+        share = -(-target//self.workers)  # Rounded up
+        return [SelfPlayTask(shard=shard, seed=self.seed + shard,
+                             data_path=(f"{self.shard_prefix}_{shard}"
+                                        f".{extension}"),
+                             target=target, binary=self.binary,
+                             sparse_width=self.sparse_width,
+                             capacity=max(share, 1))
+                for shard in range(self.workers)]
 
-            MatchSimulator._print_result(arbiter_board)
+    @staticmethod
+    def _run_worker(task: SelfPlayTask, sample_counter, stop_event):
+        """
+        This runs in a worker process, playing games until the shared target
+        is reached.
+        """
+        random.seed(task.seed)
+        np.random.seed(task.seed)
+        simulator = CFRTrainingSimulator(formations=[None, None],
+                                         controllers=None, save_data=False,
+                                         pov=POV.WORLD)
+        # The coordinator reports the progress of all the workers
+        simulator.rendering = Rendering.headless(report_interval=None)
+        simulator.data_path = task.data_path
+        simulator.sample_counter = sample_counter
+        simulator.stop_event = stop_event
+        if task.binary:
+            writer = SampleWriter(task.data_path, capacity=task.capacity,
+                                  sparse_width=task.sparse_width,
+                                  growth=max(task.capacity//4, 1))
+        else:
+            writer = CSVSampleWriter(task.data_path)
+        # The samples are written while the next move is searched
+        simulator.sample_sink = AsyncSampleSink(writer)
+        try:
+            simulator.start(target=task.target)
+        finally:
+            simulator.sample_sink.close()
+
+    def run(self, target: int, report_interval: float = 10.0) -> int:
+        """
+        This starts the workers and reports the global progress every given
+        number of seconds until the target is reached, returning the number of
+        samples saved. If a worker fails, the others are stopped as well.
+        """
+        sample_counter = multiprocessing.Value('q', 0)
+        stop_event = multiprocessing.Event()
+        tasks = self.tasks(target)
+        processes = [multiprocessing.Process(
+            target=SelfPlayCoordinator._run_worker,
+            args=(task, sample_counter, stop_event)) for task in tasks]
+        for process in processes:
+            process.start()
+
+        start_time = time.perf_counter()
+        try:
+            while any(process.is_alive() for process in processes):
+                stop_event.wait(timeout=report_interval)
+                elapsed = time.perf_counter() - start_time
+                print(f"Sampled: {sample_counter.value}/{target} "
+                      f"({sample_counter.value/elapsed:.2f} samples/s)")
+                if any(process.exitcode not in [None, 0]
+                       for process in processes):
+                    stop_event.set()
+                if stop_event.is_set():
+                    break
+        finally:
+            # Each worker finishes its current move before exiting
+            stop_event.set()
+            for process in processes:
+                process.join()
+
+        failed = [task.shard for task, process in zip(tasks, processes)
+                  if process.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"Self-play workers {failed} failed")
+
+        return sample_counter.value
 
 
 if __name__ == "__main__":
-    simulator = CFRTrainingSimulator(formations=[None, None],
-                                     controllers=None, save_data=False,
-                                     pov=POV.WORLD)
-    simulator.start(target=5000)
+    coordinator = SelfPlayCoordinator(workers=os.cpu_count() or 1)
+    coordinator.run(target=5000)